@@ -0,0 +1,4 @@
+import time
+
+# Início da importação da aplicação, base do tempo de inicialização dos workers (ver `app.warmup`)
+IMPORT_STARTED_AT = time.perf_counter()
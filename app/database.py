@@ -1,32 +1,185 @@
+import time
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
+from sqlalchemy import make_url
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import registry, sessionmaker
+from sqlalchemy.orm import Session, registry, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from app.metrics import DB_COMMIT_DURATION, DB_POOL_WAIT, DB_SESSION_DURATION
 from app.settings import settings
 
 table_registry = registry()
 
-engine = create_async_engine(
-    url=settings.DATABASE_URL,
-    echo=True,
-    future=True,
-)
+# Perfis de configuração do engine. O perfil `prod` foi dimensionado para os 8 workers do gunicorn
+# (task `run80`): 8 x (6 + 4) = 80 conexões, abaixo do `max_connections` padrão (100) do PostgreSQL.
+ENGINE_PROFILES = {
+    'dev': {
+        'echo': True,
+        'pool_size': 5,
+        'max_overflow': 5,
+        'pool_timeout': 30.0,
+        'pool_recycle': -1,
+        'pool_pre_ping': False,
+        'statement_cache_size': 100,
+        'query_cache_size': 500,
+    },
+    'prod': {
+        'echo': False,
+        'pool_size': 6,
+        'max_overflow': 4,
+        'pool_timeout': 10.0,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+        'statement_cache_size': 500,
+        'query_cache_size': 1200,
+    },
+}
+
+
+class PoolStats:
+    """
+    Tempo de espera para obter uma conexão do pool, acumulado no processo atual.
+    """
+
+    def __init__(self, slow_threshold: float = settings.DB_POOL_SLOW_CHECKOUT_SECONDS):
+        self.slow_threshold = slow_threshold
+        self.checkouts = 0
+        self.slow_checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float):
+        DB_POOL_WAIT.observe(wait)
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        if wait >= self.slow_threshold:
+            self.slow_checkouts += 1
+
+    def snapshot(self) -> dict:
+        return {
+            'checkouts': self.checkouts,
+            'slow_checkouts': self.slow_checkouts,
+            'wait_avg_seconds': round(self.wait_total / self.checkouts, 6) if self.checkouts else 0.0,
+            'wait_max_seconds': round(self.wait_max, 6),
+        }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    Pool que registra em `pool_stats` quanto tempo cada checkout esperou por uma conexão.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record(time.perf_counter() - started)
+
+
+def engine_options(url: str) -> dict:
+    """
+    Monta os argumentos do `create_async_engine` a partir do perfil `DB_PROFILE`, aplicando os overrides `DB_*` definidos.
+    """
+    profile = dict(ENGINE_PROFILES[settings.DB_PROFILE])
+    overrides = {
+        'echo': settings.DB_ECHO,
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+        'statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+        'query_cache_size': settings.DB_QUERY_CACHE_SIZE,
+    }
+    profile.update({key: value for key, value in overrides.items() if value is not None})
+
+    url = make_url(url)
+    statement_cache_size = profile.pop('statement_cache_size')
+    options = {'echo': profile.pop('echo'), 'query_cache_size': profile.pop('query_cache_size'), 'future': True}
+
+    # SQLite em memória usa StaticPool (uma única conexão), sem opções de dimensionamento do pool
+    if url.get_backend_name() == 'sqlite' and url.database in {None, '', ':memory:'}:
+        return options
+
+    options.update(profile, poolclass=InstrumentedAsyncPool)
+
+    if url.get_driver_name() == 'asyncpg':
+        options['connect_args'] = {'prepared_statement_cache_size': statement_cache_size}
+
+    return options
+
+
+class InstrumentedSession(Session):
+    """
+    Sessão que registra a duração de cada commit em `DB_COMMIT_DURATION`.
+    """
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            DB_COMMIT_DURATION.observe(time.perf_counter() - started)
+
+
+engine = create_async_engine(url=settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
 
 AsyncSessionLocal = sessionmaker(
     bind=engine,
     class_=AsyncSession,
+    sync_session_class=InstrumentedSession,
     expire_on_commit=False,
 )
 
 
+_DIALECT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def dialect_insert(session: AsyncSession, table):
+    """
+    Retorna o `insert` específico do dialeto do banco, necessário para o ON CONFLICT.
+    """
+    dialect = session.bind.dialect.name
+    try:
+        return _DIALECT_INSERTS[dialect](table)
+    except KeyError:
+        raise NotImplementedError(f'Upsert não suportado para o banco "{dialect}".')
+
+
 @asynccontextmanager
 async def get_db():
-    async with AsyncSessionLocal() as session:
-        yield session
+    started = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as session:
+            yield session
+    finally:
+        DB_SESSION_DURATION.observe(time.perf_counter() - started)
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with get_db() as session:
         yield session
+
+
+def pool_status() -> dict:
+    """
+    Estado atual do pool de conexões do processo e métricas de espera no checkout.
+    """
+    pool = engine.pool
+    status = {'profile': settings.DB_PROFILE, **pool_stats.snapshot()}
+
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow(), idle=pool.checkedin())
+
+    return status
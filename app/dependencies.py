@@ -1,8 +1,10 @@
 from typing import Annotated
 
-from fastapi import Depends
+from fastapi import Depends, Header, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_session
 
 T_Session = Annotated[AsyncSession, Depends(get_session)]
+T_IdempotencyKey = Annotated[str | None, Header(alias='Idempotency-Key', min_length=1, max_length=255)]
+T_FullResponse = Annotated[bool, Query(description='Devolve a resposta completa do Mercado Pago em vez da resposta resumida.')]
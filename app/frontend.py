@@ -0,0 +1,198 @@
+"""
+Build e entrega da página de checkout estática.
+
+O build renderiza `templates/checkout.html` uma única vez, gera o CSS do Tailwind apenas com as classes usadas
+(substituindo o CDN que compila o CSS no navegador), minifica o HTML e grava versões pré-comprimidas
+(gzip e, com o pacote `brotli` instalado, brotli) em `static/dist`. Sem build, a página continua sendo
+renderizada pelo Jinja com o CDN do Tailwind.
+
+Uso:
+    python -m app.frontend
+"""
+
+import argparse
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from app.settings import settings
+
+# O brotli é opcional (requirements_dev.txt); sem ele o build gera apenas as variantes gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+TEMPLATES_DIR = BASE_DIR / 'templates'
+DIST_DIR = BASE_DIR / 'static' / 'dist'
+CSS_INPUT = BASE_DIR / 'static' / 'src' / 'checkout.css'
+TAILWIND_CONFIG = BASE_DIR / 'tailwind.config.js'
+
+# O template usa classes do Tailwind 3 (ex.: `bg-opacity-90`), removidas no Tailwind 4
+TAILWIND_VERSION = 'v3.4.17'
+
+CHECKOUT_PAGE = 'checkout.html'
+STATIC_URL = '/static'
+
+# Arquivos com hash do conteúdo no nome nunca mudam e podem ficar em cache indefinidamente
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+
+COMPRESSIBLE_SUFFIXES = {'.html', '.css', '.js', '.svg', '.json', '.txt'}
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """
+    Codificações do cabeçalho `Accept-Encoding` com os seus pesos (`q`, 1 quando omitido; inválido conta como 0).
+    """
+    weights = {}
+    for item in header.split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+    return weights
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    `StaticFiles` que entrega a variante `.br` ou `.gz` gerada no build quando o cliente a aceita, com `Cache-Control`
+    longo para arquivos com hash no nome e revalidação por ETag (`no-cache`) para os demais.
+    """
+
+    ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+    async def check_config(self):
+        # Sem build o diretório não existe: os arquivos simplesmente não são encontrados (404), em vez de erro 500
+        if self.directory is not None and not os.path.isdir(self.directory):
+            return
+        await super().check_config()
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        weights = parse_accept_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        response = None
+
+        for encoding, suffix in self.ENCODINGS:
+            # `q=0` recusa a codificação; `*` vale para as que não foram listadas
+            if weights.get(encoding, weights.get('*', 0.0)) <= 0:
+                continue
+            try:
+                response = await super().get_response(path + suffix, scope)
+            except HTTPException:
+                continue
+            # O Content-Type continua o do arquivo original: `checkout.html.br` é reconhecido como text/html
+            response.headers['Content-Encoding'] = encoding
+            break
+
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(path) else REVALIDATE_CACHE_CONTROL
+        return response
+
+
+def static_page_available() -> bool:
+    return (DIST_DIR / CHECKOUT_PAGE).is_file()
+
+
+def build_css(output: Path):
+    """
+    Gera o CSS minificado do Tailwind com o CLI standalone (pacote `pytailwindcss`, em requirements_dev.txt).
+    """
+    executable = shutil.which('tailwindcss')
+    if executable is None:
+        raise RuntimeError('CLI do Tailwind não encontrado. Instale as dependências de desenvolvimento: pip install -r requirements_dev.txt')
+
+    subprocess.run(
+        [executable, '--config', str(TAILWIND_CONFIG), '--input', str(CSS_INPUT), '--output', str(output), '--minify'],
+        cwd=BASE_DIR,
+        env={**os.environ, 'TAILWINDCSS_VERSION': TAILWIND_VERSION},
+        check=True,
+    )
+
+
+def minify_html(html: str) -> str:
+    """
+    Minificação conservadora: remove comentários HTML, indentação e linhas em branco. As quebras de linha são mantidas
+    para não alterar o JavaScript inline (comentários `//` e ponto e vírgula opcional).
+    """
+    html = re.sub(r'<!--(?!\[if).*?-->', '', html, flags=re.DOTALL)
+    return '\n'.join(line.strip() for line in html.splitlines() if line.strip())
+
+
+def build(output_dir: Path = DIST_DIR) -> list[Path]:
+    """
+    Gera a página de checkout e o CSS em `output_dir`, junto com as variantes comprimidas. Retorna os arquivos gerados.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        css_path = Path(tmp) / 'checkout.css'
+        build_css(css_path)
+        css = css_path.read_bytes()
+
+    css_name = f'checkout.{hashlib.sha256(css).hexdigest()[:12]}.css'
+    environment = Environment(loader=FileSystemLoader(TEMPLATES_DIR), autoescape=True)
+    html = environment.get_template(CHECKOUT_PAGE).render(mp_public_key=settings.MP_PUBLIC_KEY, stylesheet=f'{STATIC_URL}/{css_name}')
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    output_dir.mkdir(parents=True)
+
+    files = [output_dir / css_name, output_dir / CHECKOUT_PAGE]
+    files[0].write_bytes(css)
+    files[1].write_text(minify_html(html), encoding='utf-8')
+
+    for path in list(files):
+        files.extend(compress(path))
+    return files
+
+
+def compress(path: Path) -> list[Path]:
+    """
+    Grava `path.gz` e, com o `brotli` instalado, `path.br`, ambos no nível máximo de compressão.
+    """
+    if path.suffix not in COMPRESSIBLE_SUFFIXES:
+        return []
+
+    content = path.read_bytes()
+    variants = {path.with_name(path.name + '.gz'): gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[path.with_name(path.name + '.br')] = brotli.compress(content, quality=11)
+
+    for variant, data in variants.items():
+        variant.write_bytes(data)
+    return list(variants)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', type=Path, default=DIST_DIR)
+    args = parser.parse_args()
+
+    for path in build(args.output):
+        print(f'{path.relative_to(BASE_DIR) if path.is_relative_to(BASE_DIR) else path}: {path.stat().st_size} bytes')
+
+
+if __name__ == '__main__':
+    main()
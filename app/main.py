@@ -1,21 +1,123 @@
-import ujson
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from contextlib import asynccontextmanager
+from functools import partial
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from fastapi.templating import Jinja2Templates
 
-from payments.router import router
+from app.database import engine, pool_status
+from app.frontend import CHECKOUT_PAGE, DIST_DIR, STATIC_URL, PrecompressedStaticFiles, static_page_available
+from app.metrics import PrometheusMiddleware, metrics_response
+from app.ratelimit import CheckoutAdmissionMiddleware, create_rate_limit_backend
+from app.settings import settings
+from app.tasks import PeriodicTask
+from app.warmup import WorkerWarmup
+from payments.expiry import expire_overdue_payments
+from payments.idempotency import purge_expired_keys
+from payments.live import sync_subscribed_statuses
+from payments.outbox import sweep_payment_intents
+from payments.reconciliation import reconcile_pending_payments
+from payments.router import mp, payment_events, payment_status_broker, router, webhook_queue
+
+rate_limit_backend = create_rate_limit_backend()
+idempotency_cleanup = PeriodicTask('idempotency-cleanup', settings.IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS, purge_expired_keys)
+outbox_sweeper = PeriodicTask('payment-intents-sweeper', settings.OUTBOX_SWEEP_INTERVAL_SECONDS, partial(sweep_payment_intents, mp))
+expiry_sweeper = PeriodicTask('payments-expiry', settings.EXPIRY_SWEEP_INTERVAL_SECONDS, partial(expire_overdue_payments, mp))
+live_status_sync = PeriodicTask('payment-status-sync', settings.PAYMENT_STREAM_SYNC_INTERVAL_SECONDS, partial(sync_subscribed_statuses, payment_status_broker))
+reconciliation = PeriodicTask('payments-reconciliation', settings.RECONCILIATION_INTERVAL_SECONDS, partial(reconcile_pending_payments, mp))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await mp.start()
+    payment_status_broker.start()
+    await payment_events.start()
+    await webhook_queue.start()
+    await idempotency_cleanup.start()
+    await outbox_sweeper.start()
+    await expiry_sweeper.start()
+    await live_status_sync.start()
+    if settings.RECONCILIATION_ENABLED:
+        await reconciliation.start()
+    await warmup.run()
+    yield
+    warmup.stop()
+    await reconciliation.stop()
+    await live_status_sync.stop()
+    await expiry_sweeper.stop()
+    await outbox_sweeper.stop()
+    await idempotency_cleanup.stop()
+    await webhook_queue.stop()
+    await payment_events.stop()
+    payment_status_broker.stop()
+    await mp.close()
+    await rate_limit_backend.close()
+    await engine.dispose()
+
 
 app = FastAPI(
     title='Checkout Mercado Pago',
     description='Fazendo integração com a API do Mercado Pago',
-    json_loads=ujson.loads,
-    json_dumps=ujson.dumps,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
+app.add_middleware(CheckoutAdmissionMiddleware, backend=rate_limit_backend)
+app.add_middleware(PrometheusMiddleware)
 app.include_router(router)
 
+static_files = PrecompressedStaticFiles(directory=DIST_DIR, check_dir=False)
+app.mount(STATIC_URL, static_files, name='static')
+
 templates = Jinja2Templates(directory='templates')
+warmup = WorkerWarmup(mp, templates)
 
 
 @app.get('/', response_class=HTMLResponse)
 async def checkout_page(request: Request):
-    return templates.TemplateResponse(name='checkout.html', context={'request': request})
+    """
+    Página de checkout. Usa a versão estática gerada por `task build` quando disponível e, sem build, renderiza o template.
+    """
+    if static_page_available():
+        return await static_files.get_response(CHECKOUT_PAGE, request.scope)
+    return templates.TemplateResponse(name='checkout.html', context={'request': request, 'mp_public_key': settings.MP_PUBLIC_KEY})
+
+
+@app.get('/healthz', include_in_schema=False)
+async def healthz():
+    """
+    Liveness: o processo está de pé e respondendo (não consulta o banco nem o Mercado Pago).
+    """
+    return {'status': 'ok'}
+
+
+@app.get('/readyz', include_in_schema=False)
+async def readyz():
+    """
+    Readiness: 200 somente depois do aquecimento do worker e até o início do desligamento; senão, 503.
+    Inclui o relatório do aquecimento e os tempos de importação e inicialização.
+    """
+    return ORJSONResponse(warmup.status(), status_code=status.HTTP_200_OK if warmup.ready else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    """
+    Endpoint com as métricas da aplicação no formato do Prometheus.
+    """
+    return metrics_response()
+
+
+@app.get('/database/pool')
+async def database_pool():
+    """
+    Endpoint com o estado do pool de conexões do banco e o tempo de espera no checkout de conexões.
+    """
+    return pool_status()
+
+
+@app.get('/mercadopago/stats')
+async def mercadopago_stats():
+    """
+    Endpoint com a política de roteamento e, por conta do Mercado Pago, o circuit breaker, as chamadas em andamento e o cache de consultas.
+    """
+    return mp.stats()
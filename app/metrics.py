@@ -0,0 +1,96 @@
+import os
+import time
+
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client import REGISTRY as DEFAULT_REGISTRY
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Buckets (em segundos) pensados para chamadas HTTP e consultas ao banco: de 5 ms a 10 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+# Espera por conexão do pool e commits costumam ser bem mais rápidos: de 0,1 ms a 1 s
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Importação e aquecimento dos workers: de 100 ms a 1 min
+STARTUP_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+# Atraso entre o recebimento do webhook e o fim do processamento: de 10 ms a 10 min
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Latência das requisições HTTP por rota.',
+    ['method', 'route', 'status_code'],
+    buckets=LATENCY_BUCKETS,
+)
+MERCADOPAGO_REQUEST_DURATION = Histogram(
+    'mercadopago_request_duration_seconds',
+    'Latência das chamadas à API do Mercado Pago por conta, operação e status HTTP (`error` para falhas de rede).',
+    ['account', 'operation', 'status_code'],
+    buckets=LATENCY_BUCKETS,
+)
+DB_SESSION_DURATION = Histogram('db_session_duration_seconds', 'Tempo de vida das sessões do banco de dados.', buckets=LATENCY_BUCKETS)
+DB_COMMIT_DURATION = Histogram('db_commit_duration_seconds', 'Duração dos commits no banco de dados.', buckets=FAST_BUCKETS)
+DB_POOL_WAIT = Histogram('db_pool_wait_seconds', 'Espera para obter uma conexão do pool do banco de dados.', buckets=FAST_BUCKETS)
+WEBHOOK_PROCESSING_LAG = Histogram(
+    'webhook_processing_lag_seconds',
+    'Tempo entre o recebimento de uma notificação e o fim do seu processamento.',
+    buckets=LAG_BUCKETS,
+)
+WEBHOOK_EVENTS = Counter('webhook_events_total', 'Eventos de webhook processados, por resultado.', ['result'])
+WEBHOOK_IN_FLIGHT = Gauge('webhook_events_in_flight', 'Eventos de webhook em processamento.', multiprocess_mode='livesum')
+CHECKOUT_ADMISSION_REJECTIONS = Counter('checkout_admission_rejections_total', 'Requisições de checkout recusadas pelo controle de admissão, por motivo.', ['reason'])
+WORKER_STARTUP_DURATION = Histogram('worker_startup_duration_seconds', 'Duração da inicialização dos workers, por fase.', ['phase'], buckets=STARTUP_BUCKETS)
+PAYMENT_STREAM_CONNECTIONS = Gauge('payment_stream_connections', 'Conexões SSE abertas acompanhando o status de pagamentos.', multiprocess_mode='livesum')
+
+
+class PrometheusMiddleware:
+    """
+    Middleware ASGI que registra a latência de cada requisição HTTP em `HTTP_REQUEST_DURATION`.
+
+    A rota é identificada pelo template do path (ex.: `/payments/delete/{payment_id}`), não pelo path
+    recebido, para manter a cardinalidade das labels limitada. Requisições sem rota correspondente
+    são agrupadas em `unmatched`.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            HTTP_REQUEST_DURATION.labels(
+                method=scope['method'],
+                route=getattr(route, 'path', 'unmatched'),
+                status_code=status_code,
+            ).observe(time.perf_counter() - started)
+
+
+def metrics_response() -> Response:
+    """
+    Métricas no formato texto do Prometheus. Com `PROMETHEUS_MULTIPROC_DIR` definido (gunicorn com vários workers),
+    agrega os valores gravados por todos os processos nesse diretório.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = DEFAULT_REGISTRY
+
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
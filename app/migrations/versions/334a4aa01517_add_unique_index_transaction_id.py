@@ -0,0 +1,59 @@
+"""add unique index on payments.transaction_id
+
+Revision ID: 334a4aa01517
+Revises: 456a54d058ef
+Create Date: 2026-10-18 10:03:27.551902
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '334a4aa01517'
+down_revision: Union[str, None] = '456a54d058ef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# Quantidade de transaction_id duplicados citados na mensagem de erro (todos vão para o log)
+MAX_LISTED_DUPLICATES = 20
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+
+    # Antes do índice único nada impedia transações duplicadas. Qual linha manter (status, data de pagamento) é uma
+    # decisão do operador: a migração é interrompida e lista os transaction_id duplicados em vez de apagar pagamentos
+    duplicates = bind.execute(sa.text('SELECT transaction_id, COUNT(*) FROM payments GROUP BY transaction_id HAVING COUNT(*) > 1 ORDER BY transaction_id')).all()
+    if duplicates:
+        for transaction_id, count in duplicates:
+            logger.error('transaction_id %s tem %d pagamentos', transaction_id, count)
+        raise RuntimeError(
+            f'{len(duplicates)} transaction_id com pagamentos duplicados; resolva as duplicatas em payments antes de criar o índice único '
+            f'(ex.: {", ".join(str(transaction_id) for transaction_id, _ in duplicates[:MAX_LISTED_DUPLICATES])}).'
+        )
+
+    # No PostgreSQL o índice é criado com CONCURRENTLY para não bloquear escritas na tabela
+    # durante a migração. Um CREATE INDEX CONCURRENTLY que falha (ex.: uma duplicata gravada durante a criação)
+    # deixa um índice INVALID com o mesmo nome, removido aqui para que a migração possa ser executada de novo.
+    if bind.dialect.name == 'postgresql':
+        invalid_index = bind.execute(
+            sa.text("SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = 'ix_payments_transaction_id' AND NOT i.indisvalid")
+        ).scalar()
+        with op.get_context().autocommit_block():
+            if invalid_index:
+                op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_payments_transaction_id')
+            op.create_index(op.f('ix_payments_transaction_id'), 'payments', ['transaction_id'], unique=True, postgresql_concurrently=True)
+    else:
+        op.create_index(op.f('ix_payments_transaction_id'), 'payments', ['transaction_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_payments_transaction_id'), table_name='payments')
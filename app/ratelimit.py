@@ -0,0 +1,225 @@
+"""
+Controle de admissão dos endpoints de checkout: token buckets por IP e por `payer_email` e um limite de requisições
+simultâneas por endpoint, aplicados antes de a requisição ocupar uma conexão do banco ou cota do Mercado Pago.
+"""
+
+import logging
+import math
+import time
+
+from starlette import status
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import CHECKOUT_ADMISSION_REJECTIONS
+from app.serialization import RawJSONResponse, dumps, loads
+from app.settings import settings
+
+# O redis é opcional (`pip install redis`); só é necessário com `RATE_LIMIT_BACKEND=redis`
+try:
+    from redis import asyncio as redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+CHECKOUT_PATH_PREFIX = '/payments/checkout/'
+# Corpos maiores não são lidos para extrair o `payer_email` (o checkout em lote não tem `payer_email` na raiz)
+MAX_INSPECTED_BODY_BYTES = 64 * 1024
+KEY_PREFIX = 'ratelimit:'
+
+
+class InMemoryRateLimitBackend:
+    """
+    Token buckets na memória do processo: cada worker do gunicorn aplica os limites de forma independente.
+    """
+
+    # Intervalo (em segundos) entre as limpezas dos buckets já cheios, que equivalem a um bucket novo
+    PRUNE_INTERVAL = 60.0
+
+    def __init__(self):
+        self._buckets: dict[str, tuple[float, float, float]] = {}
+        self._next_prune = time.monotonic() + self.PRUNE_INTERVAL
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        """
+        Consome um token do bucket `key`. Retorna 0 se a requisição foi admitida ou, senão, quantos segundos faltam
+        para o próximo token.
+        """
+        now = time.monotonic()
+        if now >= self._next_prune:
+            self._prune(now)
+
+        tokens, updated_at, _ = self._buckets.get(key, (burst, now, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        return wait
+
+    async def close(self):
+        self._buckets.clear()
+
+    def _prune(self, now: float):
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        self._next_prune = now + self.PRUNE_INTERVAL
+
+
+# Bucket atualizado atomicamente no redis, com o relógio do próprio redis (igual para todos os workers)
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(wait)
+"""
+
+
+class RedisRateLimitBackend:
+    """
+    Token buckets compartilhados por todos os workers em um redis. Se o redis falhar, a requisição é admitida
+    (os limites deixam de valer, mas o checkout continua funcionando).
+    """
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError('RATE_LIMIT_BACKEND=redis requer o pacote `redis` (pip install redis).')
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        try:
+            return float(await self._script(keys=[KEY_PREFIX + key], args=[rate, burst]))
+        except Exception as e:
+            logger.warning('Falha ao consultar o rate limit no redis, admitindo a requisição: %s', e)
+            return 0.0
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def create_rate_limit_backend() -> InMemoryRateLimitBackend | RedisRateLimitBackend:
+    if settings.RATE_LIMIT_BACKEND == 'redis':
+        return RedisRateLimitBackend(settings.RATE_LIMIT_REDIS_URL)
+    return InMemoryRateLimitBackend()
+
+
+class CheckoutAdmissionMiddleware:
+    """
+    Middleware ASGI que admite ou recusa os POSTs em `/payments/checkout/*`:
+
+    1. token bucket por IP (`RATE_LIMIT_IP_*`) e por `payer_email` (`RATE_LIMIT_EMAIL_*`): acima do limite, `429`;
+    2. no máximo `CHECKOUT_MAX_IN_FLIGHT` requisições simultâneas por endpoint neste worker: acima dele, `503`.
+
+    As recusas respondem na hora com `Retry-After`, sem enfileirar a requisição atrás das chamadas ao Mercado Pago.
+    Uma taxa `<= 0` desativa o bucket correspondente e `CHECKOUT_MAX_IN_FLIGHT <= 0` desativa o limite de simultâneas.
+    """
+
+    def __init__(self, app: ASGIApp, backend: InMemoryRateLimitBackend | RedisRateLimitBackend):
+        self.app = app
+        self.backend = backend
+        self._in_flight: dict[str, int] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if not settings.RATE_LIMIT_ENABLED or scope['type'] != 'http' or scope['method'] != 'POST' or not scope['path'].startswith(CHECKOUT_PATH_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        wait = await self._acquire('ip:' + self._client_ip(scope), settings.RATE_LIMIT_IP_RATE, settings.RATE_LIMIT_IP_BURST)
+        if wait:
+            await self._reject(scope, receive, send, 'ip', status.HTTP_429_TOO_MANY_REQUESTS, 'Muitas requisições deste IP.', wait)
+            return
+
+        body = await self._read_body(receive)
+        email = self._payer_email(body)
+        if email:
+            wait = await self._acquire('email:' + email, settings.RATE_LIMIT_EMAIL_RATE, settings.RATE_LIMIT_EMAIL_BURST)
+            if wait:
+                await self._reject(scope, receive, send, 'email', status.HTTP_429_TOO_MANY_REQUESTS, 'Muitas requisições para este e-mail.', wait)
+                return
+
+        path = scope['path']
+        max_in_flight = settings.CHECKOUT_MAX_IN_FLIGHT
+        if max_in_flight > 0 and self._in_flight.get(path, 0) >= max_in_flight:
+            await self._reject(scope, receive, send, 'in_flight', status.HTTP_503_SERVICE_UNAVAILABLE, 'Checkout sobrecarregado, tente novamente.', 1)
+            return
+
+        self._in_flight[path] = self._in_flight.get(path, 0) + 1
+        try:
+            await self.app(scope, self._replay(body, receive), send)
+        finally:
+            self._in_flight[path] -= 1
+            if not self._in_flight[path]:
+                del self._in_flight[path]
+
+    # --- Métodos Internos Auxiliares ---
+
+    async def _acquire(self, key: str, rate: float, burst: int) -> float:
+        if rate <= 0:
+            return 0.0
+        return await self.backend.acquire(key, rate, burst)
+
+    @staticmethod
+    def _client_ip(scope: Scope) -> str:
+        if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+            for name, value in scope['headers']:
+                if name == b'x-forwarded-for':
+                    return value.decode('latin-1').split(',')[0].strip()
+        client = scope.get('client')
+        return client[0] if client else 'unknown'
+
+    @staticmethod
+    async def _read_body(receive: Receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] != 'http.request':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    @staticmethod
+    def _payer_email(body: bytes) -> str | None:
+        if not body or len(body) > MAX_INSPECTED_BODY_BYTES:
+            return None
+        try:
+            data = loads(body)
+        except ValueError:
+            return None
+        email = data.get('payer_email') if isinstance(data, dict) else None
+        return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+    @staticmethod
+    def _replay(body: bytes, receive: Receive) -> Receive:
+        sent = False
+
+        async def replay() -> Message:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            return await receive()
+
+        return replay
+
+    @staticmethod
+    async def _reject(scope: Scope, receive: Receive, send: Send, reason: str, status_code: int, detail: str, retry_after: float):
+        CHECKOUT_ADMISSION_REJECTIONS.labels(reason=reason).inc()
+        response = RawJSONResponse(dumps({'detail': detail}), status_code=status_code, headers={'Retry-After': str(max(1, math.ceil(retry_after)))})
+        await response(scope, receive, send)
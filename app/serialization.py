@@ -0,0 +1,69 @@
+"""
+Serialização JSON com orjson, usada nas respostas da API e nas requisições ao Mercado Pago.
+"""
+
+from typing import Any
+
+import orjson
+from starlette.responses import Response
+
+JSONDecodeError = orjson.JSONDecodeError
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+def loads(data: bytes | str) -> Any:
+    return orjson.loads(data)
+
+
+class ProviderPayload(dict):
+    """
+    Resposta JSON do Mercado Pago já decodificada, que guarda também os bytes recebidos em `raw`.
+    `json_body` devolve esses bytes sem serializar o dicionário de novo; alterações diretas no dicionário descartam
+    `raw` (alterações em objetos aninhados não são detectadas, então copie o payload antes de modificá-lo).
+    """
+
+    __slots__ = ('raw',)
+
+    def __init__(self, raw: bytes):
+        super().__init__(loads(raw))
+        self.raw = raw
+
+    def __setitem__(self, key, value):
+        self.raw = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.raw = None
+        super().__delitem__(key)
+
+    def update(self, *args, **kwargs):
+        self.raw = None
+        super().update(*args, **kwargs)
+
+    def pop(self, *args):
+        self.raw = None
+        return super().pop(*args)
+
+    def setdefault(self, key, default=None):
+        self.raw = None
+        return super().setdefault(key, default)
+
+
+def json_body(payload: Any) -> bytes:
+    """
+    Corpo JSON de `payload`, reaproveitando os bytes originais de um `ProviderPayload` não alterado.
+    """
+    if isinstance(payload, ProviderPayload) and payload.raw is not None:
+        return payload.raw
+    return dumps(payload)
+
+
+class RawJSONResponse(Response):
+    """
+    Resposta com um corpo JSON já serializado (bytes ou str), enviado como está.
+    """
+
+    media_type = 'application/json'
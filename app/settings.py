@@ -1,6 +1,25 @@
+from typing import Literal
+
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class MercadoPagoAccount(BaseModel):
+    """
+    Credenciais de uma conta do Mercado Pago. `payment_methods` vazio aceita todos os métodos. Limites da conta
+    (0 = sem limite): `max_in_flight` chamadas simultâneas e `rate` novos pagamentos por segundo, com rajadas de até
+    `burst` (0 = `rate` arredondado para cima). Uma conta no limite não recebe novos pagamentos.
+    """
+
+    name: str
+    access_token: str
+    public_key: str | None = None
+    payment_methods: list[Literal['pix', 'boleto', 'card']] = []
+    max_in_flight: int = 0
+    rate: float = 0.0
+    burst: int = 0
+
+
 class Settings(BaseSettings):
     """
     Application settings.
@@ -9,11 +28,129 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8', extra='ignore')
 
     MP_PUBLIC_KEY: str
-    MP_ACCESS_TOKEN: str
+    # Conta única; opcional quando MP_ACCOUNTS é definido
+    MP_ACCESS_TOKEN: str = ''
     MP_BASE_API_URL: str = 'https://api.mercadopago.com'
     NOTIFICATION_URL: str = 'https://yourdomain.com/notifications'
     DEFAULT_TIMEZONE: str = 'America/Sao_Paulo'
     DATABASE_URL: str = 'sqlite:///./database.db'
 
+    # Engine do banco de dados: o perfil define os padrões e as variáveis DB_* abaixo os sobrescrevem
+    DB_PROFILE: Literal['dev', 'prod'] = 'prod'
+    DB_ECHO: bool | None = None
+    DB_POOL_SIZE: int | None = None
+    DB_MAX_OVERFLOW: int | None = None
+    DB_POOL_TIMEOUT: float | None = None
+    DB_POOL_RECYCLE: int | None = None
+    DB_POOL_PRE_PING: bool | None = None
+    DB_STATEMENT_CACHE_SIZE: int | None = None
+    DB_QUERY_CACHE_SIZE: int | None = None
+    DB_POOL_SLOW_CHECKOUT_SECONDS: float = 0.05
+
+    # Várias contas do Mercado Pago (JSON, ex.: `[{"name": "a", "access_token": "..."}]`); sem elas, usa MP_ACCESS_TOKEN
+    MP_ACCOUNTS: list[MercadoPagoAccount] = []
+    MP_ROUTING_POLICY: Literal['round_robin', 'least_in_flight', 'payment_method'] = 'round_robin'
+
+    # Pool de conexões HTTP com a API do Mercado Pago (por conta)
+    MP_HTTP_MAX_CONNECTIONS: int = 100
+    MP_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    MP_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    MP_HTTP2: bool = False
+
+    # Timeouts (em segundos) por operação, retentativas e circuit breaker das chamadas ao Mercado Pago
+    MP_CONNECT_TIMEOUT: float = 3.0
+    MP_TIMEOUT_CARD_TOKEN: float = 5.0
+    MP_TIMEOUT_CREATE_PAYMENT: float = 10.0
+    MP_TIMEOUT_GET_PAYMENT: float = 5.0
+    MP_RETRY_ATTEMPTS: int = 2
+    MP_RETRY_BACKOFF_BASE: float = 0.2
+    MP_RETRY_BACKOFF_MAX: float = 2.0
+    MP_BREAKER_FAILURE_RATE: float = 0.5
+    MP_BREAKER_MIN_CALLS: int = 10
+    MP_BREAKER_WINDOW_SECONDS: float = 30.0
+    MP_BREAKER_OPEN_SECONDS: float = 15.0
+
+    # Cache de leitura de `get_payment_info`
+    MP_PAYMENT_CACHE_ENABLED: bool = True
+    MP_PAYMENT_CACHE_MAX_ENTRIES: int = 2000
+    MP_PAYMENT_CACHE_PENDING_TTL: float = 10.0
+
+    # Fila de notificações (webhooks) do Mercado Pago
+    WEBHOOK_QUEUE_CONCURRENCY: int = 4
+    WEBHOOK_QUEUE_BATCH_SIZE: int = 20
+    WEBHOOK_QUEUE_POLL_INTERVAL: float = 1.0
+    WEBHOOK_QUEUE_MAX_ATTEMPTS: int = 5
+    WEBHOOK_QUEUE_RETRY_BACKOFF: float = 5.0
+    WEBHOOK_QUEUE_VISIBILITY_TIMEOUT: float = 60.0
+    WEBHOOK_QUEUE_DRAIN_TIMEOUT: float = 10.0
+    WEBHOOK_DEDUP_WINDOW_SECONDS: float = 5.0
+    WEBHOOK_DEDUP_MAX_ENTRIES: int = 10_000
+
+    # Chaves de idempotência dos endpoints de checkout
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 86_400
+    IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS: float = 3600.0
+
+    # Controle de admissão dos endpoints de checkout: token buckets (taxa em tokens/s e rajada) e requisições simultâneas
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: Literal['memory', 'redis'] = 'memory'
+    RATE_LIMIT_REDIS_URL: str = 'redis://localhost:6379/0'
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False
+    RATE_LIMIT_IP_RATE: float = 2.0
+    RATE_LIMIT_IP_BURST: int = 20
+    RATE_LIMIT_EMAIL_RATE: float = 0.2
+    RATE_LIMIT_EMAIL_BURST: int = 5
+    CHECKOUT_MAX_IN_FLIGHT: int = 50
+
+    # Checkout em lote (`/payments/checkout/batch`)
+    CHECKOUT_BATCH_MAX_ITEMS: int = 1000
+    CHECKOUT_BATCH_CONCURRENCY: int = 10
+
+    # Intenções de pagamento (outbox) e a varredura que repara as que ficaram pendentes
+    OUTBOX_SWEEP_INTERVAL_SECONDS: float = 60.0
+    OUTBOX_SWEEP_MIN_AGE_SECONDS: float = 120.0
+    OUTBOX_ABANDON_AFTER_SECONDS: float = 3600.0
+    OUTBOX_SWEEP_BATCH_SIZE: int = 100
+    OUTBOX_SWEEP_CONCURRENCY: int = 5
+    OUTBOX_RETENTION_SECONDS: float = 604_800.0
+
+    # Reconciliação de pagamentos pendentes (notificações perdidas)
+    RECONCILIATION_ENABLED: bool = False
+    RECONCILIATION_INTERVAL_SECONDS: float = 300.0
+    RECONCILIATION_BATCH_SIZE: int = 200
+    RECONCILIATION_MIN_AGE_SECONDS: float = 900.0
+    # Pendentes mais antigos que isso deixam de ser consultados (0 = sem limite)
+    RECONCILIATION_MAX_AGE_SECONDS: float = 604_800.0
+    RECONCILIATION_CONCURRENCY: int = 10
+    RECONCILIATION_MAX_RATE: float = 20.0
+
+    # Expiração local de pagamentos Pix/boleto pendentes após o `date_of_expiration`
+    EXPIRY_SWEEP_INTERVAL_SECONDS: float = 60.0
+    EXPIRY_GRACE_SECONDS: float = 300.0
+    EXPIRY_BATCH_SIZE: int = 500
+    EXPIRY_VERIFY_SAMPLE_SIZE: int = 0
+
+    # Status em tempo real (SSE) na página de checkout; os limites valem por worker
+    PAYMENT_STREAM_MAX_CONNECTIONS: int = 1000
+    PAYMENT_STREAM_KEEPALIVE_SECONDS: float = 15.0
+    PAYMENT_STREAM_MAX_SECONDS: float = 1800.0
+    PAYMENT_STREAM_RETRY_MS: int = 3000
+    PAYMENT_STREAM_POLL_INTERVAL_SECONDS: float = 10.0
+    PAYMENT_STREAM_SYNC_INTERVAL_SECONDS: float = 2.0
+
+    # Histórico de status dos pagamentos (`payment_events`), gravado em lotes pelas notificações
+    PAYMENT_EVENTS_BATCH_SIZE: int = 200
+    PAYMENT_EVENTS_FLUSH_INTERVAL: float = 0.01
+
+    # Aquecimento do worker no lifespan, antes de aceitar requisições (conexões do banco: o `pool_size` quando não definido)
+    WARMUP_ENABLED: bool = True
+    WARMUP_DB_CONNECTIONS: int | None = None
+    WARMUP_MP_CONNECTIONS: int = 2
+    WARMUP_TIMEOUT_SECONDS: float = 10.0
+
+    def mercadopago_accounts(self) -> list[MercadoPagoAccount]:
+        if self.MP_ACCOUNTS:
+            return self.MP_ACCOUNTS
+        return [MercadoPagoAccount(name='default', access_token=self.MP_ACCESS_TOKEN, public_key=self.MP_PUBLIC_KEY)]
+
 
 settings = Settings()
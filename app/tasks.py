@@ -0,0 +1,36 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Executa uma corrotina em intervalos fixos em segundo plano, iniciada e parada pelo lifespan da aplicação.
+    Erros são registrados no log e não interrompem as próximas execuções.
+    """
+
+    def __init__(self, name: str, interval: float, fn: Callable[[], Awaitable[Any]]):
+        self.name = name
+        self._interval = interval
+        self._fn = fn
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self._fn()
+            except Exception:
+                logger.exception('Erro na tarefa periódica %s.', self.name)
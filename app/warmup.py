@@ -0,0 +1,163 @@
+"""
+Aquecimento dos workers no lifespan, antes de aceitarem requisições.
+
+Sem ele, cada worker do gunicorn atende as primeiras requisições reais a frio: pool do banco vazio, nenhuma conexão
+TLS com o Mercado Pago, template da página não compilado e caches de compilação do SQLAlchemy vazios. O aquecimento
+abre as conexões do banco e executa em cada uma as consultas dos caminhos mais frequentes (com uma chave inexistente),
+abre conexões keepalive com cada conta do Mercado Pago e compila o template. As etapas rodam em paralelo, limitadas
+por `WARMUP_TIMEOUT_SECONDS`; falhas entram no relatório e não impedem o worker de subir.
+
+`/healthz` indica apenas que o processo responde; `/readyz` só responde 200 depois do aquecimento e volta a 503 no
+desligamento. Os tempos de importação, aquecimento e inicialização vão para `worker_startup_duration_seconds`.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+
+from fastapi.templating import Jinja2Templates
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app import IMPORT_STARTED_AT
+from app.database import AsyncSessionLocal, engine
+from app.metrics import WORKER_STARTUP_DURATION
+from app.settings import settings
+from payments.idempotency import find_stored_response
+from payments.repository import get_payment_by_transaction_id
+from services.accounts import MercadoPagoAccounts
+
+logger = logging.getLogger(__name__)
+
+# Chave que não existe no banco, usada nas consultas de aquecimento
+WARMUP_KEY = '__warmup__'
+
+# Consultas dos caminhos mais frequentes: status/SSE/webhooks e replays de `Idempotency-Key` no checkout
+HOT_QUERIES = (
+    lambda session: get_payment_by_transaction_id(session, WARMUP_KEY),
+    lambda session: find_stored_response(session, WARMUP_KEY, ''),
+)
+TEMPLATES = ('checkout.html',)
+
+
+@dataclass
+class WarmupReport:
+    db_connections: int = 0
+    queries: int = 0
+    mp_connections: dict[str, int] = field(default_factory=dict)
+    templates: int = 0
+    errors: list[str] = field(default_factory=list)
+    import_seconds: float = 0.0
+    warmup_seconds: float = 0.0
+    startup_seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'db_connections': self.db_connections,
+            'queries': self.queries,
+            'mp_connections': self.mp_connections,
+            'templates': self.templates,
+            'errors': self.errors,
+            'import_seconds': round(self.import_seconds, 3),
+            'warmup_seconds': round(self.warmup_seconds, 3),
+            'startup_seconds': round(self.startup_seconds, 3),
+        }
+
+
+class WorkerWarmup:
+    """
+    Aquecimento e prontidão (`/readyz`) do worker. `import_seconds` vai do início da importação do pacote `app` ao
+    início do lifespan e `startup_seconds`, do início da importação até o worker ficar pronto.
+    """
+
+    def __init__(
+        self,
+        mp: MercadoPagoAccounts,
+        templates: Jinja2Templates,
+        db_connections: int | None = settings.WARMUP_DB_CONNECTIONS,
+        mp_connections: int = settings.WARMUP_MP_CONNECTIONS,
+        timeout: float = settings.WARMUP_TIMEOUT_SECONDS,
+        enabled: bool = settings.WARMUP_ENABLED,
+    ):
+        self._mp = mp
+        self._templates = templates
+        self._db_connections = db_connections
+        self._mp_connections = mp_connections
+        self._timeout = timeout
+        self._enabled = enabled
+        self._ready = False
+        self._report: WarmupReport | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    async def run(self) -> WarmupReport:
+        started = time.perf_counter()
+        report = WarmupReport(import_seconds=started - IMPORT_STARTED_AT)
+
+        if self._enabled:
+            await asyncio.gather(
+                self._step('database', self._warm_database(report), report),
+                self._step('mercadopago', self._warm_mercadopago(report), report),
+                self._step('templates', self._warm_templates(report), report),
+            )
+
+        finished = time.perf_counter()
+        report.warmup_seconds = finished - started
+        report.startup_seconds = finished - IMPORT_STARTED_AT
+        WORKER_STARTUP_DURATION.labels(phase='import').observe(report.import_seconds)
+        WORKER_STARTUP_DURATION.labels(phase='warmup').observe(report.warmup_seconds)
+        WORKER_STARTUP_DURATION.labels(phase='total').observe(report.startup_seconds)
+
+        self._report = report
+        self._ready = True
+        logger.info('Worker pronto em %.2fs: %s', report.startup_seconds, report.as_dict())
+        return report
+
+    def stop(self):
+        """
+        Marca o worker como não pronto no início do desligamento, para o balanceador deixar de enviar requisições.
+        """
+        self._ready = False
+
+    def status(self) -> dict:
+        return {'ready': self._ready, **(self._report.as_dict() if self._report else {})}
+
+    # --- Métodos Internos Auxiliares ---
+
+    async def _step(self, name: str, warmup, report: WarmupReport):
+        try:
+            async with asyncio.timeout(self._timeout):
+                await warmup
+        except Exception as e:
+            logger.warning('Falha no aquecimento do worker (%s): %r', name, e)
+            report.errors.append(f'{name}: {e!r}')
+
+    async def _warm_database(self, report: WarmupReport):
+        count = self._db_connections
+        if count is None:
+            count = engine.pool.size() if isinstance(engine.pool, AsyncAdaptedQueuePool) else 1
+
+        # Mantém todas as conexões abertas ao mesmo tempo, para que o pool crie `count` conexões distintas
+        async with AsyncExitStack() as stack:
+            connections = await asyncio.gather(*(stack.enter_async_context(engine.connect()) for _ in range(count)), return_exceptions=True)
+            for connection in connections:
+                if isinstance(connection, Exception):
+                    report.errors.append(f'database: {connection!r}')
+                    continue
+
+                report.db_connections += 1
+                async with AsyncSessionLocal(bind=connection) as session:
+                    for query in HOT_QUERIES:
+                        await query(session)
+                        report.queries += 1
+
+    async def _warm_mercadopago(self, report: WarmupReport):
+        report.mp_connections = await self._mp.warmup(self._mp_connections)
+
+    async def _warm_templates(self, report: WarmupReport):
+        for name in TEMPLATES:
+            self._templates.get_template(name)
+            report.templates += 1
@@ -0,0 +1,230 @@
+"""
+Teste de carga de ponta a ponta dos endpoints de checkout e de notificação, usando o Mercado Pago falso
+(`benchmarks.fake_mercadopago`). Cada cenário é executado com concorrência fixa e reporta p50/p95/p99 e req/s.
+
+Sem `--app-url`, a aplicação roda no próprio processo (via ASGI, sem servidor HTTP) e o Mercado Pago falso é
+iniciado em `--mp-port`. Com `--app-url`, a carga vai para uma instância já em execução, que deve ter
+`MP_BASE_API_URL` apontando para o servidor falso.
+
+Uso:
+    python -m benchmarks.checkout_load --requests 500 --concurrency 20 --latency 0.05 --create-tables
+    python -m benchmarks.checkout_load --save baseline.json
+    python -m benchmarks.checkout_load --baseline baseline.json --max-regression 0.2
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import statistics
+import sys
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+
+import httpx
+import uvicorn
+
+from benchmarks.fake_mercadopago import add_config_arguments, config_from_args, create_app
+
+SCENARIOS = ('pix', 'boleto', 'card', 'notification')
+
+PAYER = {'payer_email': 'comprador@teste.com', 'payer_cpf': '12345678909', 'transaction_amount': 100.0, 'description': 'Teste de carga'}
+
+PAYLOADS = {
+    'pix': PAYER,
+    'boleto': {
+        **PAYER,
+        'payer_first_name': 'Carlos',
+        'payer_last_name': 'Junior',
+        'zip_code': '01001-000',
+        'street_name': 'Praça da Sé',
+        'street_number': 's/n',
+        'neighborhood': 'Sé',
+        'city': 'São Paulo',
+        'federal_unit': 'SP',
+    },
+    'card': {
+        **PAYER,
+        'card_number': '5031433215406351',
+        'expiration_month': '11',
+        'expiration_year': '2030',
+        'security_code': '123',
+        'cardholder_name': 'APRO',
+        'installments': 1,
+    },
+}
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    concurrency: int
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        if len(self.latencies) == 1:
+            return self.latencies[0]
+        return statistics.quantiles(self.latencies, n=100, method='inclusive')[int(p) - 1]
+
+    def summary(self) -> dict:
+        return {
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'concurrency': self.concurrency,
+            'p50_ms': round(self.percentile(50) * 1000, 2),
+            'p95_ms': round(self.percentile(95) * 1000, 2),
+            'p99_ms': round(self.percentile(99) * 1000, 2),
+            'requests_per_second': round(len(self.latencies) / self.elapsed, 1) if self.elapsed else 0.0,
+        }
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, requests: int, concurrency: int, transaction_ids: list[str]) -> ScenarioResult:
+    """
+    Dispara `requests` requisições do cenário com `concurrency` clientes simultâneos.
+    """
+    result = ScenarioResult(name=name, concurrency=concurrency)
+    counter = iter(range(requests))
+
+    async def request(i: int) -> httpx.Response:
+        if name == 'notification':
+            resource_id = transaction_ids[i % len(transaction_ids)]
+            return await client.post('/payments/notification', json={'action': 'payment.updated', 'data': {'id': resource_id}})
+        return await client.post(f'/payments/checkout/{name}', json=PAYLOADS[name])
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await request(i)
+                ok = not response.is_error
+                if ok and name != 'notification':
+                    transaction_ids.append(str(response.json()['id']))
+            except httpx.HTTPError:
+                ok = False
+            result.latencies.append(time.perf_counter() - started)
+            result.errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+async def start_fake_mercadopago(stack: AsyncExitStack, args: argparse.Namespace) -> str:
+    server = uvicorn.Server(uvicorn.Config(create_app(config_from_args(args)), host='127.0.0.1', port=args.mp_port, log_level='warning'))
+    task = asyncio.create_task(server.serve())
+
+    async def stop():
+        server.should_exit = True
+        await task
+
+    stack.push_async_callback(stop)
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    return f'http://127.0.0.1:{args.mp_port}'
+
+
+async def open_app_client(stack: AsyncExitStack, args: argparse.Namespace, mp_url: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    if args.app_url:
+        return await stack.enter_async_context(httpx.AsyncClient(base_url=args.app_url, limits=limits, timeout=30.0))
+
+    # As configurações são lidas na importação da aplicação, então o ambiente precisa estar pronto antes dela
+    os.environ['MP_BASE_API_URL'] = mp_url
+    os.environ.setdefault('MP_PUBLIC_KEY', 'TEST-benchmark')
+    os.environ.setdefault('MP_ACCESS_TOKEN', 'TEST-benchmark')
+    os.environ.setdefault('DB_ECHO', 'false')
+    # Todas as requisições da carga vêm do mesmo cliente; o controle de admissão recusaria quase todas
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+
+    database = importlib.import_module('app.database')
+    app = importlib.import_module('app.main').app
+
+    if args.create_tables:
+        async with database.engine.begin() as conn:
+            await conn.run_sync(database.table_registry.metadata.create_all)
+
+    stack.push_async_callback(database.engine.dispose)
+    await stack.enter_async_context(app.router.lifespan_context(app))
+    return await stack.enter_async_context(httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://benchmark', timeout=30.0))
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], max_regression: float) -> list[str]:
+    """
+    Cenários cujo p95 piorou mais que `max_regression` (fração) em relação à linha de base.
+    """
+    regressions = []
+    for name, summary in results.items():
+        reference = baseline.get(name)
+        if not reference or not reference['p95_ms']:
+            continue
+        change = summary['p95_ms'] / reference['p95_ms'] - 1
+        if change > max_regression:
+            regressions.append(f'{name}: p95 {reference["p95_ms"]} ms -> {summary["p95_ms"]} ms (+{change:.0%})')
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> dict[str, dict]:
+    async with AsyncExitStack() as stack:
+        mp_url = args.mp_url or await start_fake_mercadopago(stack, args)
+        client = await open_app_client(stack, args, mp_url)
+
+        transaction_ids: list[str] = []
+        results = {}
+        for name in args.scenarios:
+            if name == 'notification' and not transaction_ids:
+                print('notification: ignorado (nenhum pagamento criado nos cenários anteriores)')
+                continue
+            await run_scenario(client, name, min(args.warmup, args.requests), args.concurrency, transaction_ids)
+            results[name] = (await run_scenario(client, name, args.requests, args.concurrency, transaction_ids)).summary()
+            print(f'{name:>12}: {results[name]}')
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', type=lambda value: value.split(','), default=list(SCENARIOS), help=f'Cenários separados por vírgula ({",".join(SCENARIOS)})')
+    parser.add_argument('--requests', type=int, default=300, help='Requisições por cenário')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=20, help='Requisições de aquecimento por cenário, fora da medição')
+    parser.add_argument('--app-url', default=None, help='URL de uma instância da aplicação já em execução')
+    parser.add_argument('--mp-url', default=None, help='URL de um Mercado Pago falso já em execução')
+    parser.add_argument('--mp-port', type=int, default=8001)
+    parser.add_argument('--create-tables', action='store_true', help='Cria as tabelas antes do teste (aplicação no mesmo processo)')
+    parser.add_argument('--save', default=None, help='Grava os resultados em JSON, para uso como linha de base')
+    parser.add_argument('--baseline', default=None, help='Compara o p95 com uma linha de base gravada com --save')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Piora máxima tolerada do p95 (fração)')
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'Cenários desconhecidos: {", ".join(sorted(unknown))}')
+
+    results = asyncio.run(run(args))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.max_regression)
+        if regressions:
+            print('Regressões de latência:\n  ' + '\n  '.join(regressions))
+            sys.exit(1)
+        print('Sem regressões em relação à linha de base.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Servidor local que imita os endpoints do Mercado Pago usados pela aplicação, com latência e erros configuráveis.
+
+Endpoints: `POST /v1/card_tokens`, `POST /v1/payments`, `GET /v1/payments/search` e `GET /v1/payments/{id}`.
+Pagamentos com cartão são aprovados, exceto quando o nome do titular começa com `OTHE` (recusado) ou `CONT`
+(em análise), como nos cartões de teste do Mercado Pago. Pix e boleto ficam pendentes até `--approve-after` segundos após a criação.
+
+Uso:
+    python -m benchmarks.fake_mercadopago --port 8001 --latency 0.05 --jitter 0.02 --error-rate 0.01
+    MP_BASE_API_URL=http://127.0.0.1:8001 uvicorn app.main:app
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def now_iso() -> str:
+    return datetime.now(UTC).isoformat(timespec='milliseconds')
+
+
+@dataclass
+class FakeConfig:
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    approve_after: float | None = None
+
+
+class FakeMercadoPago:
+    """
+    Estado em memória do servidor falso: tokens de cartão, pagamentos criados e chaves de idempotência.
+    """
+
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        self.payments: dict[int, dict] = {}
+        self.created_at: dict[int, float] = {}
+        self.card_tokens: dict[str, str] = {}
+        self.idempotency_keys: dict[str, int] = {}
+        self.requests = 0
+        self.injected_errors = 0
+        self._ids = itertools.count(100_000_000)
+
+    async def simulate(self) -> JSONResponse | None:
+        """
+        Aplica a latência configurada e, conforme as taxas de erro, devolve uma resposta de falha injetada.
+        """
+        self.requests += 1
+        delay = self.config.latency + random.uniform(-self.config.jitter, self.config.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        draw = random.random()
+        if draw < self.config.error_rate:
+            self.injected_errors += 1
+            return JSONResponse({'message': 'internal_error', 'status': 500}, status_code=500)
+        if draw < self.config.error_rate + self.config.throttle_rate:
+            self.injected_errors += 1
+            return JSONResponse({'message': 'too_many_requests', 'status': 429}, status_code=429, headers={'Retry-After': '1'})
+        return None
+
+    def create_card_token(self, body: dict) -> dict:
+        token = uuid.uuid4().hex
+        self.card_tokens[token] = (body.get('cardholder') or {}).get('name', '')
+        return {'id': token, 'status': 'active', 'last_four_digits': str(body.get('card_number', ''))[-4:]}
+
+    def create_payment(self, body: dict, idempotency_key: str | None) -> dict:
+        if idempotency_key and idempotency_key in self.idempotency_keys:
+            return self.payments[self.idempotency_keys[idempotency_key]]
+
+        payment_id = next(self._ids)
+        method = body.get('payment_method_id') or 'master'
+        payment = {
+            'id': payment_id,
+            'status': 'pending',
+            'status_detail': 'pending_waiting_payment',
+            'payment_method_id': method,
+            'transaction_amount': body.get('transaction_amount'),
+            'description': body.get('description'),
+            'external_reference': body.get('external_reference'),
+            'date_of_expiration': body.get('date_of_expiration'),
+            'date_created': now_iso(),
+            'date_last_updated': now_iso(),
+            'date_approved': None,
+            'payer': body.get('payer'),
+        }
+
+        if method == 'pix':
+            payment['status_detail'] = 'pending_waiting_transfer'
+            payment['point_of_interaction'] = {
+                'transaction_data': {
+                    'qr_code': f'00020126580014br.gov.bcb.pix{payment_id}',
+                    'qr_code_base64': '',
+                    'ticket_url': f'https://www.mercadopago.com.br/payments/{payment_id}/ticket',
+                }
+            }
+        elif method == 'bolbradesco':
+            payment['transaction_details'] = {'external_resource_url': f'https://www.mercadopago.com.br/payments/{payment_id}/ticket'}
+        else:
+            payment['installments'] = body.get('installments', 1)
+            payment['status'], payment['status_detail'] = self._card_result(self.card_tokens.get(body.get('token'), ''))
+            if payment['status'] == 'approved':
+                payment['date_approved'] = payment['date_last_updated']
+
+        self.payments[payment_id] = payment
+        self.created_at[payment_id] = time.monotonic()
+        if idempotency_key:
+            self.idempotency_keys[idempotency_key] = payment_id
+        return payment
+
+    def get_payment(self, payment_id: int) -> dict | None:
+        payment = self.payments.get(payment_id)
+        if payment is None:
+            return None
+
+        approve_after = self.config.approve_after
+        if payment['status'] == 'pending' and approve_after is not None and time.monotonic() - self.created_at[payment_id] >= approve_after:
+            payment.update(status='approved', status_detail='accredited', date_last_updated=now_iso(), date_approved=now_iso())
+        return payment
+
+    @staticmethod
+    def _card_result(cardholder_name: str) -> tuple[str, str]:
+        prefix = cardholder_name.upper()[:4]
+        if prefix == 'OTHE':
+            return 'rejected', 'cc_rejected_other_reason'
+        if prefix == 'CONT':
+            return 'in_process', 'pending_contingency'
+        return 'approved', 'accredited'
+
+
+def create_app(config: FakeConfig | None = None) -> FastAPI:
+    fake = FakeMercadoPago(config or FakeConfig())
+    app = FastAPI(title='Fake Mercado Pago')
+    app.state.fake = fake
+
+    @app.post('/v1/card_tokens')
+    async def card_tokens(request: Request):
+        if error := await fake.simulate():
+            return error
+        return JSONResponse(fake.create_card_token(await request.json()), status_code=201)
+
+    @app.post('/v1/payments')
+    async def create_payment(request: Request):
+        if error := await fake.simulate():
+            return error
+        return JSONResponse(fake.create_payment(await request.json(), request.headers.get('X-Idempotency-Key')), status_code=201)
+
+    @app.get('/v1/payments/search')
+    async def search_payments(external_reference: str | None = None):
+        if error := await fake.simulate():
+            return error
+        results = [payment for payment in fake.payments.values() if external_reference is None or payment['external_reference'] == external_reference]
+        return {'paging': {'total': len(results), 'limit': 30, 'offset': 0}, 'results': results[::-1][:30]}
+
+    @app.get('/v1/payments/{payment_id}')
+    async def get_payment(payment_id: int):
+        if error := await fake.simulate():
+            return error
+        if (payment := fake.get_payment(payment_id)) is None:
+            return JSONResponse({'message': 'Payment not found', 'status': 404}, status_code=404)
+        return payment
+
+    @app.get('/v1/payment_methods')
+    async def payment_methods():
+        # Consultado pelo aquecimento dos workers; não conta nas requisições simuladas
+        return [{'id': 'pix'}, {'id': 'bolbradesco'}, {'id': 'master'}, {'id': 'visa'}]
+
+    @app.get('/_fake/stats')
+    async def stats():
+        return {'requests': fake.requests, 'injected_errors': fake.injected_errors, 'payments': len(fake.payments)}
+
+    return app
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--latency', type=float, default=0.0, help='Latência média de cada resposta, em segundos')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Variação aleatória (+/-) da latência, em segundos')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fração das requisições respondidas com 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fração das requisições respondidas com 429')
+    parser.add_argument('--approve-after', type=float, default=None, help='Segundos até um Pix/boleto pendente ser aprovado')
+
+
+def config_from_args(args: argparse.Namespace) -> FakeConfig:
+    return FakeConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, throttle_rate=args.throttle_rate, approve_after=args.approve_after)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Microbenchmark da serialização da resposta de checkout: a resposta de um pagamento PIX do Mercado Pago
+(no formato do servidor falso) é recebida como bytes e devolvida ao cliente por cada estratégia abaixo.
+
+- `stdlib`: `json.loads` + `JSONResponse` (json da biblioteca padrão), o caminho anterior.
+- `orjson`: `orjson.loads` + `ORJSONResponse`, a resposta padrão da aplicação.
+- `passthrough`: `ProviderPayload` + `RawJSONResponse`, que devolve os bytes recebidos sem serializar de novo.
+
+Uso:
+    python -m benchmarks.json_serialization --iterations 20000
+"""
+
+import argparse
+import json
+import time
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.serialization import ProviderPayload, RawJSONResponse, dumps, json_body, loads
+from benchmarks.fake_mercadopago import FakeConfig, FakeMercadoPago
+
+
+def provider_response() -> bytes:
+    fake = FakeMercadoPago(FakeConfig())
+    payment = fake.create_payment(
+        {
+            'payment_method_id': 'pix',
+            'transaction_amount': 100.0,
+            'description': 'Pedido #12345 - Loja de teste',
+            'external_reference': 'ID-PIX-5f0d9c1e-7b1a-4c55-9f0e-3a2b1c0d9e8f',
+            'payer': {'email': 'comprador@teste.com', 'identification': {'type': 'CPF', 'number': '12345678909'}},
+        },
+        None,
+    )
+    # O QR code em base64 é o maior campo da resposta real (alguns KB)
+    payment['point_of_interaction']['transaction_data']['qr_code_base64'] = 'iVBORw0KGgo' * 400
+    return dumps(payment)
+
+
+def stdlib(raw: bytes) -> bytes:
+    return JSONResponse(json.loads(raw)).body
+
+
+def orjson_response(raw: bytes) -> bytes:
+    return ORJSONResponse(loads(raw)).body
+
+
+def passthrough(raw: bytes) -> bytes:
+    return RawJSONResponse(json_body(ProviderPayload(raw))).body
+
+
+STRATEGIES = {'stdlib': stdlib, 'orjson': orjson_response, 'passthrough': passthrough}
+
+
+def measure(fn, raw: bytes, iterations: int) -> float:
+    fn(raw)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(raw)
+    return (time.perf_counter() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20_000)
+    args = parser.parse_args()
+
+    raw = provider_response()
+    print(f'resposta: {len(raw)} bytes, {args.iterations} iterações')
+
+    baseline = None
+    for name, fn in STRATEGIES.items():
+        seconds = measure(fn, raw, args.iterations)
+        baseline = baseline or seconds
+        print(f'{name:>12}: {seconds * 1e6:8.2f} µs/resposta  {1 / seconds:10.0f} respostas/s  {baseline / seconds:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
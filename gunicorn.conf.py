@@ -0,0 +1,24 @@
+"""
+Configuração do gunicorn, carregada automaticamente a partir do diretório do projeto.
+
+Com `PROMETHEUS_MULTIPROC_DIR` definido, cada worker grava suas métricas nesse diretório e o
+endpoint `/metrics` agrega os valores de todos os workers.
+"""
+
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        # Métricas de execuções anteriores não devem ser somadas às da execução atual
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
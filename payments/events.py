@@ -0,0 +1,257 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+
+from sqlalchemy import case, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.settings import settings
+from payments.models import Payment, PaymentEvent, PaymentStatus, as_utc, utcnow
+from payments.rollups import RollupDeltas, apply_rollup_deltas
+
+logger = logging.getLogger(__name__)
+
+# Chave em `Session.info` com as mudanças de status publicadas após o commit (ver `payments.live`)
+STATUS_CHANGES_KEY = 'payment_status_changes'
+
+
+@dataclass
+class StatusChange:
+    """
+    Status de um pagamento informado pelo Mercado Pago (notificação, checkout, reconciliação ou varredura do outbox).
+    """
+
+    transaction_id: str
+    payment_status: PaymentStatus
+    status_detail: str | None = None
+    provider_updated_at: datetime | None = None
+    source: str | None = None
+    received_at: datetime = field(default_factory=utcnow)
+
+    @property
+    def occurred_at(self) -> datetime:
+        """
+        Chave de ordenação do evento: a data de atualização no Mercado Pago ou, sem ela, a data de recebimento.
+        """
+        return self.provider_updated_at or self.received_at
+
+
+def parse_provider_datetime(value: str | None) -> datetime | None:
+    """
+    Converte as datas do Mercado Pago (ex.: `2026-10-18T10:00:00.000-04:00`) para UTC.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=UTC)
+    return parsed.astimezone(UTC)
+
+
+def status_change_from_provider(transaction_id: str, payment_info: dict, payment_status: PaymentStatus, source: str) -> StatusChange:
+    return StatusChange(
+        transaction_id=str(transaction_id),
+        payment_status=payment_status,
+        status_detail=payment_info.get('status_detail'),
+        provider_updated_at=parse_provider_datetime(payment_info.get('date_last_updated')),
+        source=source,
+    )
+
+
+def publish_on_commit(session: AsyncSession, changes):
+    """
+    Registra na sessão as mudanças de status aplicadas, publicadas aos assinantes somente se a transação for confirmada.
+    """
+    session.info.setdefault(STATUS_CHANGES_KEY, []).extend(changes)
+
+
+def _supersedes(change: StatusChange, current_status: PaymentStatus, current_updated_at: datetime | None) -> bool:
+    if current_updated_at is None or as_utc(current_updated_at) < change.occurred_at:
+        return True
+    # A expiração local (`payments.expiry`) é uma inferência: a aprovação informada pelo Mercado Pago sempre prevalece,
+    # mesmo quando a notificação chega atrasada com uma data anterior ao vencimento
+    return current_status == PaymentStatus.EXPIRED and change.payment_status == PaymentStatus.PAID
+
+
+async def record_status_changes(session: AsyncSession, changes: list[StatusChange]) -> int:
+    """
+    Grava os eventos com um único INSERT e atualiza o status materializado em `Payment` com um único UPDATE,
+    apenas nos pagamentos cujo status atual é mais antigo que o evento mais recente do lote. Assim, uma notificação
+    atrasada não faz um pagamento pago voltar a pendente. Os totais de `payment_rollups` são ajustados na mesma
+    transação e as mudanças são publicadas aos assinantes após o commit. Não faz commit. Retorna quantos pagamentos mudaram.
+    """
+    if not changes:
+        return 0
+
+    await session.execute(
+        insert(PaymentEvent),
+        [
+            {
+                'transaction_id': change.transaction_id,
+                'payment_status': change.payment_status,
+                'status_detail': change.status_detail,
+                'provider_updated_at': change.provider_updated_at,
+                'source': change.source,
+                'received_at': change.received_at,
+            }
+            for change in changes
+        ],
+    )
+
+    latest: dict[str, StatusChange] = {}
+    for change in changes:
+        current = latest.get(change.transaction_id)
+        if current is None or change.occurred_at >= current.occurred_at:
+            latest[change.transaction_id] = change
+
+    # Trava os pagamentos (em ordem de `id`, sem deadlock) para comparar com o status atual e ajustar os totais
+    current = (
+        await session.execute(
+            select(Payment.transaction_id, Payment.payment_status, Payment.status_updated_at, Payment.payment_method, Payment.amount, Payment.created_at)
+            .where(Payment.transaction_id.in_(latest))
+            .order_by(Payment.id)
+            .with_for_update()
+        )
+    ).all()
+    applied = [row for row in current if _supersedes(latest[row.transaction_id], row.payment_status, row.status_updated_at)]
+    if not applied:
+        return 0
+
+    changed = {row.transaction_id: latest[row.transaction_id] for row in applied}
+    status_type, date_type = Payment.payment_status.type, Payment.status_updated_at.type
+    values = {
+        'payment_status': case({tid: literal(change.payment_status, status_type) for tid, change in changed.items()}, value=Payment.transaction_id),
+        'status_updated_at': case({tid: literal(change.occurred_at, date_type) for tid, change in changed.items()}, value=Payment.transaction_id),
+    }
+    paid = {tid: literal(change.occurred_at, date_type) for tid, change in changed.items() if change.payment_status == PaymentStatus.PAID}
+    if paid:
+        values['payment_date'] = case(paid, value=Payment.transaction_id, else_=Payment.payment_date)
+
+    await session.execute(update(Payment).where(Payment.transaction_id.in_(changed)).values(values).execution_options(synchronize_session=False))
+    publish_on_commit(session, changed.values())
+
+    deltas = RollupDeltas()
+    for row in applied:
+        deltas.move(row.created_at, row.payment_method, row.amount, row.payment_status, changed[row.transaction_id].payment_status)
+    await apply_rollup_deltas(session, deltas)
+    return len(applied)
+
+
+class PaymentEventWriter:
+    """
+    Agrupa os eventos de status gravados por tarefas concorrentes (workers da fila de webhooks) em lotes.
+
+    `record` enfileira o evento e aguarda o commit do lote em que ele foi incluído (group commit): um lote é gravado
+    quando atinge `max_batch_size` eventos ou `flush_interval` segundos após o primeiro evento, com um INSERT e um
+    UPDATE por lote em vez de uma transação por notificação. Fora do lifespan (writer parado), grava na hora.
+    """
+
+    def __init__(self, max_batch_size: int = settings.PAYMENT_EVENTS_BATCH_SIZE, flush_interval: float = settings.PAYMENT_EVENTS_FLUSH_INTERVAL):
+        self._max_batch_size = max_batch_size
+        self._flush_interval = flush_interval
+        self._pending: list[tuple[StatusChange, asyncio.Future]] = []
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        self._running = False
+
+        self._batches = 0
+        self._events = 0
+        self._applied = 0
+        self._errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def start(self):
+        if self._running:
+            return
+
+        self._running = True
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._flusher = asyncio.create_task(self._run(), name='payment-events-writer')
+
+    async def stop(self):
+        """
+        Grava os eventos ainda pendentes e encerra o writer.
+        """
+        if not self._running:
+            return
+
+        self._running = False
+        self._wakeup.set()
+        self._full.set()
+        await asyncio.gather(self._flusher, return_exceptions=True)
+        self._flusher = None
+
+    async def record(self, change: StatusChange):
+        if not self._running:
+            async with get_db() as session:
+                self._applied += await record_status_changes(session, [change])
+                await session.commit()
+            self._events += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((change, future))
+        self._wakeup.set()
+        if len(self._pending) >= self._max_batch_size:
+            self._full.set()
+        await future
+
+    def stats(self) -> dict:
+        return {
+            'running': self._running,
+            'pending': len(self._pending),
+            'batches': self._batches,
+            'events': self._events,
+            'applied': self._applied,
+            'errors': self._errors,
+            'avg_batch_size': round(self._events / self._batches, 2) if self._batches else 0.0,
+        }
+
+    # --- Métodos Internos Auxiliares ---
+
+    async def _run(self):
+        while self._running or self._pending:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            if self._running and len(self._pending) < self._max_batch_size:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self._flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch, self._pending = self._pending[: self._max_batch_size], self._pending[self._max_batch_size :]
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[StatusChange, asyncio.Future]]):
+        try:
+            async with get_db() as session:
+                applied = await record_status_changes(session, [change for change, _ in batch])
+                await session.commit()
+        except Exception as e:
+            logger.warning('Falha ao gravar lote de %s eventos de pagamento: %s', len(batch), e)
+            self._errors += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._batches += 1
+        self._events += len(batch)
+        self._applied += applied
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
@@ -0,0 +1,177 @@
+"""
+Expiração local dos pagamentos Pix e boleto pendentes cujo `date_of_expiration` já passou.
+
+O vencimento é gravado em `Payment.expires_at` no checkout; a varredura marca os pagamentos vencidos como `EXPIRED`
+com um único UPDATE por lote, sem consultar o Mercado Pago. Opcionalmente, uma amostra dos pagamentos expirados
+é conferida com `get_payment_info` para detectar divergências (ex.: um pagamento aprovado no último minuto).
+
+Uso:
+    python -m payments.expiry --batch-size 500 --grace 300 --verify-sample 10
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from sqlalchemy import insert, select, update
+
+from app.database import engine, get_db
+from app.settings import settings
+from payments.events import StatusChange, publish_on_commit, record_status_changes, status_change_from_provider
+from payments.models import Payment, PaymentEvent, PaymentStatus, utcnow
+from payments.notifications import map_payment_status
+from payments.rollups import RollupDeltas, apply_rollup_deltas
+from services.accounts import MercadoPagoAccounts
+
+logger = logging.getLogger(__name__)
+
+EXPIRED_STATUS_DETAIL = 'expired'
+# Status do Mercado Pago compatíveis com a expiração local
+CONSISTENT_STATUSES = frozenset({PaymentStatus.EXPIRED, PaymentStatus.CANCELLED})
+
+
+@dataclass
+class ExpiryReport:
+    batch_size: int
+    grace_seconds: float
+    batches: int = 0
+    expired: int = 0
+    verified: int = 0
+    mismatches: int = 0
+    errors: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    elapsed_seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'batch_size': self.batch_size,
+            'grace_seconds': self.grace_seconds,
+            'batches': self.batches,
+            'expired': self.expired,
+            'verified': self.verified,
+            'mismatches': self.mismatches,
+            'errors': self.errors,
+            'elapsed_seconds': round(self.elapsed_seconds, 3),
+        }
+
+
+async def expire_overdue_payments(
+    mp: MercadoPagoAccounts | None = None,
+    batch_size: int = settings.EXPIRY_BATCH_SIZE,
+    grace_seconds: float = settings.EXPIRY_GRACE_SECONDS,
+    verify_sample_size: int = settings.EXPIRY_VERIFY_SAMPLE_SIZE,
+    max_batches: int | None = None,
+) -> ExpiryReport:
+    """
+    Marca como `EXPIRED` os pagamentos pendentes vencidos há mais de `grace_seconds`, em lotes de `batch_size`.
+    Cada lote é uma transação com um UPDATE ... RETURNING (pelo índice (status, expires_at)), um INSERT no histórico
+    e o ajuste de `payment_rollups`. O status só muda se o pagamento ainda estiver pendente no momento do UPDATE,
+    então uma notificação gravada em paralelo não é sobrescrita.
+
+    Com `mp` e `verify_sample_size > 0`, até `verify_sample_size` pagamentos expirados na execução são consultados
+    no Mercado Pago; os que não estão expirados nem cancelados lá são registrados no log e, se tiverem um status
+    final (ex.: aprovado), gravados com `record_status_changes`.
+    """
+    report = ExpiryReport(batch_size=batch_size, grace_seconds=grace_seconds)
+    cutoff = utcnow() - timedelta(seconds=grace_seconds)
+    expired: list[tuple[str, str | None]] = []
+
+    while max_batches is None or report.batches < max_batches:
+        candidates = select(Payment.id).where(Payment.payment_status == PaymentStatus.PENDING, Payment.expires_at <= cutoff).order_by(Payment.expires_at).limit(batch_size).scalar_subquery()
+        async with get_db() as session:
+            rows = (
+                await session.execute(
+                    update(Payment)
+                    .where(Payment.id.in_(candidates), Payment.payment_status == PaymentStatus.PENDING)
+                    .values(payment_status=PaymentStatus.EXPIRED, status_updated_at=Payment.expires_at)
+                    .returning(Payment.transaction_id, Payment.payment_method, Payment.amount, Payment.created_at, Payment.account)
+                    .execution_options(synchronize_session=False)
+                )
+            ).all()
+
+            if not rows:
+                break
+
+            now = utcnow()
+            await session.execute(
+                insert(PaymentEvent),
+                [{'transaction_id': row.transaction_id, 'payment_status': PaymentStatus.EXPIRED, 'status_detail': EXPIRED_STATUS_DETAIL, 'source': 'expiry', 'received_at': now} for row in rows],
+            )
+            publish_on_commit(session, [StatusChange(row.transaction_id, PaymentStatus.EXPIRED, EXPIRED_STATUS_DETAIL, source='expiry', received_at=now) for row in rows])
+
+            deltas = RollupDeltas()
+            for row in rows:
+                deltas.move(row.created_at, row.payment_method, row.amount, PaymentStatus.PENDING, PaymentStatus.EXPIRED)
+            await apply_rollup_deltas(session, deltas)
+            await session.commit()
+
+        report.batches += 1
+        report.expired += len(rows)
+        expired.extend((row.transaction_id, row.account) for row in rows)
+
+    if mp is not None and verify_sample_size > 0 and expired:
+        await _verify_sample(mp, random.sample(expired, min(verify_sample_size, len(expired))), report)
+
+    report.elapsed_seconds = time.perf_counter() - report.started_at
+    if report.expired:
+        logger.info('Expiração local concluída: %s', report.as_dict())
+    return report
+
+
+async def _verify_sample(mp: MercadoPagoAccounts, payments: list[tuple[str, str | None]], report: ExpiryReport):
+    changes = []
+    for transaction_id, account in payments:
+        try:
+            payment_info = await mp.for_account(account).get_payment_info(transaction_id, use_cache=False)
+        except Exception as e:
+            logger.warning('Falha ao conferir a expiração do pagamento %s: %s', transaction_id, e)
+            report.errors += 1
+            continue
+
+        report.verified += 1
+        payment_status = map_payment_status(payment_info.get('status'), payment_info.get('status_detail'))
+        if payment_status in CONSISTENT_STATUSES:
+            continue
+
+        report.mismatches += 1
+        logger.warning('Pagamento %s expirado localmente está %s no Mercado Pago.', transaction_id, payment_info.get('status'))
+        if payment_status != PaymentStatus.PENDING:
+            changes.append(status_change_from_provider(transaction_id, payment_info, payment_status, source='expiry-verification'))
+
+    if changes:
+        async with get_db() as session:
+            await record_status_changes(session, changes)
+            await session.commit()
+
+
+async def _main(args: argparse.Namespace):
+    mp = None
+    if args.verify_sample > 0:
+        mp = MercadoPagoAccounts()
+        await mp.start()
+    try:
+        report = await expire_overdue_payments(mp, batch_size=args.batch_size, grace_seconds=args.grace, verify_sample_size=args.verify_sample, max_batches=args.max_batches)
+        for key, value in report.as_dict().items():
+            print(f'{key}: {value}')
+    finally:
+        if mp is not None:
+            await mp.close()
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=settings.EXPIRY_BATCH_SIZE)
+    parser.add_argument('--grace', type=float, default=settings.EXPIRY_GRACE_SECONDS, help='Tolerância (em segundos) após o vencimento')
+    parser.add_argument('--verify-sample', type=int, default=settings.EXPIRY_VERIFY_SAMPLE_SIZE, help='Pagamentos expirados conferidos no Mercado Pago (0 = nenhum)')
+    parser.add_argument('--max-batches', type=int, default=None)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,91 @@
+import hashlib
+import uuid
+from datetime import timedelta
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import dialect_insert, get_db
+from app.settings import settings
+from payments.models import IdempotencyKey, utcnow
+
+
+class IdempotencyKeyConflictError(ValueError):
+    """
+    A mesma chave de idempotência foi reutilizada com uma requisição diferente.
+    """
+
+
+def request_fingerprint(endpoint: str, data: BaseModel, exclude: set[str] | None = None) -> str:
+    """
+    Hash da requisição, usado para garantir que uma chave só seja reaproveitada com o mesmo corpo.
+    Campos em `exclude` (ex.: tokens de uso único gerados a cada tentativa) não entram no hash.
+    """
+    return hashlib.sha256(f'{endpoint}:{data.model_dump_json(exclude=exclude)}'.encode()).hexdigest()
+
+
+def upstream_idempotency_key(key: str | None, fingerprint: str) -> str | None:
+    """
+    Chave enviada ao Mercado Pago em `X-Idempotency-Key`, derivada da chave do cliente e do hash da requisição.
+    Repetições da mesma requisição reaproveitam o pagamento já criado no Mercado Pago, mesmo que a resposta
+    ainda não tenha sido armazenada localmente.
+    """
+    if not key:
+        return None
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f'{key}:{fingerprint}'))
+
+
+async def find_stored_response(session: AsyncSession, key: str, fingerprint: str) -> Response | None:
+    """
+    Retorna a resposta armazenada para a chave, se existir e não tiver expirado.
+    """
+    stored = await session.scalar(select(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.expires_at > utcnow()))
+
+    if stored is None:
+        return None
+
+    if stored.request_hash != fingerprint:
+        raise IdempotencyKeyConflictError('Idempotency-Key já utilizada com uma requisição diferente.')
+
+    return Response(content=stored.response_body, status_code=stored.status_code, media_type='application/json', headers={'Idempotent-Replayed': 'true'})
+
+
+async def store_response(session: AsyncSession, key: str, fingerprint: str, response_body: str | bytes, status_code: int = 200):
+    """
+    Armazena a resposta da chave na sessão atual, para ser gravada no mesmo commit do pagamento.
+    """
+    if isinstance(response_body, bytes):
+        response_body = response_body.decode()
+    now = utcnow()
+    stmt = dialect_insert(session, IdempotencyKey).values(
+        key=key,
+        request_hash=fingerprint,
+        status_code=status_code,
+        response_body=response_body,
+        created_at=now,
+        expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.key],
+        set_={
+            'request_hash': stmt.excluded.request_hash,
+            'status_code': stmt.excluded.status_code,
+            'response_body': stmt.excluded.response_body,
+            'created_at': stmt.excluded.created_at,
+            'expires_at': stmt.excluded.expires_at,
+        },
+        where=IdempotencyKey.expires_at <= now,
+    )
+    await session.execute(stmt)
+
+
+async def purge_expired_keys() -> int:
+    """
+    Remove as chaves de idempotência expiradas. Executada periodicamente pelo lifespan da aplicação.
+    """
+    async with get_db() as session:
+        result = await session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= utcnow()))
+        await session.commit()
+    return result.rowcount
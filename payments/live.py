@@ -0,0 +1,225 @@
+"""
+Status dos pagamentos em tempo real para a página de checkout (Server-Sent Events).
+
+Cada worker mantém um pub/sub em memória: as conexões SSE assinam o `transaction_id` e ficam ociosas, sem consultar
+o banco, até que um commit altere o status do pagamento. Os commits que mudam status (`record_status_changes` e a
+expiração local) registram as mudanças na sessão, publicadas pelo hook `after_commit` do SQLAlchemy.
+
+As notificações processadas por outro worker do gunicorn não passam por este processo; para elas, uma tarefa
+periódica consulta de uma só vez o status de todos os pagamentos assinados no worker.
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from datetime import datetime
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from starlette.types import Receive, Scope, Send
+
+from app.database import get_db
+from app.metrics import PAYMENT_STREAM_CONNECTIONS
+from app.serialization import dumps
+from app.settings import settings
+from payments.events import STATUS_CHANGES_KEY, StatusChange
+from payments.models import Payment, PaymentStatus
+from payments.notifications import FINAL_PAYMENT_STATUSES
+
+# Limite de parâmetros por consulta na sincronização entre workers
+SYNC_CHUNK_SIZE = 1000
+
+
+class PaymentStatusBroker:
+    """
+    Pub/sub em memória dos status de pagamento, com no máximo `max_connections` conexões por worker.
+    A vaga de cada conexão é reservada com `reserve` antes de a resposta começar e liberada com `release` no fim.
+
+    Cada assinatura recebe apenas o status mais recente (fila de tamanho 1): uma conexão lenta nunca acumula eventos.
+    Status repetidos (ex.: a mesma mudança vinda do commit local e da sincronização) são publicados uma única vez.
+    """
+
+    def __init__(self, max_connections: int = settings.PAYMENT_STREAM_MAX_CONNECTIONS):
+        self._max_connections = max_connections
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._last_status: dict[str, PaymentStatus] = {}
+        self._connections = 0
+        self._running = False
+
+        self._published = 0
+        self._rejected = 0
+
+    @property
+    def at_capacity(self) -> bool:
+        return self._connections >= self._max_connections
+
+    def start(self):
+        """
+        Passa a publicar as mudanças de status gravadas pelas sessões do SQLAlchemy.
+        """
+        if self._running:
+            return
+
+        self._running = True
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', self._after_rollback)
+
+    def stop(self):
+        """
+        Para de publicar e encerra as conexões abertas.
+        """
+        if not self._running:
+            return
+
+        self._running = False
+        event.remove(Session, 'after_commit', self._after_commit)
+        event.remove(Session, 'after_rollback', self._after_rollback)
+        for queues in self._subscribers.values():
+            for queue in queues:
+                self._offer(queue, None)
+
+    def reserve(self) -> bool:
+        """
+        Reserva a vaga de uma conexão, sem `await` entre a verificação do limite e a contagem: conexões simultâneas
+        não ultrapassam `max_connections`. Retorna False (e conta a recusa) quando o worker está no limite.
+        """
+        if self.at_capacity:
+            self._rejected += 1
+            return False
+
+        self._connections += 1
+        PAYMENT_STREAM_CONNECTIONS.inc()
+        return True
+
+    def release(self):
+        self._connections -= 1
+        PAYMENT_STREAM_CONNECTIONS.dec()
+
+    def subscribe(self, transaction_id: str, current_status: PaymentStatus) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(transaction_id, set()).add(queue)
+        self._last_status.setdefault(transaction_id, current_status)
+        return queue
+
+    def unsubscribe(self, transaction_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(transaction_id)
+        if queues is None or queue not in queues:
+            return
+
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[transaction_id]
+            self._last_status.pop(transaction_id, None)
+
+    def subscribed(self) -> list[str]:
+        return list(self._subscribers)
+
+    def publish(self, change: StatusChange):
+        queues = self._subscribers.get(change.transaction_id)
+        if not queues or self._last_status.get(change.transaction_id) == change.payment_status:
+            return
+
+        self._last_status[change.transaction_id] = change.payment_status
+        message = {'transaction_id': change.transaction_id, 'payment_status': change.payment_status, 'status_detail': change.status_detail, 'status_updated_at': change.occurred_at}
+        for queue in queues:
+            self._offer(queue, message)
+        self._published += 1
+
+    def stats(self) -> dict:
+        return {
+            'connections': self._connections,
+            'max_connections': self._max_connections,
+            'payments': len(self._subscribers),
+            'published': self._published,
+            'rejected': self._rejected,
+        }
+
+    # --- Métodos Internos Auxiliares ---
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, message: dict | None):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    def _after_commit(self, session: Session):
+        for change in session.info.pop(STATUS_CHANGES_KEY, ()):
+            self.publish(change)
+
+    def _after_rollback(self, session: Session):
+        session.info.pop(STATUS_CHANGES_KEY, None)
+
+
+class PaymentStatusStreamResponse(StreamingResponse):
+    """
+    Resposta SSE que libera a vaga reservada no broker quando termina. A liberação fica aqui, e não no gerador de eventos,
+    porque o gerador nem chega a ser iniciado se o cliente desconectar antes do início da resposta.
+    """
+
+    def __init__(self, broker: PaymentStatusBroker, content: AsyncIterator[bytes], **kwargs):
+        super().__init__(content, media_type='text/event-stream', **kwargs)
+        self._broker = broker
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._broker.release()
+
+
+def _event(name: str, data: dict) -> bytes:
+    return b'event: ' + name.encode() + b'\ndata: ' + dumps(data) + b'\n\n'
+
+
+async def stream_payment_status(broker: PaymentStatusBroker, transaction_id: str, payment_status: PaymentStatus, status_updated_at: datetime | None) -> AsyncIterator[bytes]:
+    """
+    Eventos SSE de um pagamento: o status atual, cada mudança seguinte e comentários de keepalive. A conexão é encerrada
+    quando o status se torna final ou após `PAYMENT_STREAM_MAX_SECONDS` (o navegador reconecta após `retry`).
+    Servido por `PaymentStatusStreamResponse`, com a vaga reservada antes em `broker.reserve()`.
+    """
+    queue = broker.subscribe(transaction_id, payment_status)
+    try:
+        yield f'retry: {settings.PAYMENT_STREAM_RETRY_MS}\n\n'.encode()
+        yield _event('status', {'transaction_id': transaction_id, 'payment_status': payment_status, 'status_detail': None, 'status_updated_at': status_updated_at})
+        if payment_status in FINAL_PAYMENT_STATUSES:
+            return
+
+        deadline = time.monotonic() + settings.PAYMENT_STREAM_MAX_SECONDS
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=min(settings.PAYMENT_STREAM_KEEPALIVE_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield b': keepalive\n\n'
+                continue
+
+            if message is None:
+                return
+            yield _event('status', message)
+            if message['payment_status'] in FINAL_PAYMENT_STATUSES:
+                return
+    finally:
+        broker.unsubscribe(transaction_id, queue)
+
+
+async def sync_subscribed_statuses(broker: PaymentStatusBroker) -> int:
+    """
+    Publica as mudanças gravadas por outros workers, com uma consulta por lote de até `SYNC_CHUNK_SIZE` pagamentos
+    assinados neste worker (nenhuma sem assinantes). Retorna quantos pagamentos não estão mais pendentes.
+    """
+    transaction_ids = broker.subscribed()
+    if not transaction_ids:
+        return 0
+
+    found = 0
+    async with get_db() as session:
+        for i in range(0, len(transaction_ids), SYNC_CHUNK_SIZE):
+            rows = await session.execute(
+                select(Payment.transaction_id, Payment.payment_status, Payment.status_updated_at).where(
+                    Payment.transaction_id.in_(transaction_ids[i : i + SYNC_CHUNK_SIZE]), Payment.payment_status != PaymentStatus.PENDING
+                )
+            )
+            for row in rows:
+                broker.publish(StatusChange(row.transaction_id, row.payment_status, provider_updated_at=row.status_updated_at, source='sync'))
+                found += 1
+    return found
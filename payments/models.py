@@ -1,11 +1,25 @@
 import enum
+from datetime import UTC, datetime
 
-from sqlalchemy import Enum
+from sqlalchemy import DateTime, Enum, Index, String, Text, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import table_registry
 
 
+def utcnow() -> datetime:
+    return datetime.now(UTC)
+
+
+def as_utc(value: datetime) -> datetime:
+    """
+    O SQLite devolve datas sem fuso horário; todas as datas são gravadas em UTC.
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=UTC)
+    return value
+
+
 class PaymentMethod(enum.Enum):
     CREDIT_CARD = 'credit_card'
     PIX = 'pix'
@@ -17,14 +31,128 @@ class PaymentStatus(enum.Enum):
     PAID = 'paid'
     FAILED = 'failed'
     CANCELLED = 'cancelled'
+    EXPIRED = 'expired'
+
+
+class PaymentIntentStatus(enum.Enum):
+    PENDING = 'pending'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+
+class WebhookEventStatus(enum.Enum):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
 
 
 @table_registry.mapped_as_dataclass
 class Payment:
     __tablename__ = 'payments'
+    __table_args__ = (
+        Index('ix_payments_payment_status_created_at', 'payment_status', 'created_at'),
+        Index('ix_payments_status_method_created_at', 'payment_status', 'payment_method', 'created_at'),
+        Index('ix_payments_payment_status_expires_at', 'payment_status', 'expires_at'),
+    )
 
     id: Mapped[int] = mapped_column(init=False, primary_key=True)
     amount: Mapped[float]
-    transaction_id: Mapped[str]
+    transaction_id: Mapped[str] = mapped_column(index=True, unique=True)
     payment_method: Mapped[PaymentMethod] = mapped_column(Enum(PaymentMethod), nullable=False)
     payment_status: Mapped[PaymentStatus] = mapped_column(Enum(PaymentStatus), default=PaymentStatus.PENDING, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), init=False, insert_default=utcnow, server_default=func.now())
+    # Status materializado a partir de `payment_events`: data (no Mercado Pago) do evento que definiu o status atual
+    status_updated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+    payment_date: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+    # `date_of_expiration` enviado ao Mercado Pago (Pix e boleto); usado pela expiração local em `payments.expiry`
+    expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+    # Conta do Mercado Pago (`MercadoPagoAccount.name`) que criou o pagamento; nulo nos pagamentos da conta padrão anteriores a `MP_ACCOUNTS`
+    account: Mapped[str | None] = mapped_column(String(64), default=None)
+
+
+@table_registry.mapped_as_dataclass
+class PaymentEvent:
+    """
+    Histórico de status de um pagamento (somente inserções). Cada notificação, checkout ou reconciliação grava um
+    evento; o status em `Payment` só é atualizado quando o evento é mais recente no Mercado Pago que o status atual.
+    """
+
+    __tablename__ = 'payment_events'
+
+    id: Mapped[int] = mapped_column(init=False, primary_key=True)
+    transaction_id: Mapped[str] = mapped_column(index=True)
+    payment_status: Mapped[PaymentStatus] = mapped_column(Enum(PaymentStatus), nullable=False)
+    status_detail: Mapped[str | None] = mapped_column(default=None)
+    provider_updated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+    source: Mapped[str | None] = mapped_column(String(32), default=None)
+    received_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default_factory=utcnow)
+
+
+@table_registry.mapped_as_dataclass
+class PaymentRollup:
+    """
+    Quantidade e valor total dos pagamentos por hora de criação (UTC), método e status. Mantida incrementalmente
+    a cada pagamento criado, removido ou com status alterado; pode ser reconstruída com `python -m payments.rollups`.
+    """
+
+    __tablename__ = 'payment_rollups'
+
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    payment_method: Mapped[PaymentMethod] = mapped_column(Enum(PaymentMethod), primary_key=True)
+    payment_status: Mapped[PaymentStatus] = mapped_column(Enum(PaymentStatus), primary_key=True)
+    count: Mapped[int] = mapped_column(default=0)
+    total_amount: Mapped[float] = mapped_column(default=0.0)
+
+
+@table_registry.mapped_as_dataclass
+class PaymentIntent:
+    """
+    Intenção de pagamento (outbox), gravada antes da chamada ao Mercado Pago e concluída junto com o `Payment`.
+    Intenções que continuam pendentes indicam que o resultado da chamada não chegou ao banco e são reparadas
+    pela varredura em `payments.outbox`, que busca o pagamento no Mercado Pago pelo `external_reference`.
+    """
+
+    __tablename__ = 'payment_intents'
+    __table_args__ = (Index('ix_payment_intents_status_created_at', 'status', 'created_at'),)
+
+    id: Mapped[int] = mapped_column(init=False, primary_key=True)
+    external_reference: Mapped[str] = mapped_column(String(64), unique=True)
+    amount: Mapped[float]
+    payment_method: Mapped[PaymentMethod] = mapped_column(Enum(PaymentMethod), nullable=False)
+    status: Mapped[PaymentIntentStatus] = mapped_column(Enum(PaymentIntentStatus), default=PaymentIntentStatus.PENDING, nullable=False)
+    transaction_id: Mapped[str | None] = mapped_column(default=None)
+    attempts: Mapped[int] = mapped_column(default=0)
+    last_error: Mapped[str | None] = mapped_column(Text, default=None)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default_factory=utcnow)
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+    account: Mapped[str | None] = mapped_column(String(64), default=None)
+
+
+@table_registry.mapped_as_dataclass
+class WebhookEvent:
+    __tablename__ = 'webhook_events'
+    __table_args__ = (Index('ix_webhook_events_status_available_at', 'status', 'available_at'),)
+
+    id: Mapped[int] = mapped_column(init=False, primary_key=True)
+    action: Mapped[str | None]
+    resource_id: Mapped[str | None]
+    payload: Mapped[str] = mapped_column(Text)
+    status: Mapped[WebhookEventStatus] = mapped_column(Enum(WebhookEventStatus), default=WebhookEventStatus.PENDING, nullable=False)
+    attempts: Mapped[int] = mapped_column(default=0)
+    last_error: Mapped[str | None] = mapped_column(Text, default=None)
+    received_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default_factory=utcnow)
+    available_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default_factory=utcnow)
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+
+
+@table_registry.mapped_as_dataclass
+class IdempotencyKey:
+    __tablename__ = 'idempotency_keys'
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String(64))
+    status_code: Mapped[int]
+    response_body: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
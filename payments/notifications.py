@@ -0,0 +1,146 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.settings import settings
+from payments.events import PaymentEventWriter, record_status_changes, status_change_from_provider
+from payments.models import PaymentStatus
+from payments.repository import get_payment_by_transaction_id
+from payments.webhook_queue import ClaimedEvent
+from services.accounts import MercadoPagoAccounts
+
+FINAL_PAYMENT_STATUSES = frozenset({PaymentStatus.PAID, PaymentStatus.FAILED, PaymentStatus.CANCELLED, PaymentStatus.EXPIRED})
+
+
+class PaymentNotFoundError(LookupError):
+    """
+    Notificação recebida para um pagamento que ainda não existe no banco de dados.
+    """
+
+
+def map_payment_status(status: str | None, status_detail: str | None) -> PaymentStatus:
+    """
+    Converte o status retornado pelo Mercado Pago para o status interno do pagamento.
+    """
+    if status == 'approved' and status_detail == 'accredited':
+        return PaymentStatus.PAID
+    if status == 'rejected':
+        return PaymentStatus.FAILED
+    if status == 'cancelled':
+        # Pix e boleto não pagos até o `date_of_expiration` são cancelados pelo Mercado Pago com o detalhe `expired`
+        return PaymentStatus.EXPIRED if status_detail == 'expired' else PaymentStatus.CANCELLED
+    return PaymentStatus.PENDING
+
+
+class NotificationCoalescer:
+    """
+    Agrupa notificações duplicadas de um mesmo pagamento dentro do processo.
+
+    Notificações simultâneas para o mesmo `transaction_id` compartilham uma única consulta à API e uma
+    única escrita (single-flight). Depois que um pagamento atinge um status final, novas notificações
+    recebidas dentro de `window` segundos são descartadas. A memória é limitada a `max_entries`
+    pagamentos recentes (LRU).
+    """
+
+    def __init__(self, window: float = settings.WEBHOOK_DEDUP_WINDOW_SECONDS, max_entries: int = settings.WEBHOOK_DEDUP_MAX_ENTRIES):
+        self._window = window
+        self._max_entries = max_entries
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._recent: OrderedDict[str, float] = OrderedDict()
+
+        self._executed = 0
+        self._coalesced = 0
+        self._deduplicated = 0
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[PaymentStatus]]) -> PaymentStatus | None:
+        """
+        Executa `fn` para a chave, reaproveitando uma execução em andamento ou descartando duplicatas recentes.
+        """
+        now = time.monotonic()
+        self._evict(now)
+
+        seen_at = self._recent.get(key)
+        if seen_at is not None and now - seen_at < self._window:
+            self._deduplicated += 1
+            return None
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            self._coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await fn()
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # evita o aviso de exceção não recuperada quando não há outras notificações aguardando
+            raise
+        else:
+            future.set_result(result)
+            self._executed += 1
+            if result in FINAL_PAYMENT_STATUSES:
+                self._remember(key, now)
+            return result
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        return {
+            'executed': self._executed,
+            'coalesced': self._coalesced,
+            'deduplicated': self._deduplicated,
+            'in_flight': len(self._in_flight),
+            'recent': len(self._recent),
+        }
+
+    # --- Métodos Internos Auxiliares ---
+
+    def _remember(self, key: str, now: float):
+        self._recent[key] = now
+        self._recent.move_to_end(key)
+        while len(self._recent) > self._max_entries:
+            self._recent.popitem(last=False)
+
+    def _evict(self, now: float):
+        while self._recent:
+            key, seen_at = next(iter(self._recent.items()))
+            if now - seen_at < self._window:
+                break
+            del self._recent[key]
+
+
+async def process_payment_notification(mp: MercadoPagoAccounts, session: AsyncSession, transaction_id: str, writer: PaymentEventWriter | None = None) -> PaymentStatus:
+    """
+    Consulta o pagamento na conta do Mercado Pago que o criou e grava o status recebido no histórico (`payment_events`).
+    Com `writer`, o evento entra no próximo lote do writer e esta função retorna após o commit do lote; sem ele,
+    as alterações ficam pendentes na sessão e o commit é responsabilidade de quem chama.
+    """
+    payment = await get_payment_by_transaction_id(session, transaction_id)
+
+    if not payment:
+        raise PaymentNotFoundError(f'Pagamento {transaction_id} não encontrado.')
+
+    payment_info = await mp.for_account(payment.account).get_payment_info(transaction_id, use_cache=False)
+
+    payment_status = map_payment_status(payment_info.get('status'), payment_info.get('status_detail'))
+    change = status_change_from_provider(transaction_id, payment_info, payment_status, source='webhook')
+    if writer is not None:
+        await writer.record(change)
+    else:
+        await record_status_changes(session, [change])
+    return payment_status
+
+
+async def handle_webhook_event(mp: MercadoPagoAccounts, coalescer: NotificationCoalescer, writer: PaymentEventWriter | None, session: AsyncSession, event: ClaimedEvent):
+    """
+    Handler da fila de webhooks: processa apenas atualizações de pagamento, agrupando duplicatas por `transaction_id`.
+    """
+    if event.action != 'payment.updated' or not event.resource_id:
+        return
+
+    await coalescer.run(event.resource_id, lambda: process_payment_notification(mp, session, event.resource_id, writer))
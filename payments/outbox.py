@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import uuid
+from datetime import timedelta
+
+from sqlalchemy import case, delete, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.settings import settings
+from payments.models import PaymentIntent, PaymentIntentStatus, PaymentMethod, as_utc, utcnow
+from payments.notifications import map_payment_status
+from payments.repository import upsert_payments
+from services.accounts import MercadoPagoAccounts
+
+logger = logging.getLogger(__name__)
+
+EXTERNAL_REFERENCE_PREFIXES = {
+    PaymentMethod.PIX: 'ID-PIX',
+    PaymentMethod.BOLETO: 'ID-BOLETO',
+    PaymentMethod.CREDIT_CARD: 'ID-CARTAO',
+}
+
+
+def new_external_reference(payment_method: PaymentMethod) -> str:
+    return f'{EXTERNAL_REFERENCE_PREFIXES[payment_method]}-{uuid.uuid4()}'
+
+
+async def open_intents(session: AsyncSession, intents: list[tuple[PaymentMethod, float, str]]) -> list[str]:
+    """
+    Grava as intenções de pagamento (método, valor e conta do Mercado Pago) com um único INSERT e faz o commit,
+    antes de qualquer chamada ao Mercado Pago.
+    Retorna os `external_reference` que devem ser enviados ao Mercado Pago, na mesma ordem de `intents`.
+    """
+    now = utcnow()
+    rows = [
+        PaymentIntent(external_reference=new_external_reference(payment_method), amount=amount, payment_method=payment_method, created_at=now, account=account)
+        for payment_method, amount, account in intents
+    ]
+    session.add_all(rows)
+    await session.commit()
+    return [row.external_reference for row in rows]
+
+
+async def open_intent(session: AsyncSession, payment_method: PaymentMethod, amount: float, account: str) -> str:
+    return (await open_intents(session, [(payment_method, amount, account)]))[0]
+
+
+async def complete_intents(session: AsyncSession, transaction_ids: dict[str, str], only_pending: bool = False):
+    """
+    Marca as intenções como concluídas, com o `transaction_id` do Mercado Pago de cada `external_reference`.
+    Não faz commit: deve ser gravado no mesmo commit do `Payment` correspondente.
+    """
+    if not transaction_ids:
+        return
+
+    stmt = (
+        update(PaymentIntent)
+        .where(PaymentIntent.external_reference.in_(transaction_ids))
+        .values(
+            status=PaymentIntentStatus.COMPLETED,
+            transaction_id=case({reference: literal(str(transaction_id)) for reference, transaction_id in transaction_ids.items()}, value=PaymentIntent.external_reference),
+            completed_at=utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if only_pending:
+        stmt = stmt.where(PaymentIntent.status == PaymentIntentStatus.PENDING)
+    await session.execute(stmt)
+
+
+async def complete_intent(session: AsyncSession, external_reference: str, transaction_id: str):
+    await complete_intents(session, {external_reference: transaction_id})
+
+
+async def fail_intents(session: AsyncSession, errors: dict[str, str]):
+    """
+    Marca como falha as intenções ainda pendentes cuja chamada ao Mercado Pago falhou de forma definitiva (nenhum
+    pagamento foi criado), para que a varredura não as procure no Mercado Pago. Não faz commit.
+    """
+    if not errors:
+        return
+
+    await session.execute(
+        update(PaymentIntent)
+        .where(PaymentIntent.external_reference.in_(errors), PaymentIntent.status == PaymentIntentStatus.PENDING)
+        .values(
+            status=PaymentIntentStatus.FAILED,
+            completed_at=utcnow(),
+            attempts=PaymentIntent.attempts + 1,
+            last_error=case({reference: literal(error) for reference, error in errors.items()}, value=PaymentIntent.external_reference),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def sweep_payment_intents(
+    mp: MercadoPagoAccounts,
+    min_age_seconds: float = settings.OUTBOX_SWEEP_MIN_AGE_SECONDS,
+    abandon_after_seconds: float = settings.OUTBOX_ABANDON_AFTER_SECONDS,
+    batch_size: int = settings.OUTBOX_SWEEP_BATCH_SIZE,
+    concurrency: int = settings.OUTBOX_SWEEP_CONCURRENCY,
+) -> dict:
+    """
+    Repara intenções que ficaram pendentes (a chamada ao Mercado Pago falhou, expirou ou o commit final não aconteceu).
+    Cada intenção é buscada pelo `external_reference` na conta do Mercado Pago que a criou: se o pagamento existir, o `Payment` é gravado e a
+    intenção concluída; se não existir após `abandon_after_seconds`, a intenção é marcada como falha.
+    Intenções finalizadas há mais de `OUTBOX_RETENTION_SECONDS` são removidas.
+    """
+    now = utcnow()
+    cutoff = now - timedelta(seconds=min_age_seconds)
+    abandon_cutoff = now - timedelta(seconds=abandon_after_seconds)
+    semaphore = asyncio.Semaphore(concurrency)
+    report = {'checked': 0, 'completed': 0, 'failed': 0, 'errors': 0, 'purged': 0}
+    last_id = 0
+
+    async def search(intent: PaymentIntent) -> tuple[PaymentIntent, dict | None, str | None]:
+        async with semaphore:
+            try:
+                results = await mp.for_account(intent.account).search_payments_by_external_reference(intent.external_reference)
+            except Exception as e:
+                return intent, None, str(e)
+        return intent, (results[0] if results else None), None
+
+    while True:
+        async with get_db() as session:
+            intents = (
+                await session.scalars(
+                    select(PaymentIntent)
+                    .where(PaymentIntent.status == PaymentIntentStatus.PENDING, PaymentIntent.created_at <= cutoff, PaymentIntent.id > last_id)
+                    .order_by(PaymentIntent.id)
+                    .limit(batch_size)
+                )
+            ).all()
+            if not intents:
+                break
+            last_id = intents[-1].id
+
+            found, abandoned, retry = {}, [], {}
+            for intent, payment, error in await asyncio.gather(*(search(intent) for intent in intents)):
+                if payment is not None:
+                    found[intent.external_reference] = (intent, payment)
+                elif error is None and as_utc(intent.created_at) <= abandon_cutoff:
+                    abandoned.append(intent.external_reference)
+                else:
+                    retry[intent.external_reference] = error or 'Pagamento ainda não encontrado no Mercado Pago.'
+                    report['errors'] += error is not None
+
+            await upsert_payments(
+                session,
+                [
+                    {
+                        'amount': intent.amount,
+                        'transaction_id': payment['id'],
+                        'payment_method': intent.payment_method,
+                        'payment_status': map_payment_status(payment.get('status'), payment.get('status_detail')),
+                        'payment_info': payment,
+                        'account': intent.account,
+                    }
+                    for intent, payment in found.values()
+                ],
+                source='outbox',
+            )
+            await complete_intents(session, {reference: payment['id'] for reference, (_, payment) in found.items()}, only_pending=True)
+
+            if abandoned:
+                await session.execute(
+                    update(PaymentIntent)
+                    .where(PaymentIntent.external_reference.in_(abandoned), PaymentIntent.status == PaymentIntentStatus.PENDING)
+                    .values(status=PaymentIntentStatus.FAILED, completed_at=utcnow(), last_error='Pagamento não encontrado no Mercado Pago.')
+                    .execution_options(synchronize_session=False)
+                )
+            if retry:
+                await session.execute(
+                    update(PaymentIntent)
+                    .where(PaymentIntent.external_reference.in_(retry))
+                    .values(attempts=PaymentIntent.attempts + 1, last_error=case({reference: literal(error) for reference, error in retry.items()}, value=PaymentIntent.external_reference))
+                    .execution_options(synchronize_session=False)
+                )
+            await session.commit()
+
+        report['checked'] += len(intents)
+        report['completed'] += len(found)
+        report['failed'] += len(abandoned)
+
+    async with get_db() as session:
+        result = await session.execute(
+            delete(PaymentIntent).where(
+                PaymentIntent.status != PaymentIntentStatus.PENDING,
+                PaymentIntent.completed_at <= now - timedelta(seconds=settings.OUTBOX_RETENTION_SECONDS),
+            )
+        )
+        await session.commit()
+    report['purged'] = result.rowcount
+
+    if report['checked']:
+        logger.info('Varredura de intenções de pagamento: %s', report)
+    return report
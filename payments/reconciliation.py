@@ -0,0 +1,203 @@
+"""
+Reconciliação de pagamentos pendentes cuja notificação do Mercado Pago foi perdida.
+
+A reconciliação também grava o `date_of_expiration` do Mercado Pago em `expires_at` quando ele está nulo (pagamentos
+anteriores à coluna), o que coloca esses Pix e boletos na expiração local.
+
+Só entram pagamentos pendentes com idade entre `RECONCILIATION_MIN_AGE_SECONDS` e `RECONCILIATION_MAX_AGE_SECONDS`
+e ainda não vencidos: Pix e boletos com `expires_at` no passado ficam com a expiração local (`payments.expiry`), e
+pagamentos mais antigos que a idade máxima não voltam a ser consultados a cada execução.
+
+Uso:
+    python -m payments.reconciliation --batch-size 200 --min-age 900 --max-age 604800 --concurrency 10 --rate 20
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from sqlalchemy import case, literal, or_, select, update
+
+from app.database import engine, get_db
+from app.settings import settings
+from payments.events import StatusChange, parse_provider_datetime, record_status_changes, status_change_from_provider
+from payments.models import Payment, PaymentStatus, utcnow
+from payments.notifications import map_payment_status
+from services.accounts import MercadoPagoAccounts
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Espaça o início das chamadas para no máximo `rate` por segundo (`rate <= 0` desativa o limite).
+    """
+
+    def __init__(self, rate: float):
+        self._interval = 1 / rate if rate > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self._interval:
+            return
+
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self._interval
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+@dataclass
+class ReconciliationReport:
+    batch_size: int
+    concurrency: int
+    max_rate: float
+    batches: int = 0
+    checked: int = 0
+    updated: int = 0
+    expirations: int = 0
+    errors: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def payments_per_second(self) -> float:
+        return self.checked / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'batch_size': self.batch_size,
+            'concurrency': self.concurrency,
+            'max_rate': self.max_rate,
+            'batches': self.batches,
+            'checked': self.checked,
+            'updated': self.updated,
+            'expirations': self.expirations,
+            'errors': self.errors,
+            'elapsed_seconds': round(self.elapsed_seconds, 3),
+            'payments_per_second': round(self.payments_per_second, 2),
+        }
+
+
+async def reconcile_pending_payments(
+    mp: MercadoPagoAccounts,
+    batch_size: int = settings.RECONCILIATION_BATCH_SIZE,
+    min_age_seconds: float = settings.RECONCILIATION_MIN_AGE_SECONDS,
+    max_age_seconds: float = settings.RECONCILIATION_MAX_AGE_SECONDS,
+    concurrency: int = settings.RECONCILIATION_CONCURRENCY,
+    max_rate: float = settings.RECONCILIATION_MAX_RATE,
+    max_batches: int | None = None,
+) -> ReconciliationReport:
+    """
+    Percorre, em lotes por `id`, os pagamentos pendentes criados há mais de `min_age_seconds` e menos de `max_age_seconds`
+    (`0` = sem limite) que ainda não venceram, consulta cada um
+    na conta do Mercado Pago que o criou (no máximo `concurrency` chamadas simultâneas e `max_rate` por segundo) e aplica as mudanças
+    de status de cada lote com `record_status_changes` (um INSERT no histórico e um UPDATE por lote). No mesmo commit,
+    preenche `expires_at` dos pagamentos do lote que ainda não o têm.
+    """
+    report = ReconciliationReport(batch_size=batch_size, concurrency=concurrency, max_rate=max_rate)
+    now = utcnow()
+    filters = [
+        Payment.payment_status == PaymentStatus.PENDING,
+        Payment.created_at <= now - timedelta(seconds=min_age_seconds),
+        or_(Payment.expires_at.is_(None), Payment.expires_at > now),
+    ]
+    if max_age_seconds > 0:
+        filters.append(Payment.created_at > now - timedelta(seconds=max_age_seconds))
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(max_rate)
+    last_id = 0
+
+    async def fetch_status(transaction_id: str, account: str | None) -> tuple[StatusChange | None, dict]:
+        async with semaphore:
+            await limiter.wait()
+            try:
+                payment_info = await mp.for_account(account).get_payment_info(transaction_id, use_cache=False)
+            except Exception as e:
+                logger.warning('Falha ao consultar o pagamento %s na reconciliação: %s', transaction_id, e)
+                report.errors += 1
+                return None, {}
+        payment_status = map_payment_status(payment_info.get('status'), payment_info.get('status_detail'))
+        return status_change_from_provider(transaction_id, payment_info, payment_status, source='reconciliation'), payment_info
+
+    while max_batches is None or report.batches < max_batches:
+        async with get_db() as session:
+            rows = (
+                await session.execute(select(Payment.id, Payment.transaction_id, Payment.account, Payment.expires_at).where(*filters, Payment.id > last_id).order_by(Payment.id).limit(batch_size))
+            ).all()
+
+        if not rows:
+            break
+
+        last_id = rows[-1].id
+        fetched = await asyncio.gather(*(fetch_status(row.transaction_id, row.account) for row in rows))
+        changes = [change for change, _ in fetched if change is not None and change.payment_status != PaymentStatus.PENDING]
+        expirations = {
+            row.transaction_id: expires_at
+            for row, (_, payment_info) in zip(rows, fetched)
+            if row.expires_at is None and (expires_at := parse_provider_datetime(payment_info.get('date_of_expiration'))) is not None
+        }
+
+        if changes or expirations:
+            async with get_db() as session:
+                if expirations:
+                    await session.execute(
+                        update(Payment)
+                        .where(Payment.transaction_id.in_(expirations), Payment.expires_at.is_(None))
+                        .values(expires_at=case({transaction_id: literal(expires_at) for transaction_id, expires_at in expirations.items()}, value=Payment.transaction_id))
+                        .execution_options(synchronize_session=False)
+                    )
+                    report.expirations += len(expirations)
+                if changes:
+                    report.updated += await record_status_changes(session, changes)
+                await session.commit()
+
+        report.batches += 1
+        report.checked += len(rows)
+
+    report.elapsed_seconds = time.perf_counter() - report.started_at
+    logger.info('Reconciliação concluída: %s', report.as_dict())
+    return report
+
+
+async def _main(args: argparse.Namespace):
+    mp = MercadoPagoAccounts()
+    await mp.start()
+    try:
+        report = await reconcile_pending_payments(
+            mp,
+            batch_size=args.batch_size,
+            min_age_seconds=args.min_age,
+            max_age_seconds=args.max_age,
+            concurrency=args.concurrency,
+            max_rate=args.rate,
+            max_batches=args.max_batches,
+        )
+        for key, value in report.as_dict().items():
+            print(f'{key}: {value}')
+    finally:
+        await mp.close()
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=settings.RECONCILIATION_BATCH_SIZE)
+    parser.add_argument('--min-age', type=float, default=settings.RECONCILIATION_MIN_AGE_SECONDS, help='Idade mínima (em segundos) do pagamento pendente')
+    parser.add_argument('--max-age', type=float, default=settings.RECONCILIATION_MAX_AGE_SECONDS, help='Idade máxima (em segundos) do pagamento pendente (0 = sem limite)')
+    parser.add_argument('--concurrency', type=int, default=settings.RECONCILIATION_CONCURRENCY)
+    parser.add_argument('--rate', type=float, default=settings.RECONCILIATION_MAX_RATE, help='Máximo de consultas por segundo (0 = sem limite)')
+    parser.add_argument('--max-batches', type=int, default=None)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,108 @@
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import dialect_insert
+from payments.events import parse_provider_datetime, record_status_changes, status_change_from_provider
+from payments.models import Payment, PaymentMethod, PaymentStatus, utcnow
+from payments.rollups import RollupDeltas, apply_rollup_deltas
+
+
+def select_payments(
+    cursor: int | None = None,
+    payment_status: PaymentStatus | None = None,
+    payment_method: PaymentMethod | None = None,
+    min_amount: float | None = None,
+    max_amount: float | None = None,
+) -> Select:
+    """
+    Monta a consulta de pagamentos filtrada e paginada por keyset (`id` > `cursor`), em ordem crescente de `id`.
+    """
+    stmt = select(Payment).order_by(Payment.id)
+
+    if cursor is not None:
+        stmt = stmt.where(Payment.id > cursor)
+    if payment_status is not None:
+        stmt = stmt.where(Payment.payment_status == payment_status)
+    if payment_method is not None:
+        stmt = stmt.where(Payment.payment_method == payment_method)
+    if min_amount is not None:
+        stmt = stmt.where(Payment.amount >= min_amount)
+    if max_amount is not None:
+        stmt = stmt.where(Payment.amount <= max_amount)
+
+    return stmt
+
+
+async def get_payment_by_transaction_id(session: AsyncSession, transaction_id: str) -> Payment | None:
+    """
+    Busca um pagamento pelo ID da transação do Mercado Pago, usando o índice único `ix_payments_transaction_id`.
+    """
+    return await session.scalar(select(Payment).where(Payment.transaction_id == str(transaction_id)))
+
+
+async def upsert_payment(
+    session: AsyncSession,
+    amount: float,
+    transaction_id: str,
+    payment_method: PaymentMethod,
+    payment_status: PaymentStatus = PaymentStatus.PENDING,
+    payment_info: dict | None = None,
+    source: str | None = None,
+    account: str | None = None,
+):
+    """
+    Insere o pagamento ou, se o `transaction_id` já existir, apenas registra o status recebido no histórico.
+    Evita linhas duplicadas quando a mesma transação é gravada mais de uma vez (ex.: retentativas do cliente).
+    """
+    await upsert_payments(
+        session,
+        [{'amount': amount, 'transaction_id': transaction_id, 'payment_method': payment_method, 'payment_status': payment_status, 'payment_info': payment_info, 'account': account}],
+        source=source,
+    )
+
+
+async def upsert_payments(session: AsyncSession, payments: list[dict], source: str | None = None):
+    """
+    Versão em lote de `upsert_payment`: grava todos os pagamentos novos com um único INSERT ... ON CONFLICT DO NOTHING
+    (o valor de uma transação não muda no Mercado Pago) e soma os novos pagamentos em `payment_rollups`.
+    Cada item deve ter `amount`, `transaction_id`, `payment_method` e, opcionalmente, `payment_status`,
+    `payment_info` (a resposta do Mercado Pago, de onde vêm `status_detail` e `date_last_updated`) e `account`.
+    O status de cada pagamento também é gravado no histórico (`payment_events`); em pagamentos já existentes,
+    ele só é alterado se for mais recente que o status atual.
+    """
+    # Um mesmo `transaction_id` entra uma única vez no INSERT; prevalece o último
+    changes = {
+        str(payment['transaction_id']): (
+            payment,
+            status_change_from_provider(payment['transaction_id'], payment.get('payment_info') or {}, payment.get('payment_status', PaymentStatus.PENDING), source),
+        )
+        for payment in payments
+    }
+    if not changes:
+        return
+
+    now = utcnow()
+    rows = [
+        {
+            'amount': payment['amount'],
+            'transaction_id': change.transaction_id,
+            'payment_method': payment['payment_method'],
+            'payment_status': change.payment_status,
+            'status_updated_at': change.occurred_at,
+            'payment_date': change.occurred_at if change.payment_status == PaymentStatus.PAID else None,
+            'created_at': now,
+            'expires_at': parse_provider_datetime((payment.get('payment_info') or {}).get('date_of_expiration')),
+            'account': payment.get('account'),
+        }
+        for payment, change in changes.values()
+    ]
+    stmt = dialect_insert(session, Payment).values(rows).on_conflict_do_nothing(index_elements=[Payment.transaction_id]).returning(Payment.transaction_id)
+    inserted = set((await session.scalars(stmt)).all())
+
+    deltas = RollupDeltas()
+    for row in rows:
+        if row['transaction_id'] in inserted:
+            deltas.add(row['created_at'], row['payment_method'], row['payment_status'], row['amount'])
+    await apply_rollup_deltas(session, deltas)
+
+    await record_status_changes(session, [change for _, change in changes.values()])
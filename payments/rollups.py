@@ -0,0 +1,211 @@
+"""
+Totais de pagamentos pré-calculados por hora, método e status (`payment_rollups`), usados pelos relatórios.
+
+Os totais são atualizados incrementalmente na mesma transação que cria o pagamento ou altera o seu status.
+A reconstrução recalcula tudo a partir de `payments` e pode ser executada com a aplicação em funcionamento.
+
+Uso:
+    python -m payments.rollups
+"""
+
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Literal
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import dialect_insert, engine, get_db
+from payments.models import Payment, PaymentMethod, PaymentRollup, PaymentStatus, as_utc
+
+# Cada linha do upsert usa 5 parâmetros; lotes de 1000 ficam bem abaixo do limite do PostgreSQL (32767)
+UPSERT_CHUNK_SIZE = 1000
+REBUILD_YIELD_PER = 5000
+
+Granularity = Literal['hour', 'day']
+
+
+def hour_bucket(value: datetime) -> datetime:
+    return as_utc(value).replace(minute=0, second=0, microsecond=0)
+
+
+def truncate(value: datetime, granularity: Granularity) -> datetime:
+    bucket = hour_bucket(value)
+    return bucket.replace(hour=0) if granularity == 'day' else bucket
+
+
+class RollupDeltas:
+    """
+    Variações de quantidade e valor por (hora, método, status), acumuladas antes de serem gravadas em `payment_rollups`.
+    """
+
+    def __init__(self):
+        self._deltas: dict[tuple[datetime, PaymentMethod, PaymentStatus], list] = defaultdict(lambda: [0, 0.0])
+
+    def add(self, created_at: datetime, payment_method: PaymentMethod, payment_status: PaymentStatus, amount: float, count: int = 1):
+        delta = self._deltas[(hour_bucket(created_at), payment_method, payment_status)]
+        delta[0] += count
+        delta[1] += amount * count
+
+    def move(self, created_at: datetime, payment_method: PaymentMethod, amount: float, old_status: PaymentStatus, new_status: PaymentStatus):
+        if old_status == new_status:
+            return
+        self.add(created_at, payment_method, old_status, amount, count=-1)
+        self.add(created_at, payment_method, new_status, amount)
+
+    def rows(self) -> list[dict]:
+        # Ordem fixa das chaves: transações concorrentes atualizam as mesmas linhas na mesma ordem, sem deadlock
+        return [
+            {'bucket': bucket, 'payment_method': payment_method, 'payment_status': payment_status, 'count': count, 'total_amount': amount}
+            for (bucket, payment_method, payment_status), (count, amount) in sorted(self._deltas.items(), key=lambda item: (item[0][0], item[0][1].name, item[0][2].name))
+            if count or amount
+        ]
+
+
+async def apply_rollup_deltas(session: AsyncSession, deltas: RollupDeltas):
+    """
+    Soma as variações aos totais existentes com INSERT ... ON CONFLICT DO UPDATE. Não faz commit.
+    """
+    rows = deltas.rows()
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = dialect_insert(session, PaymentRollup).values(rows[i : i + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PaymentRollup.bucket, PaymentRollup.payment_method, PaymentRollup.payment_status],
+            set_={'count': PaymentRollup.count + stmt.excluded.count, 'total_amount': PaymentRollup.total_amount + stmt.excluded.total_amount},
+        )
+        await session.execute(stmt)
+
+
+def _filter(stmt, model, payment_method: PaymentMethod | None, payment_status: PaymentStatus | None):
+    if payment_status is not None:
+        stmt = stmt.where(model.payment_status == payment_status)
+    if payment_method is not None:
+        stmt = stmt.where(model.payment_method == payment_method)
+    return stmt
+
+
+async def summarize(
+    session: AsyncSession,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    payment_method: PaymentMethod | None = None,
+    payment_status: PaymentStatus | None = None,
+) -> list[dict]:
+    """
+    Quantidade e valor total por método e status dos pagamentos criados em [`start`, `end`).
+    As horas cheias do intervalo vêm de `payment_rollups`; as frações de hora nas pontas são somadas diretamente
+    em `payments`, pelo índice (status, método, created_at).
+    """
+    start = as_utc(start) if start else None
+    end = as_utc(end) if end else None
+    rollup_start = rollup_end = None
+    if start:
+        rollup_start = hour_bucket(start)
+        if rollup_start < start:
+            rollup_start += timedelta(hours=1)
+    if end:
+        rollup_end = hour_bucket(end)
+
+    totals: dict[tuple[PaymentMethod, PaymentStatus], list] = defaultdict(lambda: [0, 0.0])
+    partial_ranges = []
+
+    if rollup_start and rollup_end and rollup_start >= rollup_end:
+        partial_ranges.append((start, end))
+    else:
+        if start and start < rollup_start:
+            partial_ranges.append((start, rollup_start))
+        if end and rollup_end < end:
+            partial_ranges.append((rollup_end, end))
+
+        stmt = select(PaymentRollup.payment_method, PaymentRollup.payment_status, func.sum(PaymentRollup.count), func.sum(PaymentRollup.total_amount))
+        if rollup_start:
+            stmt = stmt.where(PaymentRollup.bucket >= rollup_start)
+        if rollup_end:
+            stmt = stmt.where(PaymentRollup.bucket < rollup_end)
+        stmt = _filter(stmt, PaymentRollup, payment_method, payment_status).group_by(PaymentRollup.payment_method, PaymentRollup.payment_status)
+        for method, status, count, amount in await session.execute(stmt):
+            totals[method, status][0] += count
+            totals[method, status][1] += amount
+
+    for range_start, range_end in partial_ranges:
+        stmt = select(Payment.payment_method, Payment.payment_status, func.count(Payment.id), func.sum(Payment.amount)).where(Payment.created_at >= range_start, Payment.created_at < range_end)
+        stmt = _filter(stmt, Payment, payment_method, payment_status).group_by(Payment.payment_method, Payment.payment_status)
+        for method, status, count, amount in await session.execute(stmt):
+            totals[method, status][0] += count
+            totals[method, status][1] += amount
+
+    return [
+        {'payment_method': method, 'payment_status': status, 'count': count, 'total_amount': round(amount, 2)}
+        for (method, status), (count, amount) in sorted(totals.items(), key=lambda item: (item[0][0].name, item[0][1].name))
+        if count
+    ]
+
+
+async def timeseries(
+    session: AsyncSession,
+    granularity: Granularity = 'day',
+    start: datetime | None = None,
+    end: datetime | None = None,
+    payment_method: PaymentMethod | None = None,
+    payment_status: PaymentStatus | None = None,
+) -> list[dict]:
+    """
+    Quantidade e valor total por hora ou dia (UTC), método e status, lidos apenas de `payment_rollups`.
+    `start` e `end` são arredondados para o início da hora.
+    """
+    stmt = select(PaymentRollup.bucket, PaymentRollup.payment_method, PaymentRollup.payment_status, PaymentRollup.count, PaymentRollup.total_amount).order_by(PaymentRollup.bucket)
+    if start:
+        stmt = stmt.where(PaymentRollup.bucket >= hour_bucket(start))
+    if end:
+        stmt = stmt.where(PaymentRollup.bucket < hour_bucket(end))
+    stmt = _filter(stmt, PaymentRollup, payment_method, payment_status)
+
+    points: dict[tuple[datetime, PaymentMethod, PaymentStatus], list] = defaultdict(lambda: [0, 0.0])
+    for bucket, method, status, count, amount in await session.execute(stmt):
+        point = points[truncate(bucket, granularity), method, status]
+        point[0] += count
+        point[1] += amount
+
+    return [
+        {'bucket': bucket, 'payment_method': method, 'payment_status': status, 'count': count, 'total_amount': round(amount, 2)}
+        for (bucket, method, status), (count, amount) in sorted(points.items(), key=lambda item: (item[0][0], item[0][1].name, item[0][2].name))
+        if count
+    ]
+
+
+async def rebuild_rollups() -> int:
+    """
+    Recalcula `payment_rollups` a partir de `payments` em uma única transação e retorna quantas linhas foram gravadas.
+    A tabela é esvaziada antes da leitura dos pagamentos: no PostgreSQL, transações concorrentes que atualizam os totais
+    esperam pelo commit e somam as suas variações ao resultado reconstruído.
+    """
+    async with get_db() as session:
+        await session.execute(delete(PaymentRollup))
+
+        deltas = RollupDeltas()
+        result = await session.stream(select(Payment.created_at, Payment.payment_method, Payment.payment_status, Payment.amount).execution_options(yield_per=REBUILD_YIELD_PER))
+        async for created_at, payment_method, payment_status, amount in result:
+            deltas.add(created_at, payment_method, payment_status, amount)
+
+        await apply_rollup_deltas(session, deltas)
+        await session.commit()
+
+    return len(deltas.rows())
+
+
+async def _main():
+    try:
+        print(f'payment_rollups: {await rebuild_rollups()} linhas')
+    finally:
+        await engine.dispose()
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+    asyncio.run(_main())
+
+
+if __name__ == '__main__':
+    main()
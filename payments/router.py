@@ -1,168 +1,595 @@
-from fastapi import APIRouter, HTTPException, Request, status
-from fastapi.responses import JSONResponse
+import asyncio
+import logging
+import math
+from functools import partial
+from typing import Annotated, Any, Callable
+
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 
-from app.dependencies import T_Session
-from payments.models import Payment, PaymentMethod, PaymentStatus
-from payments.schemas import BoletoPaymentSchema, CardPaymentSchema, PaymentPublicSchema, PixPaymentSchema
-from services.mercadopago import MercadoPagoService
-
-mp = MercadoPagoService()
+from app.database import get_db
+from app.dependencies import T_FullResponse, T_IdempotencyKey, T_Session
+from app.metrics import CHECKOUT_ADMISSION_REJECTIONS
+from app.ratelimit import create_rate_limit_backend
+from app.serialization import JSONDecodeError, RawJSONResponse, dumps, json_body, loads
+from app.settings import settings
+from payments.events import PaymentEventWriter
+from payments.idempotency import IdempotencyKeyConflictError, find_stored_response, request_fingerprint, store_response, upstream_idempotency_key
+from payments.live import PaymentStatusBroker, PaymentStatusStreamResponse, stream_payment_status
+from payments.models import Payment, PaymentEvent, PaymentMethod, PaymentStatus, WebhookEvent
+from payments.notifications import NotificationCoalescer, handle_webhook_event
+from payments.outbox import complete_intent, complete_intents, fail_intents, open_intent, open_intents
+from payments.repository import get_payment_by_transaction_id, select_payments, upsert_payment, upsert_payments
+from payments.rollups import RollupDeltas, apply_rollup_deltas, summarize, timeseries
+from payments.schemas import (
+    BatchCheckoutResultSchema,
+    BatchCheckoutSchema,
+    BatchItemResultSchema,
+    BatchItemValidationError,
+    BatchPixItemSchema,
+    BoletoPaymentSchema,
+    CardPaymentSchema,
+    CheckoutResponseSchema,
+    PaymentHistorySchema,
+    PaymentListQuerySchema,
+    PaymentLiveStatusSchema,
+    PaymentPageSchema,
+    PaymentPublicSchema,
+    PixPaymentSchema,
+    ReportQuerySchema,
+    ReportSummarySchema,
+    ReportTimeseriesSchema,
+    TimeseriesQuerySchema,
+    validate_batch_item,
+)
+from payments.webhook_queue import WebhookQueue
+from services.accounts import MercadoPagoAccounts, NoAccountAvailableError, PaymentMethodNotSupportedError
+from services.mercadopago import MercadoPagoRejectedError, MercadoPagoService
+from services.resilience import CircuitOpenError
+
+mp = MercadoPagoAccounts(budget=create_rate_limit_backend())
+notification_coalescer = NotificationCoalescer()
+payment_events = PaymentEventWriter()
+payment_status_broker = PaymentStatusBroker()
+webhook_queue = WebhookQueue(handler=partial(handle_webhook_event, mp, notification_coalescer, payment_events))
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix='/payments', tags=['payments'])
 
+STREAM_BATCH_SIZE = 1000
+
+# Falhas em que, com certeza, nenhum pagamento foi criado no Mercado Pago (circuito aberto antes do envio ou erro 4xx).
+# As demais (timeout, erro de rede, 5xx, erro local ao tratar a resposta) são ambíguas: a intenção continua pendente
+# para a varredura do outbox, que procura o pagamento no Mercado Pago.
+FINAL_CHECKOUT_ERRORS = (CircuitOpenError, MercadoPagoRejectedError)
+
+
+async def _find_replay(session, idempotency_key: str | None, fingerprint: str, compact: Callable[[Any], str] | None = None):
+    """
+    Resposta já armazenada para a `Idempotency-Key` enviada pelo cliente, se houver.
+    A resposta é armazenada completa; com `compact`, é resumida antes de ser devolvida.
+    """
+    if not idempotency_key:
+        return None
+
+    try:
+        stored = await find_stored_response(session, idempotency_key, fingerprint)
+    except IdempotencyKeyConflictError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    if stored is None or compact is None:
+        return stored
+    return RawJSONResponse(compact(loads(stored.body)), status_code=stored.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def _compact_payment(payment: dict) -> str:
+    return CheckoutResponseSchema.from_provider(payment).model_dump_json(exclude_none=True)
+
+
+def _compact_batch(result: dict) -> str:
+    for item in result['results']:
+        if item.get('response') is not None:
+            item['response'] = CheckoutResponseSchema.from_provider(item['response']).model_dump(exclude_none=True)
+    return dumps(result).decode()
+
+
+def _checkout_response(response: dict, body: bytes, full: bool) -> RawJSONResponse:
+    """
+    Resposta do checkout: resumida por padrão ou, com `?full=1`, os bytes recebidos do Mercado Pago.
+    """
+    return RawJSONResponse(body if full else _compact_payment(response))
+
+
+def _batch_item_method(item: Any) -> PaymentMethod | None:
+    """
+    Método de pagamento de um item inválido do lote, quando o próprio `payment_method` é válido.
+    """
+    try:
+        return PaymentMethod(item.get('payment_method'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _circuit_open(e: CircuitOpenError) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={'Retry-After': str(math.ceil(e.retry_after))})
+
+
+async def _route(payment_method: str, public_key: str | None = None) -> MercadoPagoService:
+    """
+    Conta do Mercado Pago do checkout, escolhida antes de gravar a intenção. Sem conta disponível (circuit breaker aberto,
+    limite de simultâneas ou orçamento de requisições esgotado) responde `503` com `Retry-After`; sem conta que aceite
+    o método, `422`. Com `public_key`, só a conta dessa chave pode ser usada.
+    """
+    try:
+        if public_key:
+            return await mp.admit(mp.for_public_key(public_key))
+        return await mp.route(payment_method)
+    except PaymentMethodNotSupportedError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except NoAccountAvailableError as e:
+        CHECKOUT_ADMISSION_REJECTIONS.labels(reason='mp_account').inc()
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={'Retry-After': str(max(1, math.ceil(e.retry_after)))})
+
 
-@router.post('/checkout/pix')
-async def checkout_pix(data: PixPaymentSchema, session: T_Session):
+async def _fail_intent(session, external_reference: str, error: Exception):
+    """
+    Encerra a intenção como falha quando o erro é definitivo (`FINAL_CHECKOUT_ERRORS`), sem esperar pela varredura.
+    """
+    if not isinstance(error, FINAL_CHECKOUT_ERRORS):
+        return
+    try:
+        await session.rollback()
+        await fail_intents(session, {external_reference: str(error)})
+        await session.commit()
+    except Exception:
+        logger.exception('Erro ao encerrar a intenção de pagamento %s.', external_reference)
+
+
+async def _pay_with_pix(service: MercadoPagoService, data: PixPaymentSchema, idempotency_key: str | None, external_reference: str) -> dict:
+    return await service.pay_with_pix(
+        amount=data.transaction_amount,
+        description=data.description,
+        payer_email=data.payer_email,
+        payer_cpf=data.payer_cpf,
+        idempotency_key=idempotency_key,
+        external_reference=external_reference,
+    )
+
+
+async def _pay_with_boleto(service: MercadoPagoService, data: BoletoPaymentSchema, idempotency_key: str | None, external_reference: str) -> dict:
+    address_data = {
+        'zip_code': data.zip_code,
+        'street_name': data.street_name,
+        'street_number': data.street_number,
+        'neighborhood': data.neighborhood,
+        'city': data.city,
+        'federal_unit': data.federal_unit,
+    }
+
+    return await service.pay_with_boleto(
+        amount=data.transaction_amount,
+        description=data.description,
+        payer_email=data.payer_email,
+        payer_cpf=data.payer_cpf,
+        payer_first_name=data.payer_first_name,
+        payer_last_name=data.payer_last_name,
+        payer_address=address_data,
+        idempotency_key=idempotency_key,
+        external_reference=external_reference,
+    )
+
+
+@router.post('/checkout/pix', response_model=CheckoutResponseSchema, response_model_exclude_none=True)
+async def checkout_pix(data: PixPaymentSchema, session: T_Session, idempotency_key: T_IdempotencyKey = None, full: T_FullResponse = False):
     """
     Endpoint responsável por processar pagamentos com PIX via Mercado Pago.
     """
+    fingerprint = request_fingerprint('pix', data)
+    if stored := await _find_replay(session, idempotency_key, fingerprint, compact=None if full else _compact_payment):
+        return stored
+
+    service = await _route('pix')
+    external_reference = await open_intent(session, PaymentMethod.PIX, data.transaction_amount, service.name)
+
     try:
-        response = await mp.pay_with_pix(
+        response = await _pay_with_pix(service, data, upstream_idempotency_key(idempotency_key, fingerprint), external_reference)
+
+        await upsert_payment(
+            session,
             amount=data.transaction_amount,
-            description=data.description,
-            payer_email=data.payer_email,
-            payer_cpf=data.payer_cpf,
+            transaction_id=response.get('id'),
+            payment_method=PaymentMethod.PIX,
+            payment_info=response,
+            source='checkout',
+            account=service.name,
         )
-
-        payment = Payment(amount=data.transaction_amount, payment_method=PaymentMethod.PIX, transaction_id=str(response.get('id')))
-        session.add(payment)
+        await complete_intent(session, external_reference, response.get('id'))
+        # A resposta completa é armazenada com os bytes recebidos do Mercado Pago, sem serializar de novo
+        body = json_body(response)
+        if idempotency_key:
+            await store_response(session, idempotency_key, fingerprint, body)
         await session.commit()
-        await session.refresh(payment)
 
-        return JSONResponse(response)
+        return _checkout_response(response, body, full)
+
+    except CircuitOpenError as e:
+        await _fail_intent(session, external_reference, e)
+        raise _circuit_open(e)
 
     except Exception as e:
-        print(str(e))
+        logger.exception('Erro ao processar pagamento PIX.')
+        await _fail_intent(session, external_reference, e)
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
 
 
-@router.post('/checkout/boleto')
-async def checkout_boleto(data: BoletoPaymentSchema, session: T_Session):
+@router.post('/checkout/boleto', response_model=CheckoutResponseSchema, response_model_exclude_none=True)
+async def checkout_boleto(data: BoletoPaymentSchema, session: T_Session, idempotency_key: T_IdempotencyKey = None, full: T_FullResponse = False):
     """
     Endpoint responsável por processar pagamentos com boleto via Mercado Pago.
     """
+    fingerprint = request_fingerprint('boleto', data)
+    if stored := await _find_replay(session, idempotency_key, fingerprint, compact=None if full else _compact_payment):
+        return stored
+
+    service = await _route('boleto')
+    external_reference = await open_intent(session, PaymentMethod.BOLETO, data.transaction_amount, service.name)
+
     try:
-        address_data = {
-            'zip_code': data.zip_code,
-            'street_name': data.street_name,
-            'street_number': data.street_number,
-            'neighborhood': data.neighborhood,
-            'city': data.city,
-            'federal_unit': data.federal_unit,
-        }
-
-        response = await mp.pay_with_boleto(
+        response = await _pay_with_boleto(service, data, upstream_idempotency_key(idempotency_key, fingerprint), external_reference)
+
+        await upsert_payment(
+            session,
             amount=data.transaction_amount,
-            description=data.description,
-            payer_email=data.payer_email,
-            payer_cpf=data.payer_cpf,
-            payer_first_name=data.payer_first_name,
-            payer_last_name=data.payer_last_name,
-            payer_address=address_data,
+            transaction_id=response.get('id'),
+            payment_method=PaymentMethod.BOLETO,
+            payment_info=response,
+            source='checkout',
+            account=service.name,
         )
-
-        payment = Payment(amount=data.transaction_amount, payment_method=PaymentMethod.BOLETO, transaction_id=str(response.get('id')))
-        session.add(payment)
+        await complete_intent(session, external_reference, response.get('id'))
+        # A resposta completa é armazenada com os bytes recebidos do Mercado Pago, sem serializar de novo
+        body = json_body(response)
+        if idempotency_key:
+            await store_response(session, idempotency_key, fingerprint, body)
         await session.commit()
-        await session.refresh(payment)
 
-        return JSONResponse(response)
+        return _checkout_response(response, body, full)
+
+    except CircuitOpenError as e:
+        await _fail_intent(session, external_reference, e)
+        raise _circuit_open(e)
 
     except Exception as e:
+        logger.exception('Erro ao processar pagamento com boleto.')
+        await _fail_intent(session, external_reference, e)
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
 
 
-@router.post('/checkout/card')
-async def checkout_card(data: CardPaymentSchema, session: T_Session):
+@router.post('/checkout/card', response_model=CheckoutResponseSchema, response_model_exclude_none=True)
+async def checkout_card(data: CardPaymentSchema, session: T_Session, idempotency_key: T_IdempotencyKey = None, full: T_FullResponse = False):
     """
     Endpoint responsável por processar pagamentos com cartão de crédito via Mercado Pago.
     """
+    # O token do cartão é de uso único e muda a cada tentativa do cliente, então não entra no hash
+    fingerprint = request_fingerprint('card', data, exclude={'token'})
+    if stored := await _find_replay(session, idempotency_key, fingerprint, compact=None if full else _compact_payment):
+        return stored
+
+    # Um token gerado no navegador só vale na conta da chave pública usada pela página de checkout
+    service = await _route('card', public_key=settings.MP_PUBLIC_KEY if data.token else None)
+    external_reference = await open_intent(session, PaymentMethod.CREDIT_CARD, data.transaction_amount, service.name)
+
     try:
-        card_data = {
-            'card_number': data.card_number,
-            'expiration_month': data.expiration_month,
-            'expiration_year': data.expiration_year,
-            'security_code': data.security_code,
-            'cardholder': {
-                'name': data.cardholder_name,
-                'identification': {'type': 'CPF', 'number': data.payer_cpf},
-            },
-        }
-
-        response = await mp.pay_with_card(
+        card_data = None
+        if data.token is None:
+            card_data = {
+                'card_number': data.card_number,
+                'expiration_month': data.expiration_month,
+                'expiration_year': data.expiration_year,
+                'security_code': data.security_code,
+                'cardholder': {
+                    'name': data.cardholder_name,
+                    'identification': {'type': 'CPF', 'number': data.payer_cpf},
+                },
+            }
+
+        response = await service.pay_with_card(
             amount=data.transaction_amount,
             description=data.description,
             payer_email=data.payer_email,
             payer_cpf=data.payer_cpf,
             installments=data.installments,
             card_data=card_data,
+            card_token=data.token,
+            payment_method_id=data.payment_method_id,
+            issuer_id=data.issuer_id,
+            idempotency_key=upstream_idempotency_key(idempotency_key, fingerprint),
+            external_reference=external_reference,
         )
 
-        status = response.get('status')
+        mp_status = response.get('status')
 
-        payment = Payment(amount=data.transaction_amount, payment_method=PaymentMethod.CREDIT_CARD, transaction_id=str(response.get('id')))
-
-        if status == 'approved':
-            payment.payment_status = PaymentStatus.PAID
-        elif status == 'rejected':
-            payment.payment_status = PaymentStatus.FAILED
+        if mp_status == 'approved':
+            payment_status = PaymentStatus.PAID
+        elif mp_status == 'rejected':
+            payment_status = PaymentStatus.FAILED
         else:
-            payment.payment_status = PaymentStatus.PENDING
+            payment_status = PaymentStatus.PENDING
 
-        session.add(payment)
+        await upsert_payment(
+            session,
+            amount=data.transaction_amount,
+            transaction_id=response.get('id'),
+            payment_method=PaymentMethod.CREDIT_CARD,
+            payment_status=payment_status,
+            payment_info=response,
+            source='checkout',
+            account=service.name,
+        )
+        await complete_intent(session, external_reference, response.get('id'))
+        # A resposta completa é armazenada com os bytes recebidos do Mercado Pago, sem serializar de novo
+        body = json_body(response)
+        if idempotency_key:
+            await store_response(session, idempotency_key, fingerprint, body)
         await session.commit()
-        await session.refresh(payment)
 
-        return JSONResponse(response)
+        return _checkout_response(response, body, full)
+
+    except CircuitOpenError as e:
+        await _fail_intent(session, external_reference, e)
+        raise _circuit_open(e)
 
     except Exception as e:
+        logger.exception('Erro ao processar pagamento com cartão.')
+        await _fail_intent(session, external_reference, e)
         raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
 
 
+@router.post('/checkout/batch', response_model=BatchCheckoutResultSchema)
+async def checkout_batch(data: BatchCheckoutSchema, session: T_Session, idempotency_key: T_IdempotencyKey = None, full: T_FullResponse = False):
+    """
+    Endpoint para criar vários pagamentos PIX e boleto em uma única requisição.
+    As criações no Mercado Pago rodam em paralelo (até `CHECKOUT_BATCH_CONCURRENCY` por vez) e os pagamentos
+    criados são gravados com um único INSERT. Falhas, inclusive itens inválidos (`422`), são reportadas por item, sem afetar os demais.
+    A resposta de cada item é resumida como nos demais checkouts, exceto com `?full=1`.
+    """
+    fingerprint = request_fingerprint('batch', data)
+    if stored := await _find_replay(session, idempotency_key, fingerprint, compact=None if full else _compact_batch):
+        return stored
+
+    # Itens inválidos são reportados com 422 e não geram intenção nem chamada ao Mercado Pago
+    items, invalid = {}, {}
+    for index, raw_item in enumerate(data.items):
+        try:
+            items[index] = validate_batch_item(raw_item)
+        except BatchItemValidationError as e:
+            invalid[index] = BatchItemResultSchema(index=index, payment_method=_batch_item_method(raw_item), status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, error=str(e))
+
+    # Cada item consome o orçamento da sua conta; itens sem conta disponível são recusados sem gravar intenção
+    services, unavailable = {}, {}
+    for index, item in items.items():
+        try:
+            services[index] = await mp.route(item.payment_method)
+        except (PaymentMethodNotSupportedError, NoAccountAvailableError) as e:
+            unavailable[index] = e
+    admitted = [index for index in items if index not in unavailable]
+    references = await open_intents(session, [(PaymentMethod(items[index].payment_method), items[index].transaction_amount, services[index].name) for index in admitted])
+    external_references = dict(zip(admitted, references))
+    final_errors = {}
+    semaphore = asyncio.Semaphore(settings.CHECKOUT_BATCH_CONCURRENCY)
+
+    async def create(index: int, item) -> BatchItemResultSchema:
+        if index in invalid:
+            return invalid[index]
+
+        payment_method = PaymentMethod(item.payment_method)
+        # Cada item tem a sua própria chave no Mercado Pago, derivada da chave do lote e da posição do item
+        item_key = upstream_idempotency_key(idempotency_key, f'{fingerprint}:{index}')
+        if index in unavailable:
+            error = unavailable[index]
+            status_code = status.HTTP_422_UNPROCESSABLE_ENTITY if isinstance(error, PaymentMethodNotSupportedError) else status.HTTP_503_SERVICE_UNAVAILABLE
+            return BatchItemResultSchema(index=index, payment_method=payment_method, status_code=status_code, error=str(error))
+
+        async with semaphore:
+            try:
+                if isinstance(item, BatchPixItemSchema):
+                    response = await _pay_with_pix(services[index], item, item_key, external_references[index])
+                else:
+                    response = await _pay_with_boleto(services[index], item, item_key, external_references[index])
+            except CircuitOpenError as e:
+                final_errors[external_references[index]] = str(e)
+                return BatchItemResultSchema(index=index, payment_method=payment_method, status_code=status.HTTP_503_SERVICE_UNAVAILABLE, error=str(e))
+            except Exception as e:
+                logger.warning('Erro ao processar o item %s do checkout em lote: %s', index, e)
+                if isinstance(e, FINAL_CHECKOUT_ERRORS):
+                    final_errors[external_references[index]] = str(e)
+                return BatchItemResultSchema(index=index, payment_method=payment_method, status_code=status.HTTP_502_BAD_GATEWAY, error=str(e))
+
+        return BatchItemResultSchema(
+            index=index,
+            payment_method=payment_method,
+            status_code=status.HTTP_201_CREATED,
+            transaction_id=str(response.get('id')),
+            response=response,
+        )
+
+    results = await asyncio.gather(*(create(index, items.get(index)) for index in range(len(data.items))))
+
+    created = [(result, items[result.index]) for result in results if result.transaction_id is not None]
+    await upsert_payments(
+        session,
+        [
+            {
+                'amount': item.transaction_amount,
+                'transaction_id': result.transaction_id,
+                'payment_method': result.payment_method,
+                'payment_info': result.response,
+                'account': services[result.index].name,
+            }
+            for result, item in created
+        ],
+        source='checkout',
+    )
+    await complete_intents(session, {external_references[result.index]: result.transaction_id for result, _ in created})
+    await fail_intents(session, final_errors)
+
+    result = BatchCheckoutResultSchema(created=len(created), failed=len(results) - len(created), results=results)
+    body = result.model_dump_json()
+    if idempotency_key:
+        await store_response(session, idempotency_key, fingerprint, body)
+    await session.commit()
+
+    return RawJSONResponse(body if full else _compact_batch(result.model_dump()))
+
+
 @router.post('/notification')
 async def payment_notification(request: Request, session: T_Session):
     """
     Endpoint responsável por receber notificações do Mercado Pago sobre o status dos pagamentos.
+    O evento bruto é persistido na fila e processado em segundo plano, respondendo imediatamente ao Mercado Pago.
     """
-    data = await request.json()
-    action = data.get('action')
-    transiction_id = data.get('data', {}).get('id')
+    body = await request.body()
 
-    if action == 'payment.updated':
-        try:
-            payment_info = await mp.get_payment_info(transiction_id)
-            status = payment_info.get('status')
-            status_detail = payment_info.get('status_detail')
-            payment = await session.scalar(select(Payment).where(Payment.transaction_id == str(transiction_id)))
+    try:
+        data = loads(body)
+    except JSONDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid JSON payload.')
+
+    if not isinstance(data, dict) or not isinstance(data.get('data') or {}, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid notification payload.')
 
-            if not payment:
-                return JSONResponse({'message': 'Payment not found.'}, status_code=status.HTTP_404_NOT_FOUND)
+    resource_id = (data.get('data') or {}).get('id')
+    event = WebhookEvent(action=data.get('action'), resource_id=str(resource_id) if resource_id is not None else None, payload=body.decode())
+    session.add(event)
+    await session.commit()
 
-            if status == 'approved' and status_detail == 'accredited':
-                payment.payment_status = PaymentStatus.PAID
-            elif status == 'rejected':
-                payment.payment_status = PaymentStatus.FAILED
-            elif status == 'cancelled':
-                payment.payment_status = PaymentStatus.CANCELLED
-            else:
-                payment.payment_status = PaymentStatus.PENDING
+    if event.action == 'payment.updated' and event.resource_id:
+        await mp.invalidate_payment_info(event.resource_id)
 
-            await session.commit()
-            return JSONResponse({'message': 'Payment updated successfully.'}, status_code=status.HTTP_200_OK)
+    webhook_queue.notify()
 
-        except Exception as e:
-            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+    return {'message': 'Notification received.'}
 
 
-@router.get('/list', response_model=list[PaymentPublicSchema])
-async def list_payments(session: T_Session):
+@router.get('/notification/queue')
+async def notification_queue_stats(session: T_Session):
     """
-    Endpoint para listar todos os pagamentos.
+    Endpoint com as métricas de backpressure da fila de notificações.
     """
-    payments = (await session.scalars(select(Payment))).all()
+    return {**await webhook_queue.stats(session), 'deduplication': notification_coalescer.stats(), 'payment_events': payment_events.stats(), 'live_status': payment_status_broker.stats()}
+
+
+@router.get('/list', response_model=PaymentPageSchema)
+async def list_payments(session: T_Session, query: Annotated[PaymentListQuerySchema, Query()]):
+    """
+    Endpoint para listar os pagamentos com paginação por cursor e filtros.
+    Com `stream=true`, exporta todos os pagamentos filtrados em NDJSON usando um cursor no servidor.
+    """
+    stmt = select_payments(
+        cursor=query.cursor,
+        payment_status=query.payment_status,
+        payment_method=query.payment_method,
+        min_amount=query.min_amount,
+        max_amount=query.max_amount,
+    )
+
+    if query.stream:
+        return StreamingResponse(_stream_payments(stmt), media_type='application/x-ndjson')
+
+    payments = (await session.scalars(stmt.limit(query.limit + 1))).all()
+    has_more = len(payments) > query.limit
+    payments = payments[: query.limit]
 
-    return payments
+    return {'items': payments, 'next_cursor': payments[-1].id if has_more else None}
+
+
+async def _stream_payments(stmt):
+    # A sessão da dependência é fechada antes do envio da resposta, então o streaming abre a sua própria.
+    async with get_db() as session:
+        payments = await session.stream_scalars(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for payment in payments:
+            yield PaymentPublicSchema.model_validate(payment, from_attributes=True).model_dump_json() + '\n'
+
+
+@router.get('/reports/summary', response_model=ReportSummarySchema)
+async def report_summary(session: T_Session, query: Annotated[ReportQuerySchema, Query()]):
+    """
+    Endpoint com a quantidade e o valor total dos pagamentos por método e status, lidos dos totais pré-calculados.
+    """
+    rows = await summarize(session, start=query.start, end=query.end, payment_method=query.payment_method, payment_status=query.payment_status)
+    return {'count': sum(row['count'] for row in rows), 'total_amount': round(sum(row['total_amount'] for row in rows), 2), 'rows': rows}
+
+
+@router.get('/reports/timeseries', response_model=ReportTimeseriesSchema)
+async def report_timeseries(session: T_Session, query: Annotated[TimeseriesQuerySchema, Query()]):
+    """
+    Endpoint com a quantidade e o valor total dos pagamentos por hora ou dia (UTC), método e status.
+    """
+    points = await timeseries(
+        session,
+        granularity=query.granularity,
+        start=query.start,
+        end=query.end,
+        payment_method=query.payment_method,
+        payment_status=query.payment_status,
+    )
+    return {'granularity': query.granularity, 'points': points}
+
+
+@router.get('/{transaction_id}/history', response_model=PaymentHistorySchema)
+async def payment_history(session: T_Session, transaction_id: str):
+    """
+    Endpoint com o histórico de status de um pagamento, em ordem de recebimento.
+    """
+    payment = await get_payment_by_transaction_id(session, transaction_id)
+    if payment is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Pagamento não encontrado.')
+
+    events = (await session.scalars(select(PaymentEvent).where(PaymentEvent.transaction_id == payment.transaction_id).order_by(PaymentEvent.id))).all()
+    return {'transaction_id': payment.transaction_id, 'payment_status': payment.payment_status, 'events': events}
+
+
+@router.get('/{transaction_id}/events', response_class=StreamingResponse, responses={503: {'description': 'Limite de conexões do worker atingido; use `/status` com `Retry-After`.'}})
+async def payment_status_events(session: T_Session, transaction_id: str):
+    """
+    Endpoint SSE com o status do pagamento em tempo real (evento `status`), encerrado quando o status se torna final.
+    Sem vagas no worker, responde `503` com `Retry-After`: a página passa a consultar `GET /payments/{transaction_id}/status`.
+    """
+    payment = await get_payment_by_transaction_id(session, transaction_id)
+    if payment is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Pagamento não encontrado.')
+
+    if not payment_status_broker.reserve():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Limite de conexões de acompanhamento atingido.',
+            headers={'Retry-After': str(math.ceil(settings.PAYMENT_STREAM_POLL_INTERVAL_SECONDS))},
+        )
+
+    return PaymentStatusStreamResponse(
+        payment_status_broker,
+        stream_payment_status(payment_status_broker, payment.transaction_id, payment.payment_status, payment.status_updated_at),
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@router.get('/{transaction_id}/status', response_model=PaymentLiveStatusSchema)
+async def get_payment_status(session: T_Session, transaction_id: str):
+    """
+    Endpoint com o status atual do pagamento, consultado pela página a cada `poll_interval` segundos quando o SSE não está disponível.
+    """
+    payment = await get_payment_by_transaction_id(session, transaction_id)
+    if payment is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Pagamento não encontrado.')
+
+    return {
+        'transaction_id': payment.transaction_id,
+        'payment_status': payment.payment_status,
+        'status_updated_at': payment.status_updated_at,
+        'poll_interval': settings.PAYMENT_STREAM_POLL_INTERVAL_SECONDS,
+    }
 
 
 @router.delete('/delete/{payment_id}', status_code=status.HTTP_204_NO_CONTENT)
@@ -172,4 +599,8 @@ async def delete_payment(session: T_Session, payment_id):
     """
     payment = await session.scalar(select(Payment).where(Payment.id == int(payment_id)))
     await session.delete(payment)
+
+    deltas = RollupDeltas()
+    deltas.add(payment.created_at, payment.payment_method, payment.payment_status, payment.amount, count=-1)
+    await apply_rollup_deltas(session, deltas)
     await session.commit()
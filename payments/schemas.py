@@ -1,7 +1,9 @@
-from typing import Annotated
+from datetime import datetime
+from typing import Annotated, Any, Literal
 
-from pydantic import BaseModel, EmailStr, StringConstraints
+from pydantic import BaseModel, EmailStr, Field, StringConstraints, TypeAdapter, ValidationError, model_validator
 
+from app.settings import settings
 from payments.models import PaymentMethod, PaymentStatus
 
 
@@ -11,6 +13,46 @@ class PaymentPublicSchema(BaseModel):
     transaction_id: str
     payment_method: PaymentMethod
     payment_status: PaymentStatus
+    status_updated_at: datetime | None = None
+    payment_date: datetime | None = None
+    expires_at: datetime | None = None
+    account: str | None = None
+
+
+class PaymentEventSchema(BaseModel):
+    payment_status: PaymentStatus
+    status_detail: str | None
+    provider_updated_at: datetime | None
+    source: str | None
+    received_at: datetime
+
+
+class PaymentHistorySchema(BaseModel):
+    transaction_id: str
+    payment_status: PaymentStatus
+    events: list[PaymentEventSchema]
+
+
+class PaymentLiveStatusSchema(BaseModel):
+    transaction_id: str
+    payment_status: PaymentStatus
+    status_updated_at: datetime | None
+    poll_interval: float
+
+
+class PaymentListQuerySchema(BaseModel):
+    cursor: int | None = Field(default=None, description='ID do último pagamento da página anterior (`next_cursor`).')
+    limit: int = Field(default=50, ge=1, le=500)
+    payment_status: PaymentStatus | None = None
+    payment_method: PaymentMethod | None = None
+    min_amount: float | None = None
+    max_amount: float | None = None
+    stream: bool = Field(default=False, description='Exporta todos os pagamentos filtrados em NDJSON, ignorando `limit`.')
+
+
+class PaymentPageSchema(BaseModel):
+    items: list[PaymentPublicSchema]
+    next_cursor: int | None
 
 
 CPFStr = Annotated[str, StringConstraints(min_length=11, max_length=14, pattern=r'^\d+$')]
@@ -44,10 +86,166 @@ class BoletoPaymentSchema(PaymentBaseSchema):
 
 
 class CardPaymentSchema(PaymentBaseSchema):
-    card_number: CardNumberStr
-    expiration_month: MonthStr
-    expiration_year: YearStr
-    security_code: SecurityCodeStr
-    cardholder_name: str
+    token: str | None = Field(default=None, description='Token do cartão gerado no navegador com o SDK do Mercado Pago (MP_PUBLIC_KEY).')
+    payment_method_id: str | None = None
+    issuer_id: str | None = None
+    card_number: CardNumberStr | None = None
+    expiration_month: MonthStr | None = None
+    expiration_year: YearStr | None = None
+    security_code: SecurityCodeStr | None = None
+    cardholder_name: str | None = None
     payer_cpf: CPFStr
     installments: int
+
+    @model_validator(mode='after')
+    def check_token_or_card_data(self):
+        card_fields = ('card_number', 'expiration_month', 'expiration_year', 'security_code', 'cardholder_name')
+        if self.token is None and any(getattr(self, field) is None for field in card_fields):
+            raise ValueError('Informe o token do cartão ou os dados completos do cartão.')
+        return self
+
+
+class BatchPixItemSchema(PixPaymentSchema):
+    payment_method: Literal['pix']
+
+
+class BatchBoletoItemSchema(BoletoPaymentSchema):
+    payment_method: Literal['boleto']
+
+
+BatchItemSchema = Annotated[BatchPixItemSchema | BatchBoletoItemSchema, Field(discriminator='payment_method')]
+BatchItemAdapter = TypeAdapter(BatchItemSchema)
+
+
+class BatchCheckoutSchema(BaseModel):
+    """
+    Os itens são validados um a um no endpoint (`validate_batch_item`): um item inválido vira um resultado com erro,
+    sem recusar o lote inteiro.
+    """
+
+    items: list[Any] = Field(
+        min_length=1,
+        max_length=settings.CHECKOUT_BATCH_MAX_ITEMS,
+        description='Pagamentos PIX (`BatchPixItemSchema`) ou boleto (`BatchBoletoItemSchema`), identificados por `payment_method`.',
+    )
+
+
+class BatchItemValidationError(ValueError):
+    """
+    Item do checkout em lote inválido. A mensagem lista os campos com erro (ex.: `payer_cpf: String should have at least 11 characters`).
+    """
+
+    def __init__(self, error: ValidationError):
+        super().__init__('; '.join(f'{".".join(str(part) for part in detail["loc"][1:]) or "item"}: {detail["msg"]}' for detail in error.errors()))
+
+
+def validate_batch_item(item: Any) -> BatchPixItemSchema | BatchBoletoItemSchema:
+    """
+    Valida um item do checkout em lote, lançando `BatchItemValidationError` com os erros de cada campo.
+    """
+    try:
+        return BatchItemAdapter.validate_python(item)
+    except ValidationError as e:
+        raise BatchItemValidationError(e)
+
+
+class PixDataSchema(BaseModel):
+    qr_code: str | None = None
+    qr_code_base64: str | None = None
+    ticket_url: str | None = None
+
+
+class BoletoDataSchema(BaseModel):
+    barcode: str | None = None
+    digitable_line: str | None = None
+    ticket_url: str | None = None
+
+
+class CheckoutResponseSchema(BaseModel):
+    """
+    Resposta resumida dos endpoints de checkout: apenas os campos do pagamento usados pelos frontends.
+    """
+
+    id: int
+    status: str | None = None
+    status_detail: str | None = None
+    payment_method_id: str | None = None
+    transaction_amount: float | None = None
+    date_of_expiration: str | None = None
+    pix: PixDataSchema | None = None
+    boleto: BoletoDataSchema | None = None
+
+    @classmethod
+    def from_provider(cls, payment: dict) -> 'CheckoutResponseSchema':
+        transaction_data = (payment.get('point_of_interaction') or {}).get('transaction_data') or {}
+        transaction_details = payment.get('transaction_details') or {}
+
+        pix = boleto = None
+        if transaction_data:
+            pix = PixDataSchema(qr_code=transaction_data.get('qr_code'), qr_code_base64=transaction_data.get('qr_code_base64'), ticket_url=transaction_data.get('ticket_url'))
+        if transaction_details.get('external_resource_url'):
+            boleto = BoletoDataSchema(
+                barcode=(payment.get('barcode') or {}).get('content'),
+                digitable_line=transaction_details.get('digitable_line'),
+                ticket_url=transaction_details.get('external_resource_url'),
+            )
+
+        return cls(
+            id=payment['id'],
+            status=payment.get('status'),
+            status_detail=payment.get('status_detail'),
+            payment_method_id=payment.get('payment_method_id'),
+            transaction_amount=payment.get('transaction_amount'),
+            date_of_expiration=payment.get('date_of_expiration'),
+            pix=pix,
+            boleto=boleto,
+        )
+
+
+class BatchItemResultSchema(BaseModel):
+    index: int
+    # Nulo quando o próprio `payment_method` do item é inválido
+    payment_method: PaymentMethod | None = None
+    status_code: int
+    transaction_id: str | None = None
+    response: dict[str, Any] | None = None
+    error: str | None = None
+
+
+class BatchCheckoutResultSchema(BaseModel):
+    created: int
+    failed: int
+    results: list[BatchItemResultSchema]
+
+
+class ReportQuerySchema(BaseModel):
+    start: datetime | None = Field(default=None, description='Início (inclusivo) do intervalo de criação dos pagamentos, em UTC se não tiver fuso.')
+    end: datetime | None = Field(default=None, description='Fim (exclusivo) do intervalo de criação dos pagamentos.')
+    payment_method: PaymentMethod | None = None
+    payment_status: PaymentStatus | None = None
+
+
+class TimeseriesQuerySchema(ReportQuerySchema):
+    granularity: Literal['hour', 'day'] = 'day'
+
+
+class ReportRowSchema(BaseModel):
+    payment_method: PaymentMethod
+    payment_status: PaymentStatus
+    count: int
+    total_amount: float
+
+
+class ReportSummarySchema(BaseModel):
+    count: int
+    total_amount: float
+    rows: list[ReportRowSchema]
+
+
+class TimeseriesPointSchema(ReportRowSchema):
+    bucket: datetime
+
+
+class ReportTimeseriesSchema(BaseModel):
+    granularity: Literal['hour', 'day']
+    points: list[TimeseriesPointSchema]
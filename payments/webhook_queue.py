@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.metrics import WEBHOOK_EVENTS, WEBHOOK_IN_FLIGHT, WEBHOOK_PROCESSING_LAG
+from app.settings import settings
+from payments.models import WebhookEvent, WebhookEventStatus, as_utc, utcnow
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ClaimedEvent:
+    id: int
+    action: str | None
+    resource_id: str | None
+    attempts: int
+    received_at: datetime
+
+
+EventHandler = Callable[[AsyncSession, ClaimedEvent], Awaitable[None]]
+
+
+class WebhookQueue:
+    """
+    Fila durável de notificações do Mercado Pago, armazenada na tabela `webhook_events`.
+
+    O endpoint de notificação apenas persiste o evento e responde; um dispatcher reivindica
+    lotes de eventos pendentes e os distribui para um pool de workers com concorrência configurável.
+    A reivindicação é feita com um UPDATE condicional, então vários processos (workers do gunicorn)
+    podem consumir a mesma tabela sem processar o mesmo evento duas vezes. Eventos reivindicados
+    por um processo que morreu voltam a ficar disponíveis após `visibility_timeout`.
+    """
+
+    def __init__(
+        self,
+        handler: EventHandler,
+        concurrency: int = settings.WEBHOOK_QUEUE_CONCURRENCY,
+        batch_size: int = settings.WEBHOOK_QUEUE_BATCH_SIZE,
+        poll_interval: float = settings.WEBHOOK_QUEUE_POLL_INTERVAL,
+        max_attempts: int = settings.WEBHOOK_QUEUE_MAX_ATTEMPTS,
+        retry_backoff: float = settings.WEBHOOK_QUEUE_RETRY_BACKOFF,
+        visibility_timeout: float = settings.WEBHOOK_QUEUE_VISIBILITY_TIMEOUT,
+        drain_timeout: float = settings.WEBHOOK_QUEUE_DRAIN_TIMEOUT,
+    ):
+        self._handler = handler
+        self._concurrency = concurrency
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._max_attempts = max_attempts
+        self._retry_backoff = retry_backoff
+        self._visibility_timeout = visibility_timeout
+        self._drain_timeout = drain_timeout
+
+        self._buffer: asyncio.Queue[ClaimedEvent] | None = None
+        self._wakeup = asyncio.Event()
+        self._dispatcher: asyncio.Task | None = None
+        self._workers: list[asyncio.Task] = []
+        self._running = False
+
+        self._in_flight = 0
+        self._processed = 0
+        self._retried = 0
+        self._failed = 0
+        self._last_lag = 0.0
+        self._processing_time_total = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def start(self):
+        """
+        Inicia o dispatcher e os workers. Chamado no lifespan da aplicação.
+        """
+        if self._running:
+            return
+
+        self._running = True
+        self._wakeup = asyncio.Event()
+        self._buffer = asyncio.Queue(maxsize=self._concurrency * 2)
+        self._dispatcher = asyncio.create_task(self._dispatch(), name='webhook-queue-dispatcher')
+        self._workers = [asyncio.create_task(self._work(), name=f'webhook-queue-worker-{i}') for i in range(self._concurrency)]
+
+    async def stop(self):
+        """
+        Para de reivindicar novos eventos e aguarda, até `drain_timeout`, o processamento dos eventos já
+        reivindicados. O que sobrar é devolvido à fila para ser processado por outro processo ou no próximo start.
+        """
+        if not self._running:
+            return
+
+        self._running = False
+        self._wakeup.set()
+        await asyncio.gather(self._dispatcher, return_exceptions=True)
+
+        try:
+            await asyncio.wait_for(self._buffer.join(), timeout=self._drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Fila de webhooks não foi drenada em %.1fs; eventos restantes serão devolvidos.', self._drain_timeout)
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+        leftover = []
+        while not self._buffer.empty():
+            leftover.append(self._buffer.get_nowait().id)
+        if leftover:
+            await self._release(leftover)
+
+        self._dispatcher = None
+        self._workers = []
+
+    def notify(self):
+        """
+        Acorda o dispatcher imediatamente após um novo evento ser persistido.
+        """
+        self._wakeup.set()
+
+    async def stats(self, session: AsyncSession) -> dict:
+        """
+        Métricas de backpressure da fila: profundidade, idade do evento pendente mais antigo e contadores do processo atual.
+        """
+        pending, oldest = (
+            await session.execute(select(func.count(WebhookEvent.id), func.min(WebhookEvent.received_at)).where(WebhookEvent.status.in_([WebhookEventStatus.PENDING, WebhookEventStatus.PROCESSING])))
+        ).one()
+        failed = await session.scalar(select(func.count(WebhookEvent.id)).where(WebhookEvent.status == WebhookEventStatus.FAILED))
+
+        oldest_age = 0.0
+        if oldest is not None:
+            oldest_age = (utcnow() - as_utc(oldest)).total_seconds()
+
+        return {
+            'running': self._running,
+            'concurrency': self._concurrency,
+            'depth': pending,
+            'dead_letter': failed,
+            'oldest_pending_age_seconds': round(oldest_age, 3),
+            'buffered': self._buffer.qsize() if self._buffer else 0,
+            'in_flight': self._in_flight,
+            'processed': self._processed,
+            'retried': self._retried,
+            'failed': self._failed,
+            'last_lag_seconds': round(self._last_lag, 3),
+            'avg_processing_seconds': round(self._processing_time_total / self._processed, 4) if self._processed else 0.0,
+        }
+
+    # --- Métodos Internos Auxiliares ---
+
+    async def _dispatch(self):
+        while self._running:
+            self._wakeup.clear()
+            free_slots = self._buffer.maxsize - self._buffer.qsize()
+            claimed = []
+
+            if free_slots > 0:
+                try:
+                    claimed = await self._claim(min(free_slots, self._batch_size))
+                except Exception:
+                    logger.exception('Erro ao reivindicar eventos da fila de webhooks.')
+
+            for event in claimed:
+                await self._buffer.put(event)
+
+            if len(claimed) < self._batch_size or free_slots <= 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _work(self):
+        while True:
+            event = await self._buffer.get()
+            self._in_flight += 1
+            WEBHOOK_IN_FLIGHT.inc()
+            started = time.perf_counter()
+            try:
+                await self._process(event)
+            finally:
+                self._in_flight -= 1
+                WEBHOOK_IN_FLIGHT.dec()
+                self._processing_time_total += time.perf_counter() - started
+                self._buffer.task_done()
+                self._wakeup.set()
+
+    async def _process(self, event: ClaimedEvent):
+        try:
+            async with get_db() as session:
+                await self._handler(session, event)
+                await session.execute(update(WebhookEvent).where(WebhookEvent.id == event.id).values(status=WebhookEventStatus.DONE, processed_at=utcnow(), last_error=None))
+                await session.commit()
+
+            self._processed += 1
+            self._last_lag = (utcnow() - as_utc(event.received_at)).total_seconds()
+            WEBHOOK_PROCESSING_LAG.observe(self._last_lag)
+            WEBHOOK_EVENTS.labels(result='done').inc()
+
+        except Exception as e:
+            logger.warning('Falha ao processar evento de webhook %s (tentativa %s): %s', event.id, event.attempts, e)
+            await self._fail(event, str(e))
+
+    async def _claim(self, limit: int) -> list[ClaimedEvent]:
+        now = utcnow()
+        candidates = (
+            select(WebhookEvent.id)
+            .where(
+                WebhookEvent.status.in_([WebhookEventStatus.PENDING, WebhookEventStatus.PROCESSING]),
+                WebhookEvent.available_at <= now,
+            )
+            .order_by(WebhookEvent.id)
+            .limit(limit)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(WebhookEvent)
+            .where(
+                WebhookEvent.id.in_(candidates),
+                WebhookEvent.status.in_([WebhookEventStatus.PENDING, WebhookEventStatus.PROCESSING]),
+                WebhookEvent.available_at <= now,
+            )
+            .values(
+                status=WebhookEventStatus.PROCESSING,
+                attempts=WebhookEvent.attempts + 1,
+                available_at=now + timedelta(seconds=self._visibility_timeout),
+            )
+            .returning(WebhookEvent.id, WebhookEvent.action, WebhookEvent.resource_id, WebhookEvent.attempts, WebhookEvent.received_at)
+            .execution_options(synchronize_session=False)
+        )
+
+        async with get_db() as session:
+            rows = (await session.execute(stmt)).all()
+            await session.commit()
+
+        return sorted((ClaimedEvent(*row) for row in rows), key=lambda event: event.id)
+
+    async def _fail(self, event: ClaimedEvent, error: str):
+        if event.attempts >= self._max_attempts:
+            values = {'status': WebhookEventStatus.FAILED, 'processed_at': utcnow()}
+            self._failed += 1
+            WEBHOOK_EVENTS.labels(result='failed').inc()
+        else:
+            backoff = self._retry_backoff * 2 ** (event.attempts - 1)
+            values = {'status': WebhookEventStatus.PENDING, 'available_at': utcnow() + timedelta(seconds=backoff)}
+            self._retried += 1
+            WEBHOOK_EVENTS.labels(result='retried').inc()
+
+        try:
+            async with get_db() as session:
+                await session.execute(update(WebhookEvent).where(WebhookEvent.id == event.id).values(last_error=error, **values))
+                await session.commit()
+        except Exception:
+            logger.exception('Erro ao registrar falha do evento de webhook %s.', event.id)
+
+    async def _release(self, event_ids: list[int]):
+        try:
+            async with get_db() as session:
+                await session.execute(
+                    update(WebhookEvent)
+                    .where(WebhookEvent.id.in_(event_ids), WebhookEvent.status == WebhookEventStatus.PROCESSING)
+                    .values(status=WebhookEventStatus.PENDING, available_at=utcnow(), attempts=WebhookEvent.attempts - 1)
+                )
+                await session.commit()
+        except Exception:
+            logger.exception('Erro ao devolver eventos de webhook para a fila.')
@@ -0,0 +1,158 @@
+import asyncio
+import itertools
+import math
+
+from app.ratelimit import InMemoryRateLimitBackend, RedisRateLimitBackend
+from app.settings import MercadoPagoAccount, settings
+from services.cache import CacheBackend
+from services.mercadopago import MercadoPagoService
+from services.resilience import CircuitOpenError
+
+ROUTING_POLICIES = ('round_robin', 'least_in_flight', 'payment_method')
+# Sugestão de `Retry-After` (em segundos) quando a conta está no limite de chamadas simultâneas
+SATURATED_RETRY_AFTER = 1.0
+
+
+class PaymentMethodNotSupportedError(ValueError):
+    """
+    Nenhuma conta do Mercado Pago configurada aceita o método de pagamento.
+    """
+
+
+class NoAccountAvailableError(RuntimeError):
+    """
+    Todas as contas que aceitam o método estão indisponíveis: circuit breaker aberto, `max_in_flight` atingido ou
+    orçamento de requisições (`rate`) esgotado. `retry_after` é a menor espera entre elas.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class MercadoPagoAccounts:
+    """
+    Conjunto de contas do Mercado Pago (`MP_ACCOUNTS`), cada uma com o seu `MercadoPagoService`: pool de conexões,
+    circuit breaker, limite de chamadas simultâneas e cache próprios.
+
+    Novos pagamentos vão para uma das contas que aceitam o método de pagamento, na ordem de `MP_ROUTING_POLICY`:
+
+    - `round_robin`: alterna entre as contas;
+    - `least_in_flight`: a conta com menos chamadas em andamento;
+    - `payment_method`: a primeira conta da lista que aceita o método (contas dedicadas, com as seguintes como reserva).
+
+    Uma conta só é escolhida se estiver disponível: circuit breaker fechado, abaixo de `max_in_flight` e com um token
+    no seu orçamento de requisições (token bucket com `rate` e `burst`, no `budget`). Sem conta disponível, o pagamento
+    é recusado com `NoAccountAvailableError`, em vez de sobrecarregar uma conta no limite; sem conta que aceite o método,
+    com `PaymentMethodNotSupportedError`. Consultas de pagamentos existentes usam a conta gravada em `Payment.account` (`for_account`).
+    """
+
+    def __init__(
+        self,
+        accounts: list[MercadoPagoAccount] | None = None,
+        policy: str = settings.MP_ROUTING_POLICY,
+        cache: CacheBackend | None = None,
+        budget: InMemoryRateLimitBackend | RedisRateLimitBackend | None = None,
+    ):
+        if policy not in ROUTING_POLICIES:
+            raise ValueError(f'Política de roteamento desconhecida: {policy}.')
+
+        accounts = accounts or settings.mercadopago_accounts()
+        self._policy = policy
+        self._services = {account.name: MercadoPagoService(cache=cache, account=account) for account in accounts}
+        self._default = next(iter(self._services.values()))
+        self._counter = itertools.count()
+        self._budget = budget if budget is not None else InMemoryRateLimitBackend()
+
+    @property
+    def default(self) -> MercadoPagoService:
+        return self._default
+
+    @property
+    def services(self) -> list[MercadoPagoService]:
+        return list(self._services.values())
+
+    def for_account(self, name: str | None) -> MercadoPagoService:
+        """
+        Serviço da conta que criou o pagamento. Pagamentos anteriores às várias contas (`account` nulo) ou de contas
+        removidas da configuração usam a conta padrão (a primeira).
+        """
+        return self._services.get(name, self._default) if name else self._default
+
+    def for_public_key(self, public_key: str | None) -> MercadoPagoService:
+        """
+        Serviço da conta dona da chave pública: tokens de cartão gerados no navegador só valem na conta da chave usada.
+        """
+        for service in self._services.values():
+            if service.account.public_key and service.account.public_key == public_key:
+                return service
+        return self._default
+
+    async def route(self, payment_method: str) -> MercadoPagoService:
+        """
+        Escolhe a conta de um novo pagamento (`pix`, `boleto` ou `card`), consumindo um token do orçamento dela.
+        """
+        candidates = [service for service in self._services.values() if service.accepts(payment_method)]
+        if not candidates:
+            raise PaymentMethodNotSupportedError(f'Nenhuma conta do Mercado Pago aceita pagamentos com {payment_method}.')
+
+        if self._policy == 'least_in_flight':
+            candidates.sort(key=lambda service: service.in_flight)
+        elif self._policy == 'round_robin':
+            start = next(self._counter) % len(candidates)
+            candidates = candidates[start:] + candidates[:start]
+        return await self._admit(candidates)
+
+    async def admit(self, service: MercadoPagoService) -> MercadoPagoService:
+        """
+        Versão de `route` para um pagamento que só pode ir para `service` (ex.: cartão tokenizado com a chave pública da conta).
+        """
+        return await self._admit([service])
+
+    async def start(self):
+        for service in self._services.values():
+            await service.start()
+
+    async def close(self):
+        for service in self._services.values():
+            await service.close()
+        await self._budget.close()
+
+    async def warmup(self, connections: int = settings.WARMUP_MP_CONNECTIONS) -> dict[str, int]:
+        """
+        Abre conexões keepalive com a API em todas as contas, em paralelo. Retorna as conexões abertas por conta.
+        """
+        opened = await asyncio.gather(*(service.warmup(connections) for service in self._services.values()))
+        return dict(zip(self._services, opened))
+
+    async def invalidate_payment_info(self, transaction_id: str):
+        for service in self._services.values():
+            await service.invalidate_payment_info(transaction_id)
+
+    def stats(self) -> dict:
+        return {'policy': self._policy, 'accounts': {name: service.stats() for name, service in self._services.items()}}
+
+    # --- Métodos Internos Auxiliares ---
+
+    async def _admit(self, candidates: list[MercadoPagoService]) -> MercadoPagoService:
+        """
+        Primeira conta de `candidates` disponível. O token do orçamento só é consumido depois das demais verificações.
+        """
+        waits = []
+        for service in candidates:
+            try:
+                service.breaker.check()
+            except CircuitOpenError as e:
+                waits.append(e.retry_after)
+                continue
+            if service.saturated:
+                waits.append(SATURATED_RETRY_AFTER)
+                continue
+
+            account = service.account
+            wait = await self._budget.acquire(f'mp-account:{account.name}', account.rate, account.burst or math.ceil(account.rate)) if account.rate > 0 else 0.0
+            if not wait:
+                return service
+            waits.append(wait)
+
+        raise NoAccountAvailableError('Nenhuma conta do Mercado Pago disponível no momento.', retry_after=min(waits))
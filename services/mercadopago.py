@@ -1,4 +1,5 @@
-import json
+import asyncio
+import time
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict
@@ -6,7 +7,23 @@ from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 import httpx
 
-from app.settings import settings
+from app.metrics import MERCADOPAGO_REQUEST_DURATION
+from app.serialization import JSONDecodeError, ProviderPayload, dumps, loads
+from app.settings import MercadoPagoAccount, settings
+from services.cache import CacheBackend, InMemoryTTLCache
+from services.resilience import CircuitBreaker, CircuitOpenError, backoff_delay
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class MercadoPagoRejectedError(RuntimeError):
+    """
+    Requisição recusada pelo Mercado Pago com um erro 4xx definitivo: nada foi criado e repetir a mesma requisição não adianta.
+    """
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class MercadoPagoService:
@@ -63,17 +80,108 @@ class MercadoPagoService:
         'rejected_by_biz_rule': 'Pagamento recusado devido a regras de negócio.',
     }
 
-    def __init__(self):
-        if not settings.MP_ACCESS_TOKEN:
+    # Status do Mercado Pago que não mudam mais: ficam em cache sem expiração
+    FINAL_STATUSES = frozenset({'approved', 'rejected', 'cancelled', 'refunded', 'charged_back'})
+
+    def __init__(self, cache: CacheBackend | None = None, account: MercadoPagoAccount | None = None):
+        account = account or settings.mercadopago_accounts()[0]
+        if not account.access_token:
             raise ValueError('A variável de ambiente MP_ACCESS_TOKEN não foi definida.')
 
-        self._access_token = settings.MP_ACCESS_TOKEN
+        self.account = account
+        self._access_token = account.access_token
         self._base_url = settings.MP_BASE_API_URL
         self._notification_url = settings.NOTIFICATION_URL
         self._headers = {
             'Content-Type': 'application/json',
             'Authorization': f'Bearer {self._access_token}',
         }
+        self._client: httpx.AsyncClient | None = None
+        self._timeouts = {
+            'card_token': httpx.Timeout(settings.MP_TIMEOUT_CARD_TOKEN, connect=settings.MP_CONNECT_TIMEOUT),
+            'create_payment': httpx.Timeout(settings.MP_TIMEOUT_CREATE_PAYMENT, connect=settings.MP_CONNECT_TIMEOUT),
+            'get_payment': httpx.Timeout(settings.MP_TIMEOUT_GET_PAYMENT, connect=settings.MP_CONNECT_TIMEOUT),
+            'search_payments': httpx.Timeout(settings.MP_TIMEOUT_GET_PAYMENT, connect=settings.MP_CONNECT_TIMEOUT),
+        }
+        self._breaker = CircuitBreaker(
+            name=f'Mercado Pago ({account.name})',
+            failure_rate_threshold=settings.MP_BREAKER_FAILURE_RATE,
+            minimum_calls=settings.MP_BREAKER_MIN_CALLS,
+            window_seconds=settings.MP_BREAKER_WINDOW_SECONDS,
+            open_seconds=settings.MP_BREAKER_OPEN_SECONDS,
+        )
+        self._cache = cache if cache is not None else InMemoryTTLCache(max_entries=settings.MP_PAYMENT_CACHE_MAX_ENTRIES)
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._in_flight = 0
+
+    @property
+    def name(self) -> str:
+        return self.account.name
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self._breaker
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def saturated(self) -> bool:
+        """
+        A conta atingiu `max_in_flight` chamadas simultâneas.
+        """
+        return bool(self.account.max_in_flight) and self._in_flight >= self.account.max_in_flight
+
+    def accepts(self, payment_method: str) -> bool:
+        return not self.account.payment_methods or payment_method in self.account.payment_methods
+
+    def stats(self) -> dict:
+        """
+        Estado do circuit breaker, chamadas em andamento e contadores do cache de `get_payment_info`.
+        """
+        return {
+            'account': self.account.name,
+            'in_flight': self._in_flight,
+            'breaker': self._breaker.stats(),
+            'payment_info_cache': {'hits': self._cache_hits, 'misses': self._cache_misses},
+        }
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Cliente HTTP compartilhado, reaproveitando conexões TCP/TLS entre as chamadas.
+        Caso o serviço seja usado fora do ciclo de vida da aplicação, o cliente é criado sob demanda.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def start(self):
+        """
+        Abre o pool de conexões com a API do Mercado Pago. Chamado no lifespan da aplicação.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+
+    async def close(self):
+        """
+        Fecha o pool de conexões com a API do Mercado Pago. Chamado no lifespan da aplicação.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def warmup(self, connections: int = settings.WARMUP_MP_CONNECTIONS) -> int:
+        """
+        Abre até `connections` conexões keepalive (TCP + TLS) com a API do Mercado Pago, com consultas simultâneas e
+        leves a `/v1/payment_methods`, fora do circuit breaker e das métricas. Retorna quantas consultas tiveram resposta.
+        """
+        await self.start()
+        connections = min(connections, settings.MP_HTTP_MAX_KEEPALIVE_CONNECTIONS)
+        responses = await asyncio.gather(*(self._client.get('/v1/payment_methods', timeout=self._timeouts['get_payment']) for _ in range(connections)), return_exceptions=True)
+        return sum(1 for response in responses if isinstance(response, httpx.Response))
 
     def generate_payment_expiration_date(self, days: int | None = None, hours: int | None = None, minutes: int | None = None):
         """
@@ -90,7 +198,7 @@ class MercadoPagoService:
 
         return expiration_date.isoformat(timespec='milliseconds')
 
-    async def pay_with_pix(self, amount: float, payer_email: str, payer_cpf: str, description: str = 'Pagamento'):
+    async def pay_with_pix(self, amount: float, payer_email: str, payer_cpf: str, description: str = 'Pagamento', idempotency_key: str | None = None, external_reference: str | None = None):
         """
         Cria um pagamento via Pix.
         """
@@ -100,13 +208,23 @@ class MercadoPagoService:
             'description': description,
             'date_of_expiration': self.generate_payment_expiration_date(minutes=30),
             'payer': {'email': payer_email, 'identification': {'type': 'CPF', 'number': payer_cpf}},
-            'external_reference': f'ID-PIX-{uuid.uuid4()}',
+            'external_reference': external_reference or f'ID-PIX-{uuid.uuid4()}',
             'notification_url': settings.NOTIFICATION_URL,
         }
-        return await self._create_payment(payload)
+        return await self._create_payment(payload, idempotency_key)
 
     async def pay_with_boleto(
-        self, amount: float, payer_email: str, payer_first_name: str, payer_last_name: str, payer_cpf: str, payer_address: Dict[str, str], description: str = 'Pagamento', days_to_expire: int = 3
+        self,
+        amount: float,
+        payer_email: str,
+        payer_first_name: str,
+        payer_last_name: str,
+        payer_cpf: str,
+        payer_address: Dict[str, str],
+        description: str = 'Pagamento',
+        days_to_expire: int = 3,
+        idempotency_key: str | None = None,
+        external_reference: str | None = None,
     ):
         """
         Cria um pagamento via Boleto Bancário.
@@ -130,44 +248,111 @@ class MercadoPagoService:
                     'federal_unit': payer_address.get('federal_unit'),
                 },
             },
-            'external_reference': f'ID-BOLETO-{uuid.uuid4()}',
+            'external_reference': external_reference or f'ID-BOLETO-{uuid.uuid4()}',
             'notification_url': settings.NOTIFICATION_URL,
         }
-        return await self._create_payment(payload)
-
-    async def pay_with_card(self, amount: float, payer_email: str, payer_cpf: str, card_data: dict, installments: int = 1, description: str = 'Pagamento'):
+        return await self._create_payment(payload, idempotency_key)
+
+    async def pay_with_card(
+        self,
+        amount: float,
+        payer_email: str,
+        payer_cpf: str,
+        card_data: dict | None = None,
+        installments: int = 1,
+        description: str = 'Pagamento',
+        idempotency_key: str | None = None,
+        card_token: str | None = None,
+        payment_method_id: str | None = None,
+        issuer_id: str | None = None,
+        external_reference: str | None = None,
+    ):
         """
         Cria um pagamento via Cartão de Crédito.
+        Com `card_token` (gerado no navegador pelo SDK do Mercado Pago) só o pagamento é criado; sem ele,
+        o cartão é tokenizado no servidor a partir de `card_data` antes da criação do pagamento.
         """
-        card_token = await self._get_card_token(card_data)
+        if card_token is None:
+            if card_data is None:
+                raise ValueError('Informe o token do cartão ou os dados do cartão.')
+            card_token = (await self._get_card_token(card_data)).get('id')
 
         payload = {
             'transaction_amount': float(amount),
-            'token': card_token.get('id'),
+            'token': card_token,
             'description': description,
             'installments': installments,
             'payer': {'email': payer_email, 'identification': {'type': 'CPF', 'number': payer_cpf}},
-            'external_reference': f'ID-CARTAO-{uuid.uuid4()}',
+            'external_reference': external_reference or f'ID-CARTAO-{uuid.uuid4()}',
             'statement_descriptor': 'Compra Online',
             'notification_url': settings.NOTIFICATION_URL,
         }
-        return await self._create_payment(payload)
+        if payment_method_id:
+            payload['payment_method_id'] = payment_method_id
+        if issuer_id:
+            payload['issuer_id'] = issuer_id
+        return await self._create_payment(payload, idempotency_key)
 
-    async def get_payment_info(self, transiction_id: str):
+    async def get_payment_info(self, transiction_id: str, use_cache: bool = True):
         """
         Obtém informações detalhadas sobre um pagamento específico.
+        A resposta fica em cache: sem expiração para status finais e por `MP_PAYMENT_CACHE_PENDING_TTL` segundos para os demais.
+        Com `use_cache=False` a API é sempre consultada e o cache é atualizado com a resposta.
+        """
+        key = str(transiction_id)
+
+        if use_cache and settings.MP_PAYMENT_CACHE_ENABLED:
+            cached = await self._cache.get(key)
+            if cached is not None:
+                self._cache_hits += 1
+                return cached
+
+        self._cache_misses += 1
+        payment_info = await self._get(f'/v1/payments/{transiction_id}', operation='get_payment')
+
+        if settings.MP_PAYMENT_CACHE_ENABLED:
+            ttl = None if payment_info.get('status') in self.FINAL_STATUSES else settings.MP_PAYMENT_CACHE_PENDING_TTL
+            await self._cache.set(key, payment_info, ttl=ttl)
+
+        return payment_info
+
+    async def search_payments_by_external_reference(self, external_reference: str) -> list[dict]:
+        """
+        Busca os pagamentos criados com o `external_reference` informado, do mais recente para o mais antigo.
+        """
+        response = await self._get(
+            '/v1/payments/search',
+            operation='search_payments',
+            params={'external_reference': external_reference, 'sort': 'date_created', 'criteria': 'desc'},
+        )
+        return response.get('results', [])
+
+    async def invalidate_payment_info(self, transiction_id: str):
+        """
+        Remove o pagamento do cache, usado quando chega uma notificação sobre ele.
         """
-        return await self._get(f'/v1/payments/{transiction_id}')
+        await self._cache.delete(str(transiction_id))
 
     # --- Métodos Internos Auxiliares ---
 
+    def _build_client(self) -> httpx.AsyncClient:
+        """
+        Cria o cliente HTTP com os limites do pool definidos nas configurações.
+        """
+        limits = httpx.Limits(
+            max_connections=settings.MP_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.MP_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.MP_HTTP_KEEPALIVE_EXPIRY,
+        )
+        return httpx.AsyncClient(base_url=self._base_url, headers=self._headers, limits=limits, http2=settings.MP_HTTP2)
+
     def _handle_api_error(self, response: httpx.Response):
         """
         Processa uma resposta de erro da API, enriquecendo a mensagem com os mapeamentos de status.
         """
         status_code = response.status_code
         try:
-            error_data = response.json()
+            error_data = loads(response.content)
             status = error_data.get('status', 'unknown')
             status_detail = error_data.get('status_detail', 'unknown')
 
@@ -179,66 +364,139 @@ class MercadoPagoService:
         except Exception:
             return f'Erro na API do Mercado Pago ({status_code}): {response.text}'
 
-    async def _post(self, path: str, payload: dict, use_idempotency_key: bool = True):
+    async def _post(self, path: str, payload: dict, operation: str, use_idempotency_key: bool = True, idempotency_key: str | None = None):
         """
         Executa uma requisição POST para a API do Mercado Pago.
+        Só é retentada quando enviada com chave de idempotência, que se mantém a mesma entre as tentativas.
         """
-        url = f'{self._base_url}{path}'
-        headers = self._headers.copy()
+        headers = {}
 
         if use_idempotency_key:
-            headers['X-Idempotency-Key'] = str(uuid.uuid4())
+            headers['X-Idempotency-Key'] = idempotency_key or str(uuid.uuid4())
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(url=url, headers=headers, json=payload)
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                error_message = self._handle_api_error(e.response)
-                raise RuntimeError(error_message)
-
-    async def _get(self, path: str):
+        try:
+            # O corpo é serializado uma única vez e reaproveitado nas retentativas
+            response = await self._send('POST', path, operation, retry=use_idempotency_key, headers=headers, content=dumps(payload))
+            response.raise_for_status()
+            return ProviderPayload(response.content)
+        except httpx.HTTPStatusError as e:
+            error_message = self._handle_api_error(e.response)
+            if e.response.is_client_error and e.response.status_code not in RETRYABLE_STATUS_CODES:
+                raise MercadoPagoRejectedError(error_message, e.response.status_code)
+            raise RuntimeError(error_message)
+
+    async def _get(self, path: str, operation: str, params: dict | None = None):
         """
         Executa uma requisição GET para a API do Mercado Pago.
         """
         url = f'{self._base_url}{path}'
 
-        async with httpx.AsyncClient() as client:
+        try:
+            response = await self._send('GET', path, operation, retry=True, params=params)
+            response.raise_for_status()
+            return ProviderPayload(response.content)
+        except httpx.HTTPStatusError as e:
             try:
-                response = await client.get(url, headers=self._headers)
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                try:
-                    error = e.response.json()
-                except json.JSONDecodeError:
-                    error = e.response.text
+                error = loads(e.response.content)
+            except JSONDecodeError:
+                error = e.response.text
 
-                raise RuntimeError(f'Erro ao acessar {url}: {error}')
+            raise RuntimeError(f'Erro ao acessar {url}: {error}')
+
+    async def _send(self, method: str, path: str, operation: str, retry: bool, **kwargs) -> httpx.Response:
+        """
+        Envia a requisição com o timeout da operação, passando pelo circuit breaker.
+        Falhas de rede, 429 e 5xx são retentadas com backoff exponencial e jitter quando `retry` é verdadeiro.
+        """
+        self._in_flight += 1
+        try:
+            return await self._send_with_retries(method, path, operation, retry, **kwargs)
+        finally:
+            self._in_flight -= 1
+
+    async def _send_with_retries(self, method: str, path: str, operation: str, retry: bool, **kwargs) -> httpx.Response:
+        attempts = 1 + (settings.MP_RETRY_ATTEMPTS if retry else 0)
+        timeout = self._timeouts[operation]
+
+        response, error = None, None
+        for attempt in range(attempts):
+            try:
+                self._breaker.before_call()
+            except CircuitOpenError:
+                # `CircuitOpenError` só sai daqui antes do primeiro envio; se o circuito abrir durante as retentativas,
+                # a requisição já foi enviada e o resultado é o da última tentativa
+                if not attempt:
+                    raise
+                break
+            last_attempt = attempt + 1 >= attempts
+
+            started = time.perf_counter()
+            try:
+                response, error = await self.client.request(method, path, timeout=timeout, **kwargs), None
+            except httpx.TransportError as e:
+                MERCADOPAGO_REQUEST_DURATION.labels(account=self.account.name, operation=operation, status_code='error').observe(time.perf_counter() - started)
+                self._breaker.record_failure()
+                response, error = None, e
+                if last_attempt:
+                    break
+                delay = backoff_delay(attempt, settings.MP_RETRY_BACKOFF_BASE, settings.MP_RETRY_BACKOFF_MAX)
+            except asyncio.CancelledError:
+                self._breaker.record_cancelled()
+                raise
+            except BaseException:
+                self._breaker.record_failure()
+                raise
+            else:
+                MERCADOPAGO_REQUEST_DURATION.labels(account=self.account.name, operation=operation, status_code=response.status_code).observe(time.perf_counter() - started)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    self._breaker.record_success()
+                    return response
+
+                self._breaker.record_failure()
+                if last_attempt:
+                    return response
+                delay = self._retry_delay(response, attempt)
+
+            await asyncio.sleep(delay)
+
+        if response is not None:
+            return response
+        raise RuntimeError(f'Falha de comunicação com o Mercado Pago ({operation}): {error!r}') from error
+
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> float:
+        """
+        Respeita o cabeçalho Retry-After (em segundos) quando presente, limitado ao backoff máximo.
+        """
+        delay = backoff_delay(attempt, settings.MP_RETRY_BACKOFF_BASE, settings.MP_RETRY_BACKOFF_MAX)
+        try:
+            retry_after = float(response.headers.get('Retry-After', 0))
+        except ValueError:
+            retry_after = 0.0
+        return min(max(delay, retry_after), settings.MP_RETRY_BACKOFF_MAX)
 
     async def _get_card_token(self, card_data: dict):
         """
         Obtém um token de cartão de crédito.
         """
-        return await self._post('/v1/card_tokens', card_data, use_idempotency_key=False)
+        return await self._post('/v1/card_tokens', card_data, operation='card_token', use_idempotency_key=False)
 
-    async def _create_payment(self, payload: dict):
+    async def _create_payment(self, payload: dict, idempotency_key: str | None = None):
         """
         Cria um novo pagamento, adicionando a URL de notificação se configurada.
+        Com `idempotency_key`, a mesma chave é enviada ao Mercado Pago, que devolve o pagamento já criado em caso de repetição.
         """
         if self._notification_url:
             payload['notification_url'] = self._notification_url
 
-        return await self._post('/v1/payments', payload)
+        return await self._post('/v1/payments', payload, operation='create_payment', idempotency_key=idempotency_key)
 
 
-def run_test_pay_with_pix():
+async def run_test_pay_with_pix(mp_service: MercadoPagoService):
     """
     Função de teste para pagamento via Pix.
     """
     try:
-        response = mp_service.pay_with_pix(
+        response = await mp_service.pay_with_pix(
             amount=100.00,
             payer_email='test_user_123@testuser.com',
             payer_cpf='12345678909',
@@ -250,11 +508,11 @@ def run_test_pay_with_pix():
         print(f'Erro ao processar pagamento PIX: {e}')
 
 
-def run_test_pay_with_boleto():
+async def run_test_pay_with_boleto(mp_service: MercadoPagoService):
     address_data = {'zip_code': '01001-000', 'street_name': 'Praça da Sé', 'street_number': 's/n', 'neighborhood': 'Sé', 'city': 'São Paulo', 'federal_unit': 'SP'}
 
     try:
-        response = mp_service.pay_with_boleto(
+        response = await mp_service.pay_with_boleto(
             amount=150.75,
             payer_email='test82281@gmail.com',
             payer_first_name='Carlos',
@@ -269,7 +527,7 @@ def run_test_pay_with_boleto():
         print(f'Erro ao processar pagamento com boleto: {e}')
 
 
-def run_test_pay_with_card():
+async def run_test_pay_with_card(mp_service: MercadoPagoService):
     """
     Função de teste para pagamento via Cartão de Crédito.
     """
@@ -286,7 +544,7 @@ def run_test_pay_with_card():
             },
         }
 
-        response = mp_service.pay_with_card(
+        response = await mp_service.pay_with_card(
             amount=200.00,
             card_data=card_data,
             description='Teste de pagamento com Cartão',
@@ -299,20 +557,32 @@ def run_test_pay_with_card():
         print(f'Erro ao processar pagamento com cartão: {e}')
 
 
-if __name__ == '__main__':
+async def main():
+    """
+    Executa os pagamentos de teste. Para não chamar a API real, inicie o Mercado Pago falso
+    (`python -m benchmarks.fake_mercadopago`) e defina `MP_BASE_API_URL=http://127.0.0.1:8001`.
+    """
     mp_service = MercadoPagoService()
+    await mp_service.start()
 
-    # TEST PIX 💰
-    run_test_pay_with_pix()
-    print()
-    print('---' * 10)
+    try:
+        # TEST PIX 💰
+        await run_test_pay_with_pix(mp_service)
+        print()
+        print('---' * 10)
+
+        # TEST BOLETO 📄
+        await run_test_pay_with_boleto(mp_service)
+        print()
+        print('---' * 10)
 
-    # TEST BOLETO 📄
-    run_test_pay_with_boleto()
-    print()
-    print('---' * 10)
+        # TEST CARTÃO 💳
+        await run_test_pay_with_card(mp_service)
+        print()
+        print('---' * 10)
+    finally:
+        await mp_service.close()
 
-    # TEST CARTÃO 💳
-    run_test_pay_with_card()
-    print()
-    print('---' * 10)
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+import random
+import time
+from collections import deque
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Chamada recusada porque o circuit breaker está aberto.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker baseado na taxa de erro em uma janela deslizante de tempo.
+
+    Com pelo menos `minimum_calls` chamadas na janela e taxa de erro acima de `failure_rate_threshold`,
+    o circuito abre e as chamadas falham imediatamente por `open_seconds`. Depois disso ele fica
+    semiaberto: uma única chamada de teste é liberada e, conforme o resultado, o circuito fecha ou reabre.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_rate_threshold: float, minimum_calls: int, window_seconds: float, open_seconds: float):
+        self.name = name
+        self._failure_rate_threshold = failure_rate_threshold
+        self._minimum_calls = minimum_calls
+        self._window_seconds = window_seconds
+        self._open_seconds = open_seconds
+
+        self._calls: deque[tuple[float, bool]] = deque()
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self._open_seconds:
+            return self.HALF_OPEN
+        return self._state
+
+    def check(self):
+        """
+        Lança `CircuitOpenError` se uma chamada feita agora seria recusada, sem reservar a chamada de teste do estado semiaberto.
+        """
+        state = self.state
+
+        if state == self.OPEN:
+            retry_after = self._open_seconds - (time.monotonic() - self._opened_at)
+            raise CircuitOpenError(f'{self.name} indisponível no momento (circuit breaker aberto).', retry_after=max(retry_after, 0.0))
+
+        if state == self.HALF_OPEN and self._probe_in_flight:
+            raise CircuitOpenError(f'{self.name} indisponível no momento (circuit breaker em teste).', retry_after=1.0)
+
+    def before_call(self):
+        """
+        Verifica se a chamada pode ser feita, lançando `CircuitOpenError` caso o circuito esteja aberto.
+        No estado semiaberto, a chamada liberada passa a ser a chamada de teste.
+        """
+        self.check()
+
+        if self.state == self.HALF_OPEN:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = True
+
+    def record_success(self):
+        if self._state == self.HALF_OPEN:
+            self._close()
+            return
+        self._record(True)
+
+    def record_failure(self):
+        if self._state == self.HALF_OPEN:
+            self._open()
+            return
+        self._record(False)
+
+        failures = sum(1 for _, ok in self._calls if not ok)
+        if len(self._calls) >= self._minimum_calls and failures / len(self._calls) >= self._failure_rate_threshold:
+            self._open()
+
+    def record_cancelled(self):
+        """
+        Chamada cancelada antes do resultado (cliente desconectado, desligamento): não conta como sucesso nem como falha,
+        apenas libera a chamada de teste do estado semiaberto.
+        """
+        self._probe_in_flight = False
+
+    def stats(self) -> dict:
+        self._trim(time.monotonic())
+        failures = sum(1 for _, ok in self._calls if not ok)
+        return {'state': self.state, 'calls': len(self._calls), 'failures': failures}
+
+    # --- Métodos Internos Auxiliares ---
+
+    def _record(self, ok: bool):
+        now = time.monotonic()
+        self._calls.append((now, ok))
+        self._trim(now)
+
+    def _trim(self, now: float):
+        while self._calls and now - self._calls[0][0] > self._window_seconds:
+            self._calls.popleft()
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._calls.clear()
+
+    def _close(self):
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+        self._calls.clear()
+
+
+def backoff_delay(attempt: int, base: float, maximum: float) -> float:
+    """
+    Backoff exponencial com full jitter: um valor aleatório entre 0 e `base * 2 ** attempt`, limitado a `maximum`.
+    """
+    return random.uniform(0, min(maximum, base * 2**attempt))
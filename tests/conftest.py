@@ -0,0 +1,74 @@
+import os
+
+import httpx
+import pytest
+
+# As configurações são lidas na importação da aplicação: os testes usam credenciais falsas e um SQLite em memória
+os.environ.setdefault('MP_PUBLIC_KEY', 'TEST-public-key')
+os.environ.setdefault('MP_ACCESS_TOKEN', 'TEST-access-token')
+os.environ['DATABASE_URL'] = 'sqlite+aiosqlite:///:memory:'
+os.environ['DB_ECHO'] = 'false'
+# Os limites de requisições por IP e e-mail acumulariam entre os testes
+os.environ['RATE_LIMIT_ENABLED'] = 'false'
+
+from app.database import engine, get_db, table_registry
+from app.main import app
+from app.settings import settings
+from benchmarks.fake_mercadopago import FakeMercadoPago, create_app
+from payments import router
+from services.accounts import MercadoPagoAccounts
+
+
+class FakeClock:
+    """
+    Relógio controlado pelo teste, no lugar do módulo `time` do módulo testado.
+    """
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+async def session():
+    async with engine.begin() as conn:
+        await conn.run_sync(table_registry.metadata.create_all)
+    async with get_db() as session:
+        yield session
+    # O SQLite em memória vive na conexão do pool, presa ao event loop do teste: cada teste começa com um banco novo
+    await engine.dispose()
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        yield client
+
+
+@pytest.fixture
+def fake_mercadopago(monkeypatch) -> FakeMercadoPago:
+    """
+    Contas do Mercado Pago novas (circuit breaker e cache vazios) nos endpoints de `payments.router`, com as chamadas
+    atendidas em memória pelo Mercado Pago falso de `benchmarks.fake_mercadopago`.
+    """
+    fake_app = create_app()
+    accounts = MercadoPagoAccounts()
+    for service in accounts.services:
+        service._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_app), base_url=settings.MP_BASE_API_URL)
+    monkeypatch.setattr(router, 'mp', accounts)
+    return fake_app.state.fake
@@ -0,0 +1,135 @@
+import httpx
+import pytest
+
+from app import ratelimit
+from app.settings import MercadoPagoAccount
+from payments import router
+from services.accounts import SATURATED_RETRY_AFTER, MercadoPagoAccounts, NoAccountAvailableError, PaymentMethodNotSupportedError
+
+pytestmark = pytest.mark.anyio
+
+PIX_CHECKOUT = {'payer_email': 'comprador@example.com', 'payer_cpf': '12345678909', 'transaction_amount': 100.0}
+
+
+@pytest.fixture(autouse=True)
+def budget_clock(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, 'time', clock)
+    return clock
+
+
+def create_accounts(policy: str = 'round_robin', **accounts: dict) -> MercadoPagoAccounts:
+    return MercadoPagoAccounts([MercadoPagoAccount(name=name, access_token=f'token-{name}', **options) for name, options in accounts.items()], policy=policy)
+
+
+async def route_names(accounts: MercadoPagoAccounts, payment_method: str, count: int) -> list[str]:
+    return [(await accounts.route(payment_method)).name for _ in range(count)]
+
+
+def open_breaker(service):
+    for _ in range(service.breaker._minimum_calls):
+        service.breaker.record_failure()
+
+
+async def test_round_robin_alternates_between_accounts():
+    accounts = create_accounts(a={}, b={}, c={'payment_methods': ['card']})
+
+    assert await route_names(accounts, 'pix', 4) == ['a', 'b', 'a', 'b']
+
+
+async def test_least_in_flight_picks_the_least_busy_account():
+    accounts = create_accounts('least_in_flight', a={}, b={}, c={})
+    accounts.for_account('a')._in_flight = 3
+    accounts.for_account('b')._in_flight = 1
+    accounts.for_account('c')._in_flight = 2
+
+    assert await route_names(accounts, 'pix', 2) == ['b', 'b']
+
+
+async def test_payment_method_prefers_the_first_account_and_falls_back_to_the_next():
+    accounts = create_accounts('payment_method', pix={'payment_methods': ['pix']}, geral={})
+
+    assert await route_names(accounts, 'pix', 2) == ['pix', 'pix']
+    assert await route_names(accounts, 'boleto', 1) == ['geral']
+
+    open_breaker(accounts.for_account('pix'))
+
+    assert await route_names(accounts, 'pix', 1) == ['geral']
+
+
+async def test_rejects_payment_methods_no_account_accepts():
+    accounts = create_accounts(a={'payment_methods': ['pix']})
+
+    with pytest.raises(PaymentMethodNotSupportedError):
+        await accounts.route('card')
+
+
+async def test_saturated_accounts_are_not_overcommitted():
+    accounts = create_accounts(a={'max_in_flight': 1}, b={'max_in_flight': 1})
+    accounts.for_account('a')._in_flight = 1
+
+    assert await route_names(accounts, 'pix', 2) == ['b', 'b']
+
+    accounts.for_account('b')._in_flight = 1
+    with pytest.raises(NoAccountAvailableError) as exc_info:
+        await accounts.route('pix')
+    assert exc_info.value.retry_after == SATURATED_RETRY_AFTER
+
+
+async def test_budget_moves_traffic_to_other_accounts_and_then_fails_fast(budget_clock):
+    accounts = create_accounts('payment_method', a={'rate': 1.0, 'burst': 2}, b={'rate': 0.5})
+
+    assert await route_names(accounts, 'pix', 3) == ['a', 'a', 'b']
+    with pytest.raises(NoAccountAvailableError) as exc_info:
+        await accounts.route('pix')
+    assert exc_info.value.retry_after == pytest.approx(1.0)
+
+    budget_clock.advance(1.0)
+
+    assert await route_names(accounts, 'pix', 1) == ['a']
+
+
+async def test_open_breakers_report_their_retry_after():
+    accounts = create_accounts(a={})
+    open_breaker(accounts.default)
+
+    with pytest.raises(NoAccountAvailableError) as exc_info:
+        await accounts.route('pix')
+    assert exc_info.value.retry_after > 0
+
+
+async def test_admit_applies_the_budget_to_a_fixed_account():
+    accounts = create_accounts(a={'rate': 1.0}, b={})
+
+    assert await accounts.admit(accounts.for_account('a')) is accounts.for_account('a')
+    with pytest.raises(NoAccountAvailableError):
+        await accounts.admit(accounts.for_account('a'))
+
+
+def test_for_account_falls_back_to_the_default_account():
+    accounts = create_accounts(a={}, b={})
+
+    assert accounts.for_account('b').name == 'b'
+    assert accounts.for_account(None) is accounts.default
+    assert accounts.for_account('removida') is accounts.default
+    assert accounts.default.name == 'a'
+
+
+def test_for_public_key_finds_the_account_of_the_key():
+    accounts = create_accounts(a={'public_key': 'pk-a'}, b={'public_key': 'pk-b'})
+
+    assert accounts.for_public_key('pk-b').name == 'b'
+    assert accounts.for_public_key('outra') is accounts.default
+    assert accounts.for_public_key(None) is accounts.default
+
+
+async def test_checkout_fails_fast_with_retry_after_when_the_budget_is_exhausted(session, client, fake_mercadopago):
+    service = router.mp.default
+    service.account = service.account.model_copy(update={'rate': 0.5, 'burst': 1})
+
+    first = await client.post('/payments/checkout/pix', json=PIX_CHECKOUT)
+    second = await client.post('/payments/checkout/pix', json=PIX_CHECKOUT)
+
+    assert first.status_code == httpx.codes.OK
+    assert second.status_code == httpx.codes.SERVICE_UNAVAILABLE
+    assert second.headers['Retry-After'] == '2'
+    assert fake_mercadopago.requests == 1
@@ -0,0 +1,47 @@
+import pytest
+
+from services import cache
+from services.cache import InMemoryTTLCache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def ttl_cache(clock, monkeypatch):
+    monkeypatch.setattr(cache, 'time', clock)
+    return InMemoryTTLCache(max_entries=2)
+
+
+async def test_entries_expire_after_the_ttl(ttl_cache, clock):
+    await ttl_cache.set('pendente', 'pending', ttl=10.0)
+    await ttl_cache.set('final', 'approved')
+
+    clock.advance(9.9)
+    assert await ttl_cache.get('pendente') == 'pending'
+
+    clock.advance(0.1)
+    assert await ttl_cache.get('pendente') is None
+    assert await ttl_cache.get('final') == 'approved'
+    assert len(ttl_cache) == 1
+
+
+async def test_least_recently_used_entry_is_evicted(ttl_cache):
+    await ttl_cache.set('a', 'A')
+    await ttl_cache.set('b', 'B')
+    # A leitura torna `a` a entrada mais recente
+    assert await ttl_cache.get('a') == 'A'
+
+    await ttl_cache.set('c', 'C')
+
+    assert await ttl_cache.get('b') is None
+    assert await ttl_cache.get('a') == 'A'
+    assert await ttl_cache.get('c') == 'C'
+
+
+async def test_delete_removes_the_entry(ttl_cache):
+    await ttl_cache.set('a', 'A')
+
+    await ttl_cache.delete('a')
+    await ttl_cache.delete('inexistente')
+
+    assert await ttl_cache.get('a') is None
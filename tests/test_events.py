@@ -0,0 +1,99 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from payments.events import StatusChange, record_status_changes
+from payments.models import Payment, PaymentEvent, PaymentMethod, PaymentRollup, PaymentStatus
+from payments.repository import upsert_payment
+
+pytestmark = pytest.mark.anyio
+
+TRANSACTION_ID = '1001'
+CREATED_AT = datetime(2026, 10, 18, 12, 0, tzinfo=UTC)
+
+
+async def create_payment(session):
+    await upsert_payment(
+        session,
+        amount=100.0,
+        transaction_id=TRANSACTION_ID,
+        payment_method=PaymentMethod.PIX,
+        payment_info={'status': 'pending', 'date_last_updated': CREATED_AT.isoformat()},
+        source='checkout',
+    )
+    await session.commit()
+
+
+async def record(session, payment_status: PaymentStatus, minutes: float, source: str = 'notification') -> int:
+    change = StatusChange(TRANSACTION_ID, payment_status, provider_updated_at=CREATED_AT + timedelta(minutes=minutes), source=source)
+    applied = await record_status_changes(session, [change])
+    await session.commit()
+    return applied
+
+
+async def current_status(session) -> PaymentStatus:
+    return await session.scalar(select(Payment.payment_status).where(Payment.transaction_id == TRANSACTION_ID))
+
+
+async def test_newer_event_updates_the_status(session):
+    await create_payment(session)
+
+    assert await record(session, PaymentStatus.PAID, minutes=1) == 1
+
+    assert await current_status(session) == PaymentStatus.PAID
+    assert await session.scalar(select(Payment.payment_date).where(Payment.transaction_id == TRANSACTION_ID)) is not None
+
+
+async def test_late_webhook_does_not_overwrite_paid(session):
+    await create_payment(session)
+    await record(session, PaymentStatus.PAID, minutes=5)
+
+    # Notificação atrasada: `date_last_updated` anterior ao do pagamento aprovado
+    assert await record(session, PaymentStatus.PENDING, minutes=1) == 0
+
+    assert await current_status(session) == PaymentStatus.PAID
+    # O evento atrasado entra no histórico mesmo sem alterar o status
+    events = (await session.scalars(select(PaymentEvent.payment_status).order_by(PaymentEvent.id))).all()
+    assert events == [PaymentStatus.PENDING, PaymentStatus.PAID, PaymentStatus.PENDING]
+
+
+async def test_latest_event_of_a_batch_wins(session):
+    await create_payment(session)
+
+    changes = [
+        StatusChange(TRANSACTION_ID, PaymentStatus.PAID, provider_updated_at=CREATED_AT + timedelta(minutes=5)),
+        StatusChange(TRANSACTION_ID, PaymentStatus.PENDING, provider_updated_at=CREATED_AT + timedelta(minutes=1)),
+    ]
+    assert await record_status_changes(session, changes) == 1
+    await session.commit()
+
+    assert await current_status(session) == PaymentStatus.PAID
+
+
+async def test_paid_overrides_local_expiry(session):
+    await create_payment(session)
+    await record(session, PaymentStatus.EXPIRED, minutes=30, source='expiry')
+
+    # Aprovação feita antes do vencimento, mas notificada depois da expiração local
+    assert await record(session, PaymentStatus.PAID, minutes=29) == 1
+
+    assert await current_status(session) == PaymentStatus.PAID
+
+
+async def test_late_pending_does_not_revert_local_expiry(session):
+    await create_payment(session)
+    await record(session, PaymentStatus.EXPIRED, minutes=30, source='expiry')
+
+    assert await record(session, PaymentStatus.PENDING, minutes=10) == 0
+
+    assert await current_status(session) == PaymentStatus.EXPIRED
+
+
+async def test_status_change_moves_the_rollup_totals(session):
+    await create_payment(session)
+
+    await record(session, PaymentStatus.PAID, minutes=1)
+
+    rollups = {row.payment_status: (row.count, row.total_amount) for row in (await session.scalars(select(PaymentRollup))).all()}
+    assert rollups == {PaymentStatus.PENDING: (0, 0.0), PaymentStatus.PAID: (1, 100.0)}
@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from payments.expiry import EXPIRED_STATUS_DETAIL, expire_overdue_payments
+from payments.models import Payment, PaymentEvent, PaymentMethod, PaymentRollup, PaymentStatus, utcnow
+from payments.repository import upsert_payments
+
+pytestmark = pytest.mark.anyio
+
+GRACE = timedelta(minutes=5)
+
+
+async def create_payment(session, transaction_id: str, expires_in: timedelta | None, amount: float = 10.0):
+    await upsert_payments(session, [{'amount': amount, 'transaction_id': transaction_id, 'payment_method': PaymentMethod.PIX}], source='checkout')
+    await session.execute(update(Payment).where(Payment.transaction_id == transaction_id).values(expires_at=utcnow() + expires_in if expires_in is not None else None))
+    await session.commit()
+
+
+async def statuses(session) -> dict[str, PaymentStatus]:
+    return dict((await session.execute(select(Payment.transaction_id, Payment.payment_status).execution_options(populate_existing=True))).all())
+
+
+async def rollup(session) -> dict[PaymentStatus, tuple[int, float]]:
+    rows = await session.scalars(select(PaymentRollup).execution_options(populate_existing=True))
+    return {row.payment_status: (row.count, row.total_amount) for row in rows if row.count}
+
+
+async def test_expires_only_payments_overdue_past_the_grace(session):
+    await create_payment(session, 'vencido', expires_in=-GRACE - timedelta(minutes=1), amount=30.0)
+    await create_payment(session, 'na-tolerancia', expires_in=-GRACE + timedelta(minutes=1))
+    await create_payment(session, 'a-vencer', expires_in=timedelta(hours=1))
+    await create_payment(session, 'sem-vencimento', expires_in=None)
+
+    report = await expire_overdue_payments(grace_seconds=GRACE.total_seconds())
+
+    assert (report.batches, report.expired) == (1, 1)
+    assert await statuses(session) == {
+        'vencido': PaymentStatus.EXPIRED,
+        'na-tolerancia': PaymentStatus.PENDING,
+        'a-vencer': PaymentStatus.PENDING,
+        'sem-vencimento': PaymentStatus.PENDING,
+    }
+
+
+async def test_expiry_writes_an_event_and_moves_the_rollup(session):
+    await create_payment(session, 'vencido', expires_in=-GRACE * 2, amount=30.0)
+    await create_payment(session, 'a-vencer', expires_in=timedelta(hours=1))
+
+    await expire_overdue_payments(grace_seconds=GRACE.total_seconds())
+
+    event = await session.scalar(select(PaymentEvent).where(PaymentEvent.transaction_id == 'vencido', PaymentEvent.source == 'expiry'))
+    assert (event.payment_status, event.status_detail) == (PaymentStatus.EXPIRED, EXPIRED_STATUS_DETAIL)
+    assert await rollup(session) == {PaymentStatus.PENDING: (1, 10.0), PaymentStatus.EXPIRED: (1, 30.0)}
+
+
+async def test_expires_in_batches(session):
+    for n in range(5):
+        await create_payment(session, f'vencido-{n}', expires_in=-GRACE * 2)
+
+    report = await expire_overdue_payments(batch_size=2, grace_seconds=GRACE.total_seconds())
+
+    assert (report.batches, report.expired) == (3, 5)
+    assert set((await statuses(session)).values()) == {PaymentStatus.EXPIRED}
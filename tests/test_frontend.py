@@ -0,0 +1,49 @@
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from app.frontend import PrecompressedStaticFiles, parse_accept_encoding
+
+pytestmark = pytest.mark.anyio
+
+
+def test_parse_accept_encoding_reads_weights():
+    assert parse_accept_encoding('gzip, br;q=0, deflate;q=0.5, *;q=invalid') == {'gzip': 1.0, 'br': 0.0, 'deflate': 0.5, '*': 0.0}
+
+
+@pytest.fixture
+def static_files(tmp_path):
+    (tmp_path / 'checkout.css').write_text('body{}')
+    (tmp_path / 'checkout.css.br').write_bytes(b'br')
+    (tmp_path / 'checkout.css.gz').write_bytes(b'gz')
+    return PrecompressedStaticFiles(directory=tmp_path)
+
+
+@pytest.mark.parametrize(
+    ('accept_encoding', 'content_encoding'),
+    [
+        ('gzip, br', 'br'),
+        ('gzip, br;q=0', 'gzip'),
+        ('br;q=0, gzip;q=0', None),
+        ('*', 'br'),
+        ('*, br;q=0', 'gzip'),
+        ('identity', None),
+    ],
+)
+async def test_serves_only_accepted_encodings(static_files, accept_encoding, content_encoding):
+    scope = {'type': 'http', 'method': 'GET', 'path': '/checkout.css', 'headers': [(b'accept-encoding', accept_encoding.encode())]}
+
+    response = await static_files.get_response('checkout.css', scope)
+
+    assert response.headers.get('content-encoding') == content_encoding
+    assert response.headers['vary'] == 'Accept-Encoding'
+
+
+async def test_missing_build_directory_returns_not_found(tmp_path):
+    app = Starlette(routes=[Mount('/static', PrecompressedStaticFiles(directory=tmp_path / 'dist', check_dir=False))])
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        response = await client.get('/static/checkout.css')
+
+    assert response.status_code == httpx.codes.NOT_FOUND
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+from payments.idempotency import purge_expired_keys, store_response
+from payments.models import IdempotencyKey, Payment, utcnow
+
+pytestmark = pytest.mark.anyio
+
+PIX_CHECKOUT = {'payer_email': 'comprador@example.com', 'payer_cpf': '12345678909', 'transaction_amount': 100.0}
+KEY = 'pedido-1001'
+
+
+async def create_key(session, key: str, request_hash: str, expires_in: timedelta):
+    now = utcnow()
+    session.add(IdempotencyKey(key=key, request_hash=request_hash, status_code=200, response_body='{"id": 1}', created_at=now, expires_at=now + expires_in))
+    await session.commit()
+
+
+async def test_replay_returns_the_stored_response(session, client, fake_mercadopago):
+    first = await client.post('/payments/checkout/pix', json=PIX_CHECKOUT, headers={'Idempotency-Key': KEY})
+    replay = await client.post('/payments/checkout/pix', json=PIX_CHECKOUT, headers={'Idempotency-Key': KEY})
+
+    assert first.status_code == replay.status_code == httpx.codes.OK
+    assert replay.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert replay.content == first.content
+    assert fake_mercadopago.requests == 1
+    assert len((await session.scalars(select(Payment))).all()) == 1
+
+
+async def test_key_reused_with_a_different_body_is_rejected(session, client, fake_mercadopago):
+    await client.post('/payments/checkout/pix', json=PIX_CHECKOUT, headers={'Idempotency-Key': KEY})
+
+    response = await client.post('/payments/checkout/pix', json={**PIX_CHECKOUT, 'transaction_amount': 200.0}, headers={'Idempotency-Key': KEY})
+
+    assert response.status_code == httpx.codes.UNPROCESSABLE_ENTITY
+    assert fake_mercadopago.requests == 1
+
+
+async def test_store_response_replaces_an_expired_key(session):
+    await create_key(session, KEY, 'antigo', expires_in=timedelta(seconds=-1))
+
+    await store_response(session, KEY, 'novo', b'{"id": 2}')
+    await session.commit()
+
+    stored = await session.scalar(select(IdempotencyKey).where(IdempotencyKey.key == KEY).execution_options(populate_existing=True))
+    assert (stored.request_hash, stored.response_body) == ('novo', '{"id": 2}')
+
+
+async def test_store_response_keeps_a_key_that_has_not_expired(session):
+    await create_key(session, KEY, 'antigo', expires_in=timedelta(hours=1))
+
+    await store_response(session, KEY, 'novo', b'{"id": 2}')
+    await session.commit()
+
+    stored = await session.scalar(select(IdempotencyKey).where(IdempotencyKey.key == KEY).execution_options(populate_existing=True))
+    assert (stored.request_hash, stored.response_body) == ('antigo', '{"id": 1}')
+
+
+async def test_purge_removes_only_expired_keys(session):
+    await create_key(session, 'expirada', 'hash', expires_in=timedelta(seconds=-1))
+    await create_key(session, 'valida', 'hash', expires_in=timedelta(hours=1))
+
+    assert await purge_expired_keys() == 1
+
+    assert (await session.scalars(select(IdempotencyKey.key))).all() == ['valida']
@@ -0,0 +1,63 @@
+import pytest
+from starlette.requests import ClientDisconnect
+
+from payments.events import StatusChange
+from payments.live import PaymentStatusBroker, PaymentStatusStreamResponse
+from payments.models import PaymentStatus
+
+pytestmark = pytest.mark.anyio
+
+MAX_CONNECTIONS = 2
+
+
+@pytest.fixture
+def broker():
+    return PaymentStatusBroker(max_connections=MAX_CONNECTIONS)
+
+
+def test_reserve_enforces_the_connection_limit(broker):
+    assert broker.reserve()
+    assert broker.reserve()
+    assert not broker.reserve()
+
+    broker.release()
+
+    assert broker.reserve()
+    assert broker.stats()['connections'] == MAX_CONNECTIONS
+    assert broker.stats()['rejected'] == 1
+
+
+def test_subscribers_keep_only_the_latest_status(broker):
+    queue = broker.subscribe('1001', PaymentStatus.PENDING)
+
+    broker.publish(StatusChange('1001', PaymentStatus.PENDING))
+    assert queue.empty()
+
+    broker.publish(StatusChange('1001', PaymentStatus.FAILED))
+    broker.publish(StatusChange('1001', PaymentStatus.PAID))
+
+    assert queue.qsize() == 1
+    assert queue.get_nowait()['payment_status'] == PaymentStatus.PAID
+
+
+async def test_response_releases_the_slot_when_the_client_disconnects_before_the_first_event(broker):
+    started = False
+
+    async def events():
+        nonlocal started
+        started = True
+        yield b''
+
+    async def send(message):
+        raise OSError('conexão encerrada pelo cliente')
+
+    async def receive():
+        return {'type': 'http.disconnect'}
+
+    assert broker.reserve()
+    response = PaymentStatusStreamResponse(broker, events())
+    with pytest.raises(ClientDisconnect):
+        await response({'type': 'http', 'asgi': {'spec_version': '2.4'}}, receive, send)
+
+    assert not started
+    assert broker.stats()['connections'] == 0
@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.settings import settings
+from payments import router
+from services import cache
+from services.mercadopago import MercadoPagoService
+from services.resilience import CircuitBreaker
+
+pytestmark = pytest.mark.anyio
+
+TRANSACTION_ID = '1001'
+
+
+def mercadopago_service(handler) -> MercadoPagoService:
+    """
+    Serviço com um cliente HTTP que responde com `handler`, sem acessar a rede.
+    """
+    service = MercadoPagoService()
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=settings.MP_BASE_API_URL)
+    return service
+
+
+@pytest.fixture
+def payment_api(clock, monkeypatch):
+    """
+    Mercado Pago que responde `GET /v1/payments/{id}` com o status atual de `payment_api.status` e conta as consultas.
+    """
+    monkeypatch.setattr(cache, 'time', clock)
+
+    class PaymentApi:
+        status = 'pending'
+        requests = 0
+
+        def __call__(self, request):
+            self.requests += 1
+            return httpx.Response(200, json={'id': int(TRANSACTION_ID), 'status': self.status})
+
+    return PaymentApi()
+
+
+async def test_pending_payment_info_expires_after_the_pending_ttl(payment_api, clock):
+    service = mercadopago_service(payment_api)
+
+    await service.get_payment_info(TRANSACTION_ID)
+    clock.advance(settings.MP_PAYMENT_CACHE_PENDING_TTL - 1)
+    await service.get_payment_info(TRANSACTION_ID)
+    assert payment_api.requests == 1
+
+    payment_api.status = 'approved'
+    clock.advance(1)
+
+    assert (await service.get_payment_info(TRANSACTION_ID))['status'] == 'approved'
+    assert service.stats()['payment_info_cache'] == {'hits': 1, 'misses': 2}
+
+
+async def test_final_payment_info_does_not_expire(payment_api, clock):
+    payment_api.status = 'approved'
+    service = mercadopago_service(payment_api)
+
+    await service.get_payment_info(TRANSACTION_ID)
+    clock.advance(86400)
+
+    assert (await service.get_payment_info(TRANSACTION_ID))['status'] == 'approved'
+    assert payment_api.requests == 1
+
+
+async def test_use_cache_false_refreshes_the_cached_payment(payment_api):
+    service = mercadopago_service(payment_api)
+    await service.get_payment_info(TRANSACTION_ID)
+    payment_api.status = 'approved'
+
+    assert (await service.get_payment_info(TRANSACTION_ID, use_cache=False))['status'] == 'approved'
+    assert (await service.get_payment_info(TRANSACTION_ID))['status'] == 'approved'
+    assert service.stats()['payment_info_cache'] == {'hits': 1, 'misses': 2}
+
+
+async def test_payment_updated_notification_invalidates_the_cache(session, client, fake_mercadopago):
+    payment = fake_mercadopago.create_payment({'payment_method_id': 'pix', 'transaction_amount': 10.0}, None)
+    service = router.mp.default
+
+    await service.get_payment_info(payment['id'])
+    payment['status'] = 'approved'
+    assert (await service.get_payment_info(payment['id']))['status'] == 'pending'
+
+    response = await client.post('/payments/notification', json={'action': 'payment.updated', 'data': {'id': str(payment['id'])}})
+
+    assert response.status_code == httpx.codes.OK
+    assert (await service.get_payment_info(payment['id']))['status'] == 'approved'
+
+
+async def test_cancelled_requests_do_not_count_as_failures():
+    async def handler(request):
+        raise asyncio.CancelledError
+
+    service = mercadopago_service(handler)
+
+    for _ in range(settings.MP_BREAKER_MIN_CALLS):
+        with pytest.raises(asyncio.CancelledError):
+            await service.get_payment_info(TRANSACTION_ID)
+
+    assert service.breaker.stats() == {'state': CircuitBreaker.CLOSED, 'calls': 0, 'failures': 0}
+    assert service.in_flight == 0
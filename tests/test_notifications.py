@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from payments import notifications
+from payments.models import PaymentStatus
+from payments.notifications import NotificationCoalescer
+
+pytestmark = pytest.mark.anyio
+
+WINDOW = 60.0
+MAX_ENTRIES = 2
+
+
+@pytest.fixture
+def coalescer(clock, monkeypatch):
+    monkeypatch.setattr(notifications, 'time', clock)
+    return NotificationCoalescer(window=WINDOW, max_entries=MAX_ENTRIES)
+
+
+def returning(payment_status: PaymentStatus, calls: list):
+    async def fn():
+        calls.append(payment_status)
+        return payment_status
+
+    return fn
+
+
+async def test_concurrent_notifications_share_one_execution(coalescer):
+    calls, gate = [], asyncio.Event()
+
+    async def fn():
+        calls.append(1)
+        await gate.wait()
+        return PaymentStatus.PENDING
+
+    first = asyncio.create_task(coalescer.run('1001', fn))
+    second = asyncio.create_task(coalescer.run('1001', fn))
+    await asyncio.sleep(0)
+    gate.set()
+
+    assert await asyncio.gather(first, second) == [PaymentStatus.PENDING, PaymentStatus.PENDING]
+    assert calls == [1]
+    assert coalescer.stats()['coalesced'] == 1
+    assert coalescer.stats()['in_flight'] == 0
+
+
+async def test_final_status_is_deduplicated_within_the_window(coalescer, clock):
+    calls = []
+    assert await coalescer.run('1001', returning(PaymentStatus.PAID, calls)) == PaymentStatus.PAID
+
+    assert await coalescer.run('1001', returning(PaymentStatus.PAID, calls)) is None
+
+    clock.advance(WINDOW)
+    assert await coalescer.run('1001', returning(PaymentStatus.PAID, calls)) == PaymentStatus.PAID
+    assert calls == [PaymentStatus.PAID, PaymentStatus.PAID]
+
+
+async def test_pending_status_is_not_deduplicated(coalescer):
+    calls = []
+    await coalescer.run('1001', returning(PaymentStatus.PENDING, calls))
+    await coalescer.run('1001', returning(PaymentStatus.PENDING, calls))
+
+    assert calls == [PaymentStatus.PENDING, PaymentStatus.PENDING]
+
+
+async def test_recent_payments_are_bounded(coalescer):
+    calls = []
+    for key in ('1', '2', '3'):
+        await coalescer.run(key, returning(PaymentStatus.PAID, calls))
+
+    assert coalescer.stats()['recent'] == MAX_ENTRIES
+    # A chave mais antiga saiu da memória e volta a ser processada
+    assert await coalescer.run('1', returning(PaymentStatus.PAID, calls)) == PaymentStatus.PAID
+
+
+async def test_errors_reach_every_waiter_and_release_the_key(coalescer):
+    gate = asyncio.Event()
+
+    async def failing():
+        await gate.wait()
+        raise RuntimeError('Mercado Pago indisponível')
+
+    first = asyncio.create_task(coalescer.run('1001', failing))
+    second = asyncio.create_task(coalescer.run('1001', failing))
+    await asyncio.sleep(0)
+    gate.set()
+
+    results = await asyncio.gather(first, second, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert coalescer.stats()['in_flight'] == 0
+    assert await coalescer.run('1001', returning(PaymentStatus.PENDING, [])) == PaymentStatus.PENDING
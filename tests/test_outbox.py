@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+from app.settings import settings
+from payments import router
+from payments.models import Payment, PaymentIntent, PaymentIntentStatus, PaymentMethod, PaymentStatus, utcnow
+from payments.outbox import sweep_payment_intents
+
+pytestmark = pytest.mark.anyio
+
+MIN_AGE = timedelta(minutes=2)
+ABANDON_AFTER = timedelta(hours=1)
+PIX_CHECKOUT = {'payer_email': 'comprador@example.com', 'payer_cpf': '12345678909', 'transaction_amount': 100.0}
+
+
+async def create_intent(session, external_reference: str, age: timedelta, **kwargs) -> PaymentIntent:
+    intent = PaymentIntent(external_reference=external_reference, amount=10.0, payment_method=PaymentMethod.PIX, created_at=utcnow() - age, **kwargs)
+    session.add(intent)
+    await session.commit()
+    return intent
+
+
+async def intents(session) -> dict[str, PaymentIntent]:
+    rows = await session.scalars(select(PaymentIntent).execution_options(populate_existing=True))
+    return {intent.external_reference: intent for intent in rows}
+
+
+async def sweep():
+    return await sweep_payment_intents(router.mp, min_age_seconds=MIN_AGE.total_seconds(), abandon_after_seconds=ABANDON_AFTER.total_seconds())
+
+
+async def test_intent_found_upstream_is_completed(session, fake_mercadopago):
+    payment = fake_mercadopago.create_payment({'payment_method_id': 'pix', 'transaction_amount': 10.0, 'external_reference': 'ID-PIX-1'}, None)
+    await create_intent(session, 'ID-PIX-1', age=timedelta(minutes=5))
+
+    report = await sweep()
+
+    assert (report['checked'], report['completed'], report['failed']) == (1, 1, 0)
+    intent = (await intents(session))['ID-PIX-1']
+    assert (intent.status, intent.transaction_id) == (PaymentIntentStatus.COMPLETED, str(payment['id']))
+    stored = await session.scalar(select(Payment).where(Payment.transaction_id == str(payment['id'])))
+    assert (stored.amount, stored.payment_status) == (10.0, PaymentStatus.PENDING)
+
+
+async def test_intent_not_found_is_abandoned_only_after_the_cutoff(session, fake_mercadopago):
+    await create_intent(session, 'ID-PIX-recente', age=timedelta(minutes=1))
+    await create_intent(session, 'ID-PIX-pendente', age=timedelta(minutes=5))
+    await create_intent(session, 'ID-PIX-antiga', age=ABANDON_AFTER + timedelta(minutes=1))
+
+    report = await sweep()
+
+    assert (report['checked'], report['completed'], report['failed']) == (2, 0, 1)
+    swept = await intents(session)
+    assert (swept['ID-PIX-recente'].status, swept['ID-PIX-recente'].attempts) == (PaymentIntentStatus.PENDING, 0)
+    assert (swept['ID-PIX-pendente'].status, swept['ID-PIX-pendente'].attempts) == (PaymentIntentStatus.PENDING, 1)
+    assert swept['ID-PIX-antiga'].status == PaymentIntentStatus.FAILED
+
+
+async def test_finished_intents_are_purged_after_the_retention(session, fake_mercadopago):
+    expired = utcnow() - timedelta(seconds=settings.OUTBOX_RETENTION_SECONDS + 60)
+    await create_intent(session, 'ID-PIX-concluida', age=timedelta(days=30), status=PaymentIntentStatus.COMPLETED, completed_at=expired)
+    await create_intent(session, 'ID-PIX-falha', age=timedelta(days=30), status=PaymentIntentStatus.FAILED, completed_at=expired)
+    await create_intent(session, 'ID-PIX-recente', age=timedelta(days=1), status=PaymentIntentStatus.COMPLETED, completed_at=utcnow())
+
+    report = await sweep()
+
+    assert report['purged'] == len(['ID-PIX-concluida', 'ID-PIX-falha'])
+    assert list(await intents(session)) == ['ID-PIX-recente']
+
+
+async def test_local_error_after_the_charge_keeps_the_intent_pending(session, client, fake_mercadopago, monkeypatch):
+    async def upsert_payment(*args, **kwargs):
+        raise ValueError('erro local ao gravar o pagamento')
+
+    monkeypatch.setattr(router, 'upsert_payment', upsert_payment)
+
+    response = await client.post('/payments/checkout/pix', json=PIX_CHECKOUT)
+
+    assert response.status_code == httpx.codes.BAD_GATEWAY
+    [intent] = (await intents(session)).values()
+    assert intent.status == PaymentIntentStatus.PENDING
+
+    # A varredura encontra o pagamento criado no Mercado Pago
+    await sweep_payment_intents(router.mp, min_age_seconds=0)
+    assert (await intents(session))[intent.external_reference].status == PaymentIntentStatus.COMPLETED
@@ -0,0 +1,63 @@
+import pytest
+
+from app import ratelimit
+from app.ratelimit import InMemoryRateLimitBackend
+
+pytestmark = pytest.mark.anyio
+
+RATE = 2.0
+BURST = 3
+
+
+@pytest.fixture
+def backend(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, 'time', clock)
+    return InMemoryRateLimitBackend()
+
+
+async def drain(backend: InMemoryRateLimitBackend, key: str = 'ip:1.2.3.4'):
+    for _ in range(BURST):
+        assert await backend.acquire(key, RATE, BURST) == 0
+
+
+async def test_bucket_admits_the_burst_then_asks_to_wait(backend):
+    await drain(backend)
+
+    assert await backend.acquire('ip:1.2.3.4', RATE, BURST) == pytest.approx(1 / RATE)
+
+
+async def test_bucket_refills_at_rate(backend, clock):
+    await drain(backend)
+
+    clock.advance(0.25)
+    assert await backend.acquire('ip:1.2.3.4', RATE, BURST) == pytest.approx(0.25)
+
+    clock.advance(0.25)
+    assert await backend.acquire('ip:1.2.3.4', RATE, BURST) == 0
+    assert await backend.acquire('ip:1.2.3.4', RATE, BURST) == pytest.approx(1 / RATE)
+
+
+async def test_refill_is_capped_at_burst(backend, clock):
+    await drain(backend)
+
+    clock.advance(60)
+
+    await drain(backend)
+    assert await backend.acquire('ip:1.2.3.4', RATE, BURST) > 0
+
+
+async def test_buckets_are_independent(backend):
+    await drain(backend, 'ip:1.2.3.4')
+
+    assert await backend.acquire('ip:5.6.7.8', RATE, BURST) == 0
+
+
+async def test_prune_drops_only_full_buckets(backend, clock):
+    await drain(backend, 'ip:refilled')
+    await backend.acquire('ip:refilling', 0.001, BURST)
+    clock.advance(InMemoryRateLimitBackend.PRUNE_INTERVAL)
+
+    await backend.acquire('ip:other', RATE, BURST)
+
+    assert 'ip:refilled' not in backend._buckets
+    assert 'ip:refilling' in backend._buckets
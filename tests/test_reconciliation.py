@@ -0,0 +1,126 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from payments import reconciliation, router
+from payments.models import Payment, PaymentMethod, PaymentStatus, as_utc, utcnow
+from payments.reconciliation import RateLimiter, reconcile_pending_payments
+from payments.repository import upsert_payments
+
+pytestmark = pytest.mark.anyio
+
+MIN_AGE = timedelta(minutes=15)
+MAX_AGE = timedelta(days=7)
+
+
+async def create_pending_payments(session, fake_mercadopago, count: int, age: timedelta, expires_in: timedelta | None = None) -> list[str]:
+    """
+    Cria `count` pagamentos pendentes no Mercado Pago falso e no banco, com `created_at` `age` atrás.
+    """
+    payments = [fake_mercadopago.create_payment({'payment_method_id': 'pix', 'transaction_amount': 10.0}, None) for _ in range(count)]
+    transaction_ids = [str(payment['id']) for payment in payments]
+    await upsert_payments(session, [{'amount': 10.0, 'transaction_id': transaction_id, 'payment_method': PaymentMethod.PIX} for transaction_id in transaction_ids])
+    now = utcnow()
+    await session.execute(update(Payment).where(Payment.transaction_id.in_(transaction_ids)).values(created_at=now - age, expires_at=now + expires_in if expires_in is not None else None))
+    await session.commit()
+    return transaction_ids
+
+
+def approve(fake_mercadopago, transaction_id: str):
+    payment = fake_mercadopago.payments[int(transaction_id)]
+    payment.update(status='approved', status_detail='accredited', date_last_updated=(utcnow() + timedelta(minutes=1)).isoformat())
+
+
+async def statuses(session) -> dict[str, PaymentStatus]:
+    rows = await session.execute(select(Payment.transaction_id, Payment.payment_status).execution_options(populate_existing=True))
+    return dict(rows.all())
+
+
+async def reconcile(**kwargs):
+    options = {'min_age_seconds': MIN_AGE.total_seconds(), 'max_age_seconds': MAX_AGE.total_seconds(), 'concurrency': 2, 'max_rate': 0, **kwargs}
+    return await reconcile_pending_payments(router.mp, **options)
+
+
+async def test_reconciles_pending_payments_in_batches(session, fake_mercadopago):
+    transaction_ids = await create_pending_payments(session, fake_mercadopago, 5, age=timedelta(hours=1))
+    approve(fake_mercadopago, transaction_ids[0])
+    approve(fake_mercadopago, transaction_ids[-1])
+
+    report = await reconcile(batch_size=2)
+
+    assert (report.batches, report.checked, report.updated, report.errors) == (3, 5, 2, 0)
+    assert await statuses(session) == {
+        transaction_id: PaymentStatus.PAID if transaction_id in {transaction_ids[0], transaction_ids[-1]} else PaymentStatus.PENDING for transaction_id in transaction_ids
+    }
+
+
+async def test_skips_recent_old_and_overdue_payments(session, fake_mercadopago):
+    recent = await create_pending_payments(session, fake_mercadopago, 1, age=timedelta(minutes=1))
+    too_old = await create_pending_payments(session, fake_mercadopago, 1, age=MAX_AGE + timedelta(hours=1))
+    overdue = await create_pending_payments(session, fake_mercadopago, 1, age=timedelta(hours=1), expires_in=timedelta(minutes=-1))
+    due_later = await create_pending_payments(session, fake_mercadopago, 1, age=timedelta(hours=1), expires_in=timedelta(days=1))
+    for transaction_id in recent + too_old + overdue + due_later:
+        approve(fake_mercadopago, transaction_id)
+
+    report = await reconcile()
+
+    assert (report.checked, report.updated) == (1, 1)
+    assert fake_mercadopago.requests == 1
+    assert (await statuses(session))[due_later[0]] == PaymentStatus.PAID
+
+
+async def test_max_age_zero_disables_the_limit(session, fake_mercadopago):
+    await create_pending_payments(session, fake_mercadopago, 1, age=MAX_AGE + timedelta(hours=1))
+
+    report = await reconcile(max_age_seconds=0)
+
+    assert report.checked == 1
+
+
+@pytest.fixture
+def sleeps(clock, monkeypatch) -> list[float]:
+    delays = []
+
+    async def sleep(delay: float):
+        delays.append(round(delay, 6))
+
+    monkeypatch.setattr(reconciliation, 'time', clock)
+    monkeypatch.setattr(reconciliation.asyncio, 'sleep', sleep)
+    return delays
+
+
+async def test_rate_limiter_spaces_the_calls(sleeps, clock):
+    limiter = RateLimiter(rate=10)
+
+    await asyncio.gather(*(limiter.wait() for _ in range(3)))
+    assert sleeps == [0.1, 0.2]
+
+    # Depois de um intervalo ocioso a próxima chamada não espera
+    clock.advance(1)
+    await limiter.wait()
+    assert sleeps == [0.1, 0.2]
+
+
+async def test_rate_limiter_without_rate_does_not_wait(sleeps):
+    limiter = RateLimiter(rate=0)
+
+    await asyncio.gather(*(limiter.wait() for _ in range(3)))
+
+    assert sleeps == []
+
+
+async def test_backfills_missing_expiration_from_the_provider(session, fake_mercadopago):
+    [legacy] = await create_pending_payments(session, fake_mercadopago, 1, age=timedelta(hours=1))
+    [known] = await create_pending_payments(session, fake_mercadopago, 1, age=timedelta(hours=1), expires_in=timedelta(days=1))
+    provider_expiration = utcnow() + timedelta(days=2)
+    for transaction_id in (legacy, known):
+        fake_mercadopago.payments[int(transaction_id)]['date_of_expiration'] = provider_expiration.isoformat()
+
+    report = await reconcile()
+
+    assert (report.checked, report.expirations, report.updated) == (2, 1, 0)
+    expirations = dict((await session.execute(select(Payment.transaction_id, Payment.expires_at).execution_options(populate_existing=True))).all())
+    assert as_utc(expirations[legacy]) == provider_expiration
+    assert as_utc(expirations[known]) < provider_expiration
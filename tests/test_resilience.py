@@ -0,0 +1,104 @@
+import pytest
+
+from services import resilience
+from services.resilience import CircuitBreaker, CircuitOpenError
+
+OPEN_SECONDS = 30.0
+
+
+@pytest.fixture
+def breaker(clock, monkeypatch):
+    monkeypatch.setattr(resilience, 'time', clock)
+    return CircuitBreaker('Teste', failure_rate_threshold=0.5, minimum_calls=4, window_seconds=60.0, open_seconds=OPEN_SECONDS)
+
+
+def open_breaker(breaker: CircuitBreaker):
+    for _ in range(4):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_stays_closed_below_minimum_calls(breaker):
+    for _ in range(3):
+        breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_opens_when_failure_rate_reaches_threshold(breaker):
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.retry_after == pytest.approx(OPEN_SECONDS)
+
+
+def test_calls_outside_the_window_are_discarded(breaker, clock):
+    for _ in range(3):
+        breaker.record_failure()
+    clock.advance(61)
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()['calls'] == 1
+
+
+def test_half_open_allows_a_single_probe(breaker, clock):
+    open_breaker(breaker)
+    clock.advance(OPEN_SECONDS)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    # `check` não reserva a chamada de teste
+    breaker.check()
+    breaker.check()
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_successful_probe_closes_the_circuit(breaker, clock):
+    open_breaker(breaker)
+    clock.advance(OPEN_SECONDS)
+    breaker.before_call()
+
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats() == {'state': CircuitBreaker.CLOSED, 'calls': 0, 'failures': 0}
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_the_circuit(breaker, clock):
+    open_breaker(breaker)
+    clock.advance(OPEN_SECONDS)
+    breaker.before_call()
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.retry_after == pytest.approx(OPEN_SECONDS)
+
+
+def test_cancelled_probe_frees_the_probe_without_a_result(breaker, clock):
+    open_breaker(breaker)
+    clock.advance(OPEN_SECONDS)
+    breaker.before_call()
+
+    breaker.record_cancelled()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
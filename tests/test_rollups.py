@@ -0,0 +1,44 @@
+from datetime import UTC, datetime
+
+from payments.models import PaymentMethod, PaymentStatus
+from payments.rollups import RollupDeltas
+
+CREATED_AT = datetime(2026, 10, 18, 12, 34, 56, tzinfo=UTC)
+BUCKET = datetime(2026, 10, 18, 12, 0, tzinfo=UTC)
+
+
+def test_add_accumulates_by_hour_method_and_status():
+    deltas = RollupDeltas()
+    deltas.add(CREATED_AT, PaymentMethod.PIX, PaymentStatus.PENDING, 10.0)
+    deltas.add(BUCKET, PaymentMethod.PIX, PaymentStatus.PENDING, 5.0)
+    deltas.add(CREATED_AT, PaymentMethod.BOLETO, PaymentStatus.PENDING, 7.0)
+
+    assert deltas.rows() == [
+        {'bucket': BUCKET, 'payment_method': PaymentMethod.BOLETO, 'payment_status': PaymentStatus.PENDING, 'count': 1, 'total_amount': 7.0},
+        {'bucket': BUCKET, 'payment_method': PaymentMethod.PIX, 'payment_status': PaymentStatus.PENDING, 'count': 2, 'total_amount': 15.0},
+    ]
+
+
+def test_move_transfers_the_payment_between_statuses():
+    deltas = RollupDeltas()
+    deltas.move(CREATED_AT, PaymentMethod.PIX, 10.0, PaymentStatus.PENDING, PaymentStatus.PAID)
+
+    assert deltas.rows() == [
+        {'bucket': BUCKET, 'payment_method': PaymentMethod.PIX, 'payment_status': PaymentStatus.PAID, 'count': 1, 'total_amount': 10.0},
+        {'bucket': BUCKET, 'payment_method': PaymentMethod.PIX, 'payment_status': PaymentStatus.PENDING, 'count': -1, 'total_amount': -10.0},
+    ]
+
+
+def test_move_to_the_same_status_is_a_no_op():
+    deltas = RollupDeltas()
+    deltas.move(CREATED_AT, PaymentMethod.PIX, 10.0, PaymentStatus.PAID, PaymentStatus.PAID)
+
+    assert deltas.rows() == []
+
+
+def test_deltas_that_cancel_out_are_skipped():
+    deltas = RollupDeltas()
+    deltas.move(CREATED_AT, PaymentMethod.PIX, 10.0, PaymentStatus.PENDING, PaymentStatus.PAID)
+    deltas.move(CREATED_AT, PaymentMethod.PIX, 10.0, PaymentStatus.PAID, PaymentStatus.PENDING)
+
+    assert deltas.rows() == []
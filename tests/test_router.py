@@ -0,0 +1,158 @@
+import asyncio
+import json
+import math
+
+import httpx
+import pytest
+from sqlalchemy import event, select
+
+from app.database import engine
+from app.settings import settings
+from payments.models import Payment, PaymentIntent, PaymentIntentStatus, PaymentMethod
+from payments.repository import upsert_payments
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize('body', [b'not json', b'[]', b'"payment"', b'{"data": [1]}', b'{"data": "1001"}'])
+async def test_notification_rejects_invalid_payloads(client, body):
+    response = await client.post('/payments/notification', content=body)
+
+    assert response.status_code == httpx.codes.BAD_REQUEST
+
+
+async def create_payments(session, count: int, payment_method: PaymentMethod = PaymentMethod.PIX) -> list[int]:
+    # Um único lote: todos os pagamentos têm o mesmo `created_at` e o mesmo valor
+    await upsert_payments(session, [{'amount': 10.0, 'transaction_id': f'{payment_method.value}-{n}', 'payment_method': payment_method} for n in range(count)])
+    await session.commit()
+    return list((await session.scalars(select(Payment.id).where(Payment.payment_method == payment_method).order_by(Payment.id))).all())
+
+
+async def list_all_pages(client, **params) -> tuple[list[int], int]:
+    ids, pages, cursor = [], 0, None
+    while True:
+        response = await client.get('/payments/list', params={**params, **({'cursor': cursor} if cursor is not None else {})})
+        assert response.status_code == httpx.codes.OK
+        page = response.json()
+        ids += [item['id'] for item in page['items']]
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids, pages
+
+
+@pytest.mark.parametrize('count', [5, 6])
+async def test_list_pages_cover_every_payment_once(session, client, count):
+    ids = await create_payments(session, count)
+
+    listed, pages = await list_all_pages(client, limit=3)
+
+    assert listed == ids
+    assert pages == math.ceil(count / 3)
+
+
+async def test_list_cursor_keeps_the_filters(session, client):
+    pix = await create_payments(session, 4)
+    await create_payments(session, 3, PaymentMethod.BOLETO)
+
+    listed, _ = await list_all_pages(client, limit=2, payment_method='pix')
+
+    assert listed == pix
+
+
+async def test_list_last_page_has_no_next_cursor(session, client):
+    ids = await create_payments(session, 2)
+
+    response = await client.get('/payments/list', params={'limit': 2, 'cursor': ids[0] - 1})
+
+    assert [item['id'] for item in response.json()['items']] == ids
+    assert response.json()['next_cursor'] is None
+
+
+async def test_list_stream_exports_every_filtered_payment_as_ndjson(session, client):
+    pix = await create_payments(session, 3)
+    await create_payments(session, 2, PaymentMethod.BOLETO)
+
+    response = await client.get('/payments/list', params={'stream': 'true', 'limit': 1, 'payment_method': 'pix'})
+
+    assert response.status_code == httpx.codes.OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = response.text.splitlines()
+    assert [json.loads(line)['id'] for line in lines] == pix
+    assert response.text.endswith('\n')
+
+
+PIX_ITEM = {'payment_method': 'pix', 'payer_email': 'comprador@example.com', 'payer_cpf': '12345678909', 'transaction_amount': 10.0}
+BOLETO_ITEM = {
+    'payment_method': 'boleto',
+    'payer_email': 'comprador@example.com',
+    'payer_cpf': '12345678909',
+    'transaction_amount': 20.0,
+    'payer_first_name': 'Maria',
+    'payer_last_name': 'Silva',
+    'zip_code': '01001-000',
+    'street_name': 'Praça da Sé',
+    'street_number': '1',
+    'neighborhood': 'Sé',
+    'city': 'São Paulo',
+    'federal_unit': 'SP',
+}
+
+
+@pytest.fixture
+def payment_inserts() -> list[str]:
+    """
+    INSERTs em `payments` executados durante o teste.
+    """
+    inserts = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO payments '):
+            inserts.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', count)
+    yield inserts
+    event.remove(engine.sync_engine, 'before_cursor_execute', count)
+
+
+async def test_batch_reports_invalid_items_without_rejecting_the_batch(session, client, fake_mercadopago, payment_inserts):
+    items = [PIX_ITEM, {**PIX_ITEM, 'payer_cpf': '123'}, BOLETO_ITEM, {'payment_method': 'card'}, 'pix']
+
+    response = await client.post('/payments/checkout/batch', json={'items': items})
+
+    assert response.status_code == httpx.codes.OK
+    result = response.json()
+    assert (result['created'], result['failed']) == (2, 3)
+    assert [(item['index'], item['payment_method'], item['status_code']) for item in result['results']] == [
+        (0, 'pix', httpx.codes.CREATED),
+        (1, 'pix', httpx.codes.UNPROCESSABLE_ENTITY),
+        (2, 'boleto', httpx.codes.CREATED),
+        (3, None, httpx.codes.UNPROCESSABLE_ENTITY),
+        (4, None, httpx.codes.UNPROCESSABLE_ENTITY),
+    ]
+    assert result['results'][1]['error'].startswith('payer_cpf: ')
+    assert fake_mercadopago.requests == len([PIX_ITEM, BOLETO_ITEM])
+    # Os pagamentos criados são gravados com um único INSERT
+    assert len(payment_inserts) == 1
+    assert sorted((await session.scalars(select(Payment.transaction_id))).all()) == sorted(item['transaction_id'] for item in result['results'] if item['transaction_id'])
+    # Só os itens válidos geram intenção de pagamento
+    assert [intent.status for intent in (await session.scalars(select(PaymentIntent))).all()] == [PaymentIntentStatus.COMPLETED] * 2
+
+
+async def test_batch_limits_concurrent_provider_calls(session, client, fake_mercadopago, monkeypatch):
+    monkeypatch.setattr(settings, 'CHECKOUT_BATCH_CONCURRENCY', 2)
+    in_flight, peak = 0, 0
+
+    async def simulate():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    monkeypatch.setattr(fake_mercadopago, 'simulate', simulate)
+
+    response = await client.post('/payments/checkout/batch', json={'items': [PIX_ITEM] * 6})
+
+    assert response.json()['created'] == len([PIX_ITEM] * 6)
+    assert peak == settings.CHECKOUT_BATCH_CONCURRENCY
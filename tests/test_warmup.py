@@ -0,0 +1,92 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.templating import Jinja2Templates
+
+from app import main
+from app.warmup import WorkerWarmup
+from payments import router
+
+pytestmark = pytest.mark.anyio
+
+
+class FailingAccounts:
+    async def warmup(self, connections: int) -> dict[str, int]:
+        raise RuntimeError('mercado pago fora do ar')
+
+
+class HangingAccounts:
+    async def warmup(self, connections: int) -> dict[str, int]:
+        await asyncio.Event().wait()
+
+
+@pytest.fixture
+def warmup(session, fake_mercadopago, monkeypatch):
+    worker = WorkerWarmup(router.mp, main.templates, db_connections=1, mp_connections=1, timeout=5.0, enabled=True)
+    monkeypatch.setattr(main, 'warmup', worker)
+    return worker
+
+
+async def test_readyz_is_unavailable_until_warmup_finishes(client, warmup):
+    before = await client.get('/readyz')
+
+    report = await warmup.run()
+    after = await client.get('/readyz')
+
+    assert before.status_code == httpx.codes.SERVICE_UNAVAILABLE
+    assert before.json() == {'ready': False}
+    assert after.status_code == httpx.codes.OK
+    assert after.json()['ready'] is True
+    assert report.errors == []
+    assert (report.db_connections, report.templates) == (1, 1)
+    assert report.queries > 0
+    assert report.mp_connections == {router.mp.default.name: 1}
+
+
+async def test_readyz_is_unavailable_again_after_stop(client, warmup):
+    await warmup.run()
+    warmup.stop()
+
+    response = await client.get('/readyz')
+
+    assert response.status_code == httpx.codes.SERVICE_UNAVAILABLE
+    assert response.json()['ready'] is False
+
+
+async def test_healthz_does_not_wait_for_warmup(client, warmup):
+    response = await client.get('/healthz')
+
+    assert response.status_code == httpx.codes.OK
+
+
+async def test_failed_steps_are_reported_without_blocking_startup(session):
+    worker = WorkerWarmup(FailingAccounts(), Jinja2Templates(directory='inexistente'), db_connections=1, timeout=5.0, enabled=True)
+
+    report = await worker.run()
+
+    assert worker.ready
+    assert sorted(error.split(':')[0] for error in report.errors) == ['mercadopago', 'templates']
+    assert any('mercado pago fora do ar' in error for error in report.errors)
+    assert report.db_connections == 1
+    assert worker.status()['errors'] == report.errors
+
+
+async def test_slow_steps_are_cut_by_the_timeout(session):
+    worker = WorkerWarmup(HangingAccounts(), main.templates, db_connections=1, timeout=0.05, enabled=True)
+
+    report = await worker.run()
+
+    assert worker.ready
+    assert [error.split(':')[0] for error in report.errors] == ['mercadopago']
+    assert report.templates == 1
+
+
+async def test_disabled_warmup_only_marks_the_worker_ready():
+    worker = WorkerWarmup(FailingAccounts(), main.templates, enabled=False)
+
+    report = await worker.run()
+
+    assert worker.ready
+    assert report.errors == []
+    assert (report.db_connections, report.templates) == (0, 0)